@@ -0,0 +1,92 @@
+import math
+import typing
+
+import numpy as np
+
+
+# Default until we have seen a bullet fly, see Game.bullet_speed
+BULLET_SPEED = 450.0
+
+
+def angle_to(from_pos, to_pos) -> float:
+    """
+    Angle in degrees [0, 360) from one point to another, the format the server expects for move and shoot.
+    """
+    return math.degrees(math.atan2(to_pos[1] - from_pos[1], to_pos[0] - from_pos[0])) % 360.0
+
+
+def lead_angle(shooter_pos, target_pos, target_velocity, bullet_speed=BULLET_SPEED) -> typing.Tuple[float, float]:
+    """
+    Angle to shoot so the bullet meets a target moving in a straight line at constant velocity.
+    With d the target position relative to us and v its velocity, the bullet meets it at the first t > 0 where
+    |d + v t| = bullet_speed * t, i.e. (v.v - s^2) t^2 + 2 (d.v) t + d.d = 0.
+    :return: (angle, seconds until impact). If the target outruns our bullets, the angle straight at it and inf.
+    """
+    dx, dy = target_pos[0] - shooter_pos[0], target_pos[1] - shooter_pos[1]
+    vx, vy = target_velocity[0], target_velocity[1]
+    a = vx * vx + vy * vy - bullet_speed * bullet_speed
+    b = 2 * (dx * vx + dy * vy)
+    c = dx * dx + dy * dy
+
+    time = math.inf
+    if abs(a) < 1e-9:
+        if b < 0:
+            time = -c / b
+    else:
+        discriminant = b * b - 4 * a * c
+        if discriminant >= 0:
+            root = math.sqrt(discriminant)
+            times = [t for t in ((-b - root) / (2 * a), (-b + root) / (2 * a)) if t > 0]
+            if times:
+                time = min(times)
+    if time == math.inf:
+        return angle_to(shooter_pos, target_pos), math.inf
+    return math.degrees(math.atan2(dy + vy * time, dx + vx * time)) % 360.0, time
+
+
+def lead_angles(shooter_pos, target_positions, target_velocities, bullet_speed=BULLET_SPEED):
+    """
+    Batched lead_angle for many targets at once.
+    :param target_positions, target_velocities: arrays (N, 2)
+    :return: (angles, times) arrays (N,), times is inf where there is no intercept
+    """
+    relative = np.asarray(target_positions, dtype=np.float64) - np.asarray(shooter_pos, dtype=np.float64)
+    velocities = np.asarray(target_velocities, dtype=np.float64)
+    a = np.einsum("nk,nk->n", velocities, velocities) - bullet_speed * bullet_speed
+    b = 2 * np.einsum("nk,nk->n", relative, velocities)
+    c = np.einsum("nk,nk->n", relative, relative)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discriminant = b * b - 4 * a * c
+        root = np.sqrt(np.maximum(discriminant, 0.0))
+        first = (-b - root) / (2 * a)
+        second = (-b + root) / (2 * a)
+        linear = np.where(b < 0, -c / b, np.inf)
+    first = np.where(first > 0, first, np.inf)
+    second = np.where(second > 0, second, np.inf)
+    quadratic = np.where(discriminant >= 0, np.minimum(first, second), np.inf)
+    times = np.where(np.abs(a) < 1e-9, linear, quadratic)
+
+    lead = np.where(np.isfinite(times)[:, None], relative + velocities * np.where(np.isfinite(times), times, 0)[:, None],
+                    relative)
+    angles = np.degrees(np.arctan2(lead[:, 1], lead[:, 0])) % 360.0
+    return angles, times
+
+
+def choose_target(shooter_pos, target_positions, target_velocities, priorities, bullet_speed=BULLET_SPEED,
+                  max_time=2.0) -> typing.Optional[typing.Tuple[int, float]]:
+    """
+    Score many candidate targets (enemy tank, destructible walls in the way, ...) in one call.
+    The score is priority / time to impact, so close high priority targets win. Targets we cannot reach within
+    max_time seconds are ignored.
+    :return: (index of the best target, angle to shoot) or None if none can be hit
+    """
+    if len(target_positions) == 0:
+        return None
+    angles, times = lead_angles(shooter_pos, target_positions, target_velocities, bullet_speed)
+    with np.errstate(divide="ignore"):
+        scores = np.where(times <= max_time, np.asarray(priorities, dtype=np.float64) / np.maximum(times, 1e-6), -np.inf)
+    best = int(np.argmax(scores))
+    if scores[best] == -np.inf:
+        return None
+    return best, float(angles[best])
@@ -0,0 +1,81 @@
+import math
+import typing
+
+import numpy as np
+
+from pathfinding import TANK_RADIUS, TANK_SPEED
+
+
+class DodgeEngine:
+    """
+    Predicts where the visible bullets go and finds a move angle that keeps our tank out of their way.
+
+    Every candidate heading is checked against every bullet in one vectorized pass: with p the bullet position
+    relative to the tank and w its velocity relative to the tank moving on that heading, the bullet hits the tank's
+    swept circle at the first t >= 0 where |p + w t| = radius. Times are in seconds, velocities are per second like the
+    server's.
+    """
+    def __init__(self, horizon=1.0, radius=TANK_RADIUS + 5, num_headings=16):
+        self.horizon = horizon
+        self.radius = radius
+        self.num_headings = num_headings
+        self.headings = np.arange(num_headings) * (360.0 / num_headings)
+        radians = np.radians(self.headings)
+        self.unit_vectors = np.stack([np.cos(radians), np.sin(radians)], axis=1)
+
+    def time_to_impact(self, tank_pos, tank_velocities, positions, velocities) -> np.ndarray:
+        """
+        :param tank_velocities: array (H, 2) of tank velocities to test
+        :return: array (H, N), seconds until each bullet hits the tank moving with each velocity (inf if it misses
+            within the horizon)
+        """
+        relative_positions = positions - np.asarray(tank_pos, dtype=np.float64)
+        relative_velocities = velocities[None, :, :] - tank_velocities[:, None, :]
+
+        a = np.einsum("hnk,hnk->hn", relative_velocities, relative_velocities)
+        b = np.einsum("nk,hnk->hn", relative_positions, relative_velocities)
+        c = np.einsum("nk,nk->n", relative_positions, relative_positions) - self.radius ** 2
+        discriminant = b * b - a * c[None, :]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            entry = (-b - np.sqrt(np.maximum(discriminant, 0.0))) / a
+        hits = (b < 0) & (discriminant >= 0) & (a > 0)
+        impact = np.where(hits, entry, np.inf)
+        # Already overlapping
+        impact = np.where(c[None, :] <= 0, 0.0, impact)
+        return np.where(impact <= self.horizon, impact, np.inf)
+
+    def is_threatened(self, tank_pos, tank_velocity, positions, velocities) -> bool:
+        if len(positions) == 0:
+            return False
+        velocity = np.asarray([tank_velocity], dtype=np.float64)
+        return bool(np.isfinite(self.time_to_impact(tank_pos, velocity, positions, velocities)).any())
+
+    def best_move(self, tank_pos, tank_velocity, positions, velocities, speed=None, allowed=None,
+                  preferred_angle=None) -> typing.Optional[float]:
+        """
+        Evasive move angle, or None if the tank is safe on its current course.
+        Picks the heading whose first impact comes latest (ideally never); among equally safe headings the one closest
+        to preferred_angle (default: the current course).
+        :param speed: speed of the tank on the new heading, defaults to its current speed (at least TANK_SPEED)
+        :param allowed: optional boolean array (num_headings,), False for headings that would run into a wall
+        """
+        if len(positions) == 0 or not self.is_threatened(tank_pos, tank_velocity, positions, velocities):
+            return None
+
+        current_speed = math.hypot(tank_velocity[0], tank_velocity[1])
+        speed = speed or max(current_speed, TANK_SPEED)
+        impact = self.time_to_impact(tank_pos, self.unit_vectors * speed, positions, velocities)
+        first_impact = impact.min(axis=1)
+        if allowed is not None:
+            first_impact = np.where(allowed, first_impact, -1.0)
+
+        if preferred_angle is None:
+            preferred_angle = math.degrees(math.atan2(tank_velocity[1], tank_velocity[0])) if current_speed else 0.0
+        turn = np.abs((self.headings - preferred_angle + 180.0) % 360.0 - 180.0)
+
+        # Latest impact first, then smallest turn
+        best = np.lexsort((turn, -first_impact))[0]
+        if first_impact[best] < 0:
+            return None
+        return float(self.headings[best])
@@ -0,0 +1,167 @@
+import math
+import typing
+
+import numpy as np
+
+
+TICK_SECONDS = 0.1
+# Observations kept in the ring buffer, a little over 6 seconds of turns
+HISTORY_SIZE = 64
+
+
+class EnemyTracker:
+    """
+    Where the enemy is, where it is going and how fast it turns, from the turns the server told us about it.
+
+    Position and velocity go through a Kalman filter whose motion model is a coordinated turn: the velocity rotates at
+    the current turn rate estimate (constant velocity when it is 0), with white acceleration noise. The turn rate
+    itself is a scalar Kalman filter over the heading changes between observations. Between observations (the enemy
+    did not change, or we do not see it) the same model predicts ahead, with an uncertainty that keeps growing.
+
+    The last `history` observations are kept in a fixed-size ring buffer of rows (turn, x, y, vx, vy), and
+    `uncertainty` tells how far off a prediction may be, so aiming can skip shots that are mostly guesswork.
+    Times are server turns, TICK_SECONDS apart.
+    """
+    def __init__(self, history=HISTORY_SIZE, position_noise=1.0, velocity_noise=5.0, acceleration_noise=150.0,
+                 turn_rate_noise=1.0, turn_rate_measurement_noise=0.3, min_turn_speed=20.0, max_turn_rate=3.0):
+        self.history = np.zeros((history, 5))
+        self.count = 0
+        self.position_noise = position_noise
+        self.velocity_noise = velocity_noise
+        self.acceleration_noise = acceleration_noise
+        self.turn_rate_noise = turn_rate_noise
+        self.turn_rate_measurement_noise = turn_rate_measurement_noise
+        # Below this speed the heading is meaningless and the turn rate is not measured
+        self.min_turn_speed = min_turn_speed
+        # Faster heading changes are new courses (tanks can turn on the spot), not a turn to keep following
+        self.max_turn_rate = max_turn_rate
+
+        # Filter state [x, y, vx, vy] and its covariance at turn last_turn
+        self.state = None
+        self.covariance = None
+        self.last_turn = None
+        # Radians per second, positive is counter-clockwise
+        self.turn_rate = 0.0
+        self.turn_rate_variance = 1.0
+        self.measurement_covariance = np.diag([position_noise ** 2] * 2 + [velocity_noise ** 2] * 2)
+
+    @property
+    def known(self) -> bool:
+        return self.state is not None
+
+    def observations(self) -> np.ndarray:
+        """
+        :return: the buffered observations, oldest first, rows (turn, x, y, vx, vy)
+        """
+        size = len(self.history)
+        if self.count <= size:
+            return self.history[:self.count].copy()
+        start = self.count % size
+        return np.concatenate([self.history[start:], self.history[:start]])
+
+    def transition(self, seconds) -> np.ndarray:
+        """
+        Coordinated turn transition matrix over `seconds` at the current turn rate.
+        """
+        omega = self.turn_rate
+        if abs(omega) < 1e-6:
+            return np.array([[1.0, 0.0, seconds, 0.0],
+                             [0.0, 1.0, 0.0, seconds],
+                             [0.0, 0.0, 1.0, 0.0],
+                             [0.0, 0.0, 0.0, 1.0]])
+        sin, cos = math.sin(omega * seconds), math.cos(omega * seconds)
+        return np.array([[1.0, 0.0, sin / omega, -(1.0 - cos) / omega],
+                         [0.0, 1.0, (1.0 - cos) / omega, sin / omega],
+                         [0.0, 0.0, cos, -sin],
+                         [0.0, 0.0, sin, cos]])
+
+    def process_noise(self, seconds) -> np.ndarray:
+        half_square = seconds * seconds / 2
+        gain = np.array([[half_square, 0.0], [0.0, half_square], [seconds, 0.0], [0.0, seconds]])
+        return gain @ gain.T * self.acceleration_noise ** 2
+
+    def observe(self, turn, position, velocity):
+        """
+        Fold in what the server says about the enemy on this turn.
+        """
+        row = self.history[self.count % len(self.history)]
+        row[:] = (turn, position[0], position[1], velocity[0], velocity[1])
+        self.count += 1
+        measurement = np.array([position[0], position[1], velocity[0], velocity[1]], dtype=np.float64)
+
+        if self.state is None:
+            self.state = measurement
+            self.covariance = self.measurement_covariance.copy()
+            self.last_turn = turn
+            return
+
+        seconds = (turn - self.last_turn) * TICK_SECONDS
+        previous_velocity = self.state[2], self.state[3]
+        if seconds > 0:
+            transition = self.transition(seconds)
+            self.state = transition @ self.state
+            self.covariance = transition @ self.covariance @ transition.T + self.process_noise(seconds)
+            self.update_turn_rate(previous_velocity, velocity, seconds)
+
+        # Position and velocity are both measured, H is the identity
+        gain = self.covariance @ np.linalg.inv(self.covariance + self.measurement_covariance)
+        self.state = self.state + gain @ (measurement - self.state)
+        self.covariance = (np.eye(4) - gain) @ self.covariance
+        self.last_turn = turn
+
+    def update_turn_rate(self, previous_velocity, velocity, seconds):
+        self.turn_rate_variance += self.turn_rate_noise ** 2 * seconds
+        if min(math.hypot(*previous_velocity), math.hypot(velocity[0], velocity[1])) < self.min_turn_speed:
+            return
+        change = math.atan2(velocity[1], velocity[0]) - math.atan2(previous_velocity[1], previous_velocity[0])
+        # Shortest way round
+        change = (change + math.pi) % (2 * math.pi) - math.pi
+        measured = change / seconds
+        if abs(measured) > self.max_turn_rate:
+            self.turn_rate = 0.0
+            self.turn_rate_variance = 1.0
+            return
+        gain = self.turn_rate_variance / (self.turn_rate_variance + self.turn_rate_measurement_noise ** 2)
+        self.turn_rate += gain * (measured - self.turn_rate)
+        self.turn_rate_variance *= 1.0 - gain
+
+    def predict(self, turn, seconds=0.0) -> typing.Optional[typing.Tuple[typing.Tuple[float, float],
+                                                                         typing.Tuple[float, float]]]:
+        """
+        Predicted position and velocity `seconds` after server turn `turn`, e.g. predict(self.turn, 0.5).
+        :return: ((x, y), (vx, vy)), None if the enemy was never observed
+        """
+        if self.state is None:
+            return None
+        ahead = (turn - self.last_turn) * TICK_SECONDS + seconds
+        state = self.transition(ahead) @ self.state if ahead > 0 else self.state
+        return (float(state[0]), float(state[1])), (float(state[2]), float(state[3]))
+
+    def uncertainty(self, turn, seconds=0.0) -> float:
+        """
+        Standard deviation of the position predicted `seconds` after server turn `turn` (see predict), in map units.
+        """
+        if self.state is None:
+            return math.inf
+        ahead = (turn - self.last_turn) * TICK_SECONDS + seconds
+        covariance = self.covariance
+        if ahead > 0:
+            transition = self.transition(ahead)
+            covariance = transition @ covariance @ transition.T + self.process_noise(ahead)
+        return math.sqrt(covariance[0, 0] + covariance[1, 1])
+
+    def lead(self, shooter_pos, bullet_speed, turn, iterations=3) -> typing.Optional[typing.Tuple[float, float]]:
+        """
+        Angle to shoot now so the bullet meets the enemy on its predicted, possibly curving, course: the flight time
+        is refined a few times against the predicted position.
+        :return: (angle, seconds until impact) or None if the enemy was never observed
+        """
+        prediction = self.predict(turn)
+        if prediction is None:
+            return None
+        (x, y), _ = prediction
+        seconds = 0.0
+        for _ in range(iterations):
+            seconds = math.hypot(x - shooter_pos[0], y - shooter_pos[1]) / bullet_speed
+            (x, y), _ = self.predict(turn, seconds)
+        return math.degrees(math.atan2(y - shooter_pos[1], x - shooter_pos[0])) % 360.0, seconds
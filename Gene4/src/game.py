@@ -1,8 +1,28 @@
 import random
 import comms
 from object_types import ObjectTypes
+from object_store import ObjectStore
+from spatial_index import SpatialIndex
+from pathfinding import (OccupancyGrid, PathPlanner, IncrementalPlanner, DESTRUCTIBLE_WALL_COST, WALL_HALF_SIZE,
+                         TANK_RADIUS, TANK_SPEED)
+from dodge import DodgeEngine
+from lookahead import HeadingPlanner
+from line_of_sight import LineOfSight, SOLID
+from powerup_selector import PowerupSelector
+from threat_field import ThreatField
+from enemy_tracker import EnemyTracker
+from path_governor import PathGovernor
+from map_cache import MapCache
+import aiming
+from telemetry import Telemetry, Level
+from profiler import PhaseProfiler
+from scheduler import Deadline, TURN_BUDGET_SECONDS
+from params import load_params
 import math
+import numpy as np
 import sys
+import time
+import traceback
 from enum import Enum
 
 # Team Name: Only Leo
@@ -27,7 +47,18 @@ class Game:
     Stores all information about the game and manages the communication cycle.
     Available attributes after initialization will be:
     - tank_id: your tank id
-    - objects: a dict of all objects on the map like {object-id: object-dict}.
+    - objects: a dict of all objects on the map but the bullets like {object-id: object-dict}.
+    - object_store: the same objects indexed by type, the tanks as records and the bullets as arrays (see ObjectStore).
+    - my_tank, enemy_tank: TankRecord of both tanks, updated in place every turn.
+    - enemy_tracker: Kalman filter over the enemy's reported states, predicts where it goes (also while unreported).
+    - spatial_index: grid over object positions for radius and segment queries (see SpatialIndex).
+    - occupancy_grid, path_planner: the walls rasterized while the init stream is read and an A* planner over them.
+    - incremental_planner: D* Lite planner for fixed targets, repaired as walls fall and the boundary closes.
+    - line_of_sight: memoized ray casts against the walls, to skip shots a wall would stop.
+    - powerup_selector: priority queue of the powerups worth going for, updated from the deltas.
+    - threat_field: coarse cost map of walls, closing boundary, bullet paths and the enemy's line of fire.
+    - path_governor: only lets a new "path" out when it differs enough from the one the server follows.
+    - map_cache: the occupancy grid and threat field wall layer of maps seen before, on disk (see MapCache).
     - width: the width of the map as a floating point number.
     - height: the height of the map as a floating point number.
     - current_turn_message: a copy of the message received this turn. It will be updated everytime `read_next_turn_data`
@@ -39,27 +70,68 @@ class Game:
         self.enemy_tank_id = tank_id_message["message"]["enemy-tank-id"]
         self.current_turn_message = None
 
-        #Tank information
-        self.my_tank_dict = None
-        self.enemy_tank_dict = None
+        #Tank information, the records are the compact copies updated in place (see ObjectStore)
+        self.my_tank = None
+        self.enemy_tank = None
         self.tank_state = TankState.DEFENSIVE
 
+        #Tunable constants, see params.py (tuned values come from params.json)
+        self.params = load_params()
+
         #Set optimal velocity to >50%
-        self.optimal_velocity = 141.42 * 0.5
+        self.optimal_velocity = TANK_SPEED * self.params["optimal_velocity_fraction"]
         #Current Tank movement
         self.tank_current_movement_direction = None
         self.tank_current_path = None
         self.tank_current_PU_target = None
-        self.check_pu = 10
+        self.check_pu = self.params["powerup_check_interval"]
     
 
         #Tank object detection
         self.tank_detectable_object = {}
+        self.detect_range = self.params["detect_range"]
+
+        #Bullets closer than this are checked for dodging
+        self.dodge_range = 600
+        self.dodge_engine = DodgeEngine()
+        #Only the closest bullets are checked once the turn is out of time
+        self.dodge_max_bullets_when_late = 32
+
+        #New move angles come from rollouts of every heading a second ahead (see HeadingPlanner)
+        self.heading_planner = HeadingPlanner(boundary_margin=self.params["boundary_margin"])
+
+        #Aiming, the bullet speed is measured from the first bullet we see
+        self.bullet_speed = aiming.BULLET_SPEED
+        self.bullet_speed_measured = False
+        #Destructible walls further than this along the way to our target are left alone
+        self.wall_shoot_range = 150
+
+        #Aiming, ATTACK and dodging all work from the tracker's estimate of the enemy
+        self.enemy_tracker = EnemyTracker()
+        #ATTACK heads for where the enemy will be this many seconds from now
+        self.attack_lead_seconds = 0.5
+        #No shot at the enemy when the tracker is this unsure (standard deviation) where it will be at impact
+        self.max_aim_uncertainty = 80.0
 
         #Game Info
         self.tick = 0
+        #Server turns since END_INIT, unlike tick this is never reset
+        self.turn = 0
+        #Time budget of the current turn, started when its message is read (see scheduler.Deadline)
+        self.turn_budget = TURN_BUDGET_SECONDS
+        self.turn_deadline = None
+
+        #Sampled per turn records, see Telemetry for the TELEMETRY_* environment variables
+        self.telemetry = Telemetry.from_env()
+        #Per phase latency histograms, see PhaseProfiler for the PROFILE_* environment variables
+        self.profiler = PhaseProfiler.from_env()
+        self.turn_sampled = False
+        self.turn_started = 0.0
+        self.read_seconds = 0.0
         # We will store all game objects here
-        self.objects = {}
+        self.object_store = ObjectStore(own_tank_id=self.tank_id)
+        self.objects = self.object_store.objects
+        self.spatial_index = SpatialIndex()
 
         #Key of the closing boundary
         self.closing_boundaries_key = None
@@ -70,43 +142,156 @@ class Game:
         self.bot_left_boundary = None
         self.top_left_boundary = None
 
+        #Filled while the init batches arrive (see read_init_objects): the map size grows with every boundary vertex
+        self.width = 0.0
+        self.height = 0.0
+        self.line_of_sight = LineOfSight()
+        #Built as soon as the map size is known and fed the walls batch by batch, unless the map grows after that
+        self.occupancy_grid = None
+        self.threat_field = None
+        self.map_resized_late = False
+        #A map seen before is loaded from the cache when the walls could not be rasterized on the way (see MapCache)
+        self.map_cache = MapCache.from_env()
+
         next_init_message = comms.read_message()
         while next_init_message != comms.END_INIT_SIGNAL:
             # At this stage, there won't be any "events" in the message. So we only care about the object_info.
-            object_info: dict = next_init_message["message"]["updated_objects"]
-
-            # Store them in the objects dict
-            self.objects.update(object_info)
+            self.read_init_objects(next_init_message["message"]["updated_objects"])
 
             # Read the next message
             next_init_message = comms.read_message()
 
         # We are outside the loop, which means we must've received the END_INIT signal
 
-        # Let's figure out the map size based on the given boundaries
-
-        # Read all the objects and find the boundary objects
-        boundaries = []
-        for key in self.objects:
-            
-            game_object = self.objects[key]
-
-            if game_object["type"] == ObjectTypes.BOUNDARY.value:
-                boundaries.append(game_object)
-
-            if game_object["type"] == ObjectTypes.CLOSING_BOUNDARY.value:
+        #The planner routes ATTACK and GO_FOR_PU paths around the walls of the occupancy grid
+        if self.occupancy_grid is None:
+            self.create_map_indexes()
+            self.analyse_map()
+        elif self.map_cache.enabled:
+            #Nothing to load, but a later match sizing the same map late gets it from the cache
+            layout_key = self.map_layout_key()
+            if not self.map_cache.contains(layout_key):
+                self.store_map(layout_key)
+        self.path_planner = PathPlanner(self.occupancy_grid)
+        self.incremental_planner = IncrementalPlanner(self.occupancy_grid)
+        self.path_governor = PathGovernor(self.occupancy_grid)
+        self.powerup_selector = PowerupSelector(self.occupancy_grid, self.params["boundary_margin"],
+                                                field=self.threat_field)
+        for key, powerup in self.object_store.powerups.items():
+            self.powerup_selector.add(key, powerup["position"], powerup["powerup_type"])
+
+    def read_init_objects(self, updated_objects: dict):
+        """
+        Route one init batch into the indexes as soon as it is parsed: the object store, the spatial index and the
+        line of sight get their objects, and the boundaries in it push the map size out to their furthest vertex
+        (the top right corner of the map is the biggest X and the biggest Y among all boundaries).
+        The occupancy grid and the threat field need the map size: the boundaries come before the walls, so they are
+        built on the batch that brings them and the walls are rasterized batch by batch from then on. Nothing is left
+        to do at END_INIT. If a later batch grows the map, both are dropped and built at END_INIT (see analyse_map).
+        """
+        self.object_store.update(updated_objects)
+        self.spatial_index.update(updated_objects)
+        walls = {}
+        destructible_walls = {}
+        resized = False
+        for key, game_object in updated_objects.items():
+            object_type = game_object["type"]
+            if object_type == ObjectTypes.WALL.value:
+                self.line_of_sight.add_wall(key, game_object["position"])
+                walls[key] = game_object
+            elif object_type == ObjectTypes.DESTRUCTIBLE_WALL.value:
+                self.line_of_sight.add_wall(key, game_object["position"], destructible=True)
+                destructible_walls[key] = game_object
+            elif object_type == ObjectTypes.BOUNDARY.value:
+                for x, y in game_object["position"]:
+                    if x > self.width:
+                        self.width = x
+                        resized = True
+                    if y > self.height:
+                        self.height = y
+                        resized = True
+            elif object_type == ObjectTypes.CLOSING_BOUNDARY.value:
                 self.closing_boundaries_key = key
 
-        # The biggest X and the biggest Y among all Xs and Ys of boundaries must be the top right corner of the map.
-
-        # Let's find them. This might seem complicated, but you will learn about its details in the tech workshop.
-        biggest_x, biggest_y = [
-            max([max(map(lambda single_position: single_position[i], boundary["position"])) for boundary in boundaries])
-            for i in range(2)
-        ]
+        if self.map_resized_late:
+            return
+        if resized and self.occupancy_grid is not None:
+            self.map_resized_late = True
+            self.occupancy_grid = self.threat_field = None
+        elif resized:
+            #Every wall so far, this batch's included
+            self.create_map_indexes()
+            self.add_map_walls(self.object_store.walls, self.object_store.destructible_walls)
+        elif self.occupancy_grid is not None:
+            self.add_map_walls(walls, destructible_walls)
+
+    def create_map_indexes(self):
+        """
+        Empty occupancy grid and threat field over the map.
+        """
+        self.occupancy_grid = OccupancyGrid(self.width, self.height)
+        self.threat_field = ThreatField(self.width, self.height, enemy_range=self.detect_range)
 
-        self.width = biggest_x
-        self.height = biggest_y
+    def add_map_walls(self, walls: dict, destructible_walls: dict, rasterize=True):
+        """
+        Put walls in the occupancy grid and the threat field.
+        :param walls, destructible_walls: {object-id: object-dict}
+        :param rasterize: False to only put them in the occupancy grid's wall index, its cells come from the map cache
+        """
+        grid = self.occupancy_grid
+        for wall in walls.values():
+            grid.add_wall(wall["position"], rasterize=rasterize)
+        for wall in destructible_walls.values():
+            grid.add_wall(wall["position"], DESTRUCTIBLE_WALL_COST, rasterize=rasterize)
+        if rasterize and (walls or destructible_walls):
+            self.threat_field.add_walls([(key, wall["position"]) for key, wall in walls.items()]
+                                        + [(key, wall["position"]) for key, wall in destructible_walls.items()])
+
+    def analyse_map(self):
+        """
+        Put all the walls in the occupancy grid and the threat field at END_INIT, when they could not be added as the
+        init batches arrived: with their cells and wall layer from the map cache when this wall layout was seen before,
+        else computed here and stored for the next time.
+        """
+        grid, field = self.occupancy_grid, self.threat_field
+        walls, destructible_walls = self.object_store.walls, self.object_store.destructible_walls
+        layout_key = self.map_layout_key()
+        all_walls = [(key, wall["position"]) for key, wall in walls.items()]
+        all_walls += [(key, wall["position"]) for key, wall in destructible_walls.items()]
+
+        cached = self.map_cache.load(layout_key)
+        if cached is not None:
+            try:
+                grid.load_cells(cached["occupancy_cells"])
+                field.load_walls(all_walls, cached["wall_cost"], cached["wall_count"])
+            except (KeyError, ValueError):
+                cached = None
+        if cached is not None:
+            self.add_map_walls(walls, destructible_walls, rasterize=False)
+            return
+
+        field.walls.clear()
+        field.wall_count[...] = 0
+        field.wall_cost[...] = 0.0
+        self.add_map_walls(walls, destructible_walls)
+        self.store_map(layout_key)
+
+    def map_layout_key(self) -> str:
+        """
+        Map cache key of this map's size and walls, and of how the occupancy grid and the threat field analyse them.
+        """
+        grid, field = self.occupancy_grid, self.threat_field
+        walls, destructible_walls = self.object_store.walls, self.object_store.destructible_walls
+        params = (grid.resolution, grid.clearance, DESTRUCTIBLE_WALL_COST, field.resolution, field.wall_range)
+        return MapCache.key(self.width, self.height, (wall["position"] for wall in walls.values()),
+                            (wall["position"] for wall in destructible_walls.values()), params)
+
+    def store_map(self, layout_key):
+        self.map_cache.store(layout_key, {
+            "occupancy_cells": np.frombuffer(self.occupancy_grid.cells, dtype=np.uint8),
+            "wall_cost": self.threat_field.wall_cost,
+            "wall_count": self.threat_field.wall_count,
+        })
 
     def read_next_turn_data(self):
         """
@@ -114,36 +299,74 @@ class Game:
         :returns True if the game continues, False if the end game signal is received and the bot should be terminated
         """
         # Read and save the message
+        profiler = self.profiler
+        started = profiler.mark()
         self.current_turn_message = comms.read_message()
+        self.turn_deadline = Deadline(self.turn_budget)
 
         if self.current_turn_message == comms.END_SIGNAL:
+            summary = {"paths": self.path_governor.stats(), "comms": comms.transport.stats(),
+                       "map_cache": self.map_cache.stats()}
+            self.telemetry.flush("end", summary=summary)
+            profiler.dump("end", summary)
             return False
+        #Includes waiting for the server, the parsing itself is in comms' parse_seconds
+        started = profiler.lap("wait_and_read", started)
+
+        #Turns we fell behind on arrive merged into this one
+        self.turn += 1 + comms.transport.last_coalesced
+        self.turn_sampled = self.telemetry.sampled(self.turn)
+        if self.turn_sampled:
+            self.turn_started = time.perf_counter()
+        profiler.begin_turn(self.turn)
 
         # Delete the objects that have been deleted
         # NOTE: You might want to do some additional logic here. For example check if a powerup you were moving towards
         # is already deleted, etc.
-        for deleted_object_id in self.current_turn_message["message"]["deleted_objects"]:
+        deleted_objects = self.current_turn_message["message"]["deleted_objects"]
+        removed_objects = self.object_store.delete(deleted_objects)
+        self.spatial_index.remove(deleted_objects)
+        for deleted_object_id in deleted_objects:
+            self.powerup_selector.remove(deleted_object_id)
             try:
-                del self.objects[deleted_object_id]
-            except KeyError:
-                pass
-            try:
-                if self.tank_detectable_object[deleted_object_id]["type"] == ObjectTypes.POWERUP:
+                #The powerup we were going for is gone
+                if deleted_object_id == self.tank_current_PU_target:
+                    self.tank_current_PU_target = None
                     self.tank_state = TankState.DEFENSIVE
                     self.tank_current_path = None
                     self.tank_current_movement_direction = None
                 del self.tank_detectable_object[deleted_object_id]
             except KeyError:
                 pass
+        profiler.count("objects_deleted", len(deleted_objects))
+        started = profiler.lap("delete", started)
 
         # Update your records of the new and updated objects in the game
         # NOTE: you might want to do some additional logic here. For example check if a new bullet has been shot or a
         # new powerup is now spawned, etc.
-        self.objects.update(self.current_turn_message["message"]["updated_objects"])
+        updated_objects = self.current_turn_message["message"]["updated_objects"]
+        self.object_store.update(updated_objects)
+        self.spatial_index.update(updated_objects)
+        for key_object, object_game in updated_objects.items():
+            if object_game["type"] == ObjectTypes.POWERUP.value:
+                self.powerup_selector.add(key_object, object_game["position"], object_game["powerup_type"])
+        profiler.count("objects_updated", len(updated_objects))
+        started = profiler.lap("update", started)
 
         #Update my tank and enemy tank
-        self.my_tank_dict = self.objects[self.tank_id]
-        self.enemy_tank_dict = self.objects[self.enemy_tank_id]
+        self.my_tank = self.object_store.tank_records[self.tank_id]
+        self.enemy_tank = self.object_store.tank_records[self.enemy_tank_id]
+        #The server only sends the enemy when it changed, the tracker predicts in between
+        if self.enemy_tank_id in updated_objects:
+            self.enemy_tracker.observe(self.turn, self.enemy_tank.position, self.enemy_tank.velocity)
+
+        #All bullets fly at the same speed
+        bullets = self.object_store.bullet_arrays
+        if not self.bullet_speed_measured and len(bullets):
+            self.bullet_speed = float(np.hypot(*bullets.velocities[0]))
+            self.bullet_speed_measured = True
+        profiler.count("bullets_seen", len(bullets))
+        started = profiler.lap("tanks", started)
 
         #Update boundary
         self.top_left_boundary = self.objects[self.closing_boundaries_key]["position"][0]
@@ -151,75 +374,103 @@ class Game:
         self.bot_right_boundary = self.objects[self.closing_boundaries_key]["position"][2]
         self.top_right_boundary = self.objects[self.closing_boundaries_key]["position"][3]
 
-        #implement algorithm for items of interest around tank
-        for key_object in self.objects:
-            object_game = self.objects[key_object]
-
-            #Skip boundaries 
-            if object_game["type"] == ObjectTypes.CLOSING_BOUNDARY.value or object_game["type"] == ObjectTypes.BOUNDARY.value:
-                continue
+        #Keep the occupancy grid up to date, only the changed cells are replanned
+        changed_cells = self.occupancy_grid.set_closing_boundary(self.objects[self.closing_boundaries_key]["position"])
+        for key_object, object_game in removed_objects:
+            if object_game["type"] == ObjectTypes.DESTRUCTIBLE_WALL.value:
+                changed_cells += self.occupancy_grid.remove_wall(object_game["position"])
+                self.line_of_sight.remove_wall(key_object)
+                self.threat_field.remove_wall(key_object)
+        if changed_cells:
+            self.incremental_planner.update_cells(changed_cells)
+        started = profiler.lap("boundary_and_walls", started)
+        bounds, bounds_velocity = self.closing_bounds()
+        bullets = self.object_store.bullet_arrays
+        others = ~bullets.owned
+        enemy_position = self.enemy_prediction()[0]
+        self.threat_field.update(bounds, bullets.positions[others], bullets.velocities[others], enemy_position)
+        self.powerup_selector.update_context(self.my_tank.position, enemy_position, bounds, bounds_velocity)
+        started = profiler.lap("fields", started)
 
-
-            #Automaticly add Health and Damage/ Avoid Speed(try not to go there)
-            if object_game["type"] == ObjectTypes.POWERUP.value:
-                if object_game["powerup_type"] == "HEALTH" or object_game["powerup_type"] == "DAMAGE":
-                    self.tank_detectable_object[key_object] = object_game
-
-                    #Initialise PU target
-                    # if self.tank_current_PU_target is None:
-                    #     self.tank_current_PU_target = key_object
-                    continue
-            #Check if near 500 unit of TANK
-            #TODO: Check distance of object between tank Eliminate if too far
-            object_pos = object_game["position"]
-            distance_from_object = self.get_target_distance_from_tank(object_pos)
-
-            #Detectable range 500, remove anything not in range
-            if distance_from_object > 500:
-                try:
-                    del self.tank_detectable_object[key_object]
-                except KeyError:
-                    pass
+        #implement algorithm for items of interest around tank
+        #Only the dynamic indexes are scanned, walls and boundaries never change what the tank detects
+
+        #Automaticly add Health and Damage/ Avoid Speed(try not to go there)
+        for key_object, object_game in self.object_store.powerups.items():
+            if object_game["powerup_type"] == "HEALTH" or object_game["powerup_type"] == "DAMAGE":
+                self.tank_detectable_object[key_object] = object_game
+
+        #Check if enemy is near detect_range unit of TANK
+        tanks_in_range = dict(self.spatial_index.query_radius(
+            self.my_tank.position, self.detect_range, ObjectTypes.TANK.value))
+        for key_object in self.object_store.tanks:
+            if key_object == self.tank_id:
                 continue
-            # DO something with it
-            match object_game["type"]:
-                case ObjectTypes.TANK.value:
-                    if key_object == self.tank_id:
-                        continue
-                    else:
-                        # add object to tank_detectable_object
-                        self.tank_detectable_object[key_object] = object_game
-                        pass
-                case ObjectTypes.BULLET.value:
-                    # add object to tank_detectable_object
-                    continue
-                case ObjectTypes.WALL.value:
-                    # Detect if it is so near, get other directionn
-                    # add object to tank_detectable_object
-                    continue
-                case ObjectTypes.DESTRUCTIBLE_WALL.value:
-                    # add object to tank_detectable_object
-                    #self.tank_detectable_object[key_object] = object_game
-                    continue
-                case _:
-                    continue
-
+            #Detectable range, remove anything not in range
+            if key_object in tanks_in_range:
+                self.tank_detectable_object[key_object] = tanks_in_range[key_object]
+            else:
+                self.tank_detectable_object.pop(key_object, None)
+        profiler.count("objects_scanned", len(self.object_store.powerups) + len(self.object_store.tanks))
+        profiler.lap("detect", started)
+
+        if self.turn_sampled:
+            read_finished = time.perf_counter()
+            self.read_seconds = read_finished - self.turn_started
+            self.turn_started = read_finished
         return True
     
+    def enemy_prediction(self, seconds=0.0):
+        """
+        Where the enemy will be `seconds` from this turn and its velocity then, from the tracker (the last reported
+        state until the enemy was reported once).
+        :return: ((x, y), (vx, vy))
+        """
+        prediction = self.enemy_tracker.predict(self.turn, seconds)
+        if prediction is None:
+            return self.enemy_tank.position, self.enemy_tank.velocity
+        return prediction
+
     def get_target_distance_from_tank(self, target_pos):
         """
         get distance from own tank to target object
         object_type: Powerup, Tank, Bullet
         """
 
-        return math.sqrt((target_pos[0] - self.my_tank_dict["position"][0])**2 + (target_pos[1] - self.my_tank_dict["position"][1])**2)
+        return math.hypot(target_pos[0] - self.my_tank.x, target_pos[1] - self.my_tank.y)
     
+    def get_next_waypoint(self, target_pos, goal_radius=0.0, moving_target=False):
+        """
+        Plan a path around the walls to target_pos and return the first waypoint, the furthest point that can be
+        reached in a straight line. This is what we send as "path" so the server never has to route through walls.
+        :param goal_radius: stop within this distance of the target instead of on it
+        :param moving_target: plan from scratch with A* (e.g. the enemy), otherwise the incremental planner keeps its
+            search between ticks
+        :return: [x, y] or None if there is no path or we are already there
+        Both planners stop at the turn deadline with their best answer so far.
+        """
+        if moving_target or goal_radius:
+            waypoints = self.path_planner.plan(self.my_tank.position, target_pos, goal_radius,
+                                               deadline=self.turn_deadline)
+        else:
+            self.incremental_planner.set_goal(target_pos)
+            waypoints = self.incremental_planner.plan(self.my_tank.position, deadline=self.turn_deadline)
+        if not waypoints:
+            return None
+        return waypoints[0]
+
     def create_path_to_enemy_tank(self, tank_pos):
         """
-        num_points and radius is hardcoded values
+        Path to a point within radius of the enemy, planned around the walls.
+        num_points and radius come from params, the points on the circle are only used if the planner fails and the
+        cheapest of them (distance and threat field) is taken
         """
-        num_points = 6
-        radius = 80
+        num_points = self.params["attack_ring_points"]
+        radius = self.params["attack_radius"]
+
+        waypoint = self.get_next_waypoint(tank_pos, radius, moving_target=True)
+        if waypoint is not None:
+            return [math.ceil(waypoint[0]), math.ceil(waypoint[1])]
 
         min_distance = 9999
         coord_out = None
@@ -227,7 +478,8 @@ class Game:
             angle = 2 * math.pi * i / num_points
             x = tank_pos[0] + radius * math.cos(angle)
             y = tank_pos[1] + radius * math.sin(angle)
-            distance = self.get_target_distance_from_tank([x, y])
+            #Rather a point out of harm's way, one radius of detour per unit of threat
+            distance = self.get_target_distance_from_tank([x, y]) + radius * self.threat_field.cost_at([x, y])
             if distance < min_distance:
                 min_distance = distance
                 coord_out = [math.ceil(x), math.ceil(y)]
@@ -241,6 +493,41 @@ class Game:
         """
         return random.randint(1,360)
     
+    def closing_bounds(self):
+        """
+        :return: (min_x, min_y, max_x, max_y) of the closing boundary and how fast each of them moves (None if the
+            server does not tell)
+        """
+        closing_boundary = self.objects[self.closing_boundaries_key]
+        top_left, bot_left, bot_right, top_right = closing_boundary["position"]
+        bounds = (bot_left[0], bot_left[1], top_right[0], top_right[1])
+        bounds_velocity = None
+        if "velocity" in closing_boundary:
+            velocity = closing_boundary["velocity"]
+            bounds_velocity = (velocity[1][0], velocity[1][1], velocity[3][0], velocity[3][1])
+        return bounds, bounds_velocity
+
+    def plan_move_direction(self, low=None, high=None):
+        """
+        Safest heading for the next second: walls, incoming bullets and the closing boundary are simulated for every
+        candidate heading (see HeadingPlanner) on top of the threat field, with a pull towards its cheapest nearby cell.
+        :param low, high: only headings in this range of degrees (high may go past 360)
+        :return: angle, a random one if the planner has no answer
+        """
+        bullets = self.object_store.bullet_arrays
+        others = ~bullets.owned
+        bounds, bounds_velocity = self.closing_bounds()
+        #The cheapest cell of the threat field within reach
+        goal = self.threat_field.best_nearby(self.my_tank.position, self.heading_planner.horizon * TANK_SPEED)
+        allowed = None if low is None else self.heading_planner.allowed_mask(low, high)
+        angle = self.heading_planner.plan(
+            self.occupancy_grid, self.my_tank.position, bullet_positions=bullets.positions[others],
+            bullet_velocities=bullets.velocities[others], bounds=bounds, bounds_velocity=bounds_velocity, goal=goal,
+            allowed=allowed, deadline=self.turn_deadline, field=self.threat_field)
+        if angle is None:
+            return self.go_random_direction() if low is None else random.randint(low, high)
+        return angle
+
     def distance_tank_to_boundary(self, first_v_pos, second_v_pos):
         """
         Check distance between tank and boundary line
@@ -250,7 +537,7 @@ class Game:
         NOTE: There are 4 Plane (TOP, LEFT, BOT and RIGHT)
         """
         # Calculate the perpendicular distance from the point (x0, y0) to the line (x1, y1)-(x2, y2)
-        x0, y0 = self.my_tank_dict["position"][0], self.my_tank_dict["position"][1]
+        x0, y0 = self.my_tank.x, self.my_tank.y
         x1, y1 = first_v_pos[0], first_v_pos[1]
         x2, y2 = second_v_pos[0], second_v_pos[1]
         numerator = abs((y2 - y1) * x0 - (x2 - x1) * y0 + x2 * y1 - y2 * x1)
@@ -261,10 +548,10 @@ class Game:
 
     def get_other_direction_if_near_boundary(self):
         """
-        Get other random direction if near boundary
-        NOTE: Find optimal value for define_near 
+        Get other direction if near boundary, the planned one within the range that points away from it
+        NOTE: define_near is tuned as params["boundary_margin"]
         """
-        define_near = 90
+        define_near = self.params["boundary_margin"]
 
         #Check all 4 boundaries 
         all_boundaries = {
@@ -305,33 +592,142 @@ class Game:
                     
                 match(plane):
                     case "top_plane":
-                        self.tank_current_movement_direction = random.randint(220,320)
+                        self.tank_current_movement_direction = self.plan_move_direction(220, 320)
                     case "left_plane":
-                        self.tank_current_movement_direction = random.randint(310, 410)
+                        self.tank_current_movement_direction = self.plan_move_direction(310, 410)
                     case "bot_plane":
-                        self.tank_current_movement_direction = random.randint(40,140)
+                        self.tank_current_movement_direction = self.plan_move_direction(40, 140)
                     case "right_plane":
-                        self.tank_current_movement_direction = random.randint(130, 230)
+                        self.tank_current_movement_direction = self.plan_move_direction(130, 230)
                     case _:
                         pass
             case _:
                 pass
     
-    def shoot_direction(self, target_pos):
-        """
-        Courtesy of ChatGPT
-        modified to likings :)
-        """
-        x1, y1 = self.my_tank_dict["position"][0], self.my_tank_dict["position"][1]
-        x2, y2 = target_pos[0], target_pos[1]
-        delta_x = x2 - x1
-        delta_y = y2 - y1
-        theta_radians = math.atan2(delta_y, delta_x)
-        angle_degrees = math.degrees(theta_radians)
-        if angle_degrees < 0:
-            return 360 + angle_degrees
-        return random.uniform(angle_degrees - 3, angle_degrees + 3)
+    def shoot_direction(self, target_pos, target_velocity=(0.0, 0.0)):
+        """
+        Angle to shoot at a target, leading it by its velocity so the bullet meets it (see aiming.lead_angle)
+        """
+        return aiming.lead_angle(self.my_tank.position, target_pos, target_velocity, self.bullet_speed)[0]
+
+    def aim_at_enemy(self):
+        """
+        Angle to shoot at the enemy, leading it along the tracker's predicted (possibly curving) course
+        :return: angle or None if the tracker is too unsure where the enemy will be when the bullet gets there
+        """
+        lead = self.enemy_tracker.lead(self.my_tank.position, self.bullet_speed, self.turn)
+        if lead is None:
+            return self.shoot_direction(self.enemy_tank.position, self.enemy_tank.velocity)
+        angle, seconds = lead
+        if self.enemy_tracker.uncertainty(self.turn, seconds) > self.max_aim_uncertainty:
+            return None
+        return angle
+
+    def get_shoot_direction(self):
+        """
+        Pick what to shoot this tick: the enemy if we see them and no wall stops the shot, otherwise the first destructible wall between us and
+        where we are heading. All candidates are scored in one batch (see aiming.choose_target).
+        :return: angle or None if there is nothing worth shooting
+        """
+        my_position = self.my_tank.position
+        positions, velocities, priorities = [], [], []
+
+        enemy_on_site = self.tank_detectable_object.get(self.enemy_tank_id)
+        if enemy_on_site is not None and self.line_of_sight.blocker(my_position, enemy_on_site["position"]) == SOLID:
+            #A wall no bullet gets through is in the way
+            enemy_on_site = None
+        if enemy_on_site is not None:
+            enemy_position, enemy_velocity = self.enemy_prediction()
+            positions.append(enemy_position)
+            velocities.append(enemy_velocity)
+            priorities.append(10.0)
+
+        target_pos = None
+        if self.tank_state == TankState.ATTACK:
+            target_pos = self.enemy_tank.position
+        elif self.tank_state == TankState.GO_FOR_PU and self.tank_current_PU_target in self.objects:
+            target_pos = self.objects[self.tank_current_PU_target]["position"]
+        if target_pos is not None:
+            walls_in_the_way = self.spatial_index.query_segment(
+                my_position, target_pos, ObjectTypes.DESTRUCTIBLE_WALL.value, WALL_HALF_SIZE + TANK_RADIUS)
+            for _, wall in walls_in_the_way[:1]:
+                if self.get_target_distance_from_tank(wall["position"]) <= self.wall_shoot_range and \
+                        self.line_of_sight.blocker(my_position, wall["position"]) != SOLID:
+                    positions.append(wall["position"])
+                    velocities.append((0.0, 0.0))
+                    priorities.append(1.0)
+
+        if not positions:
+            return None
+        if len(positions) == 1 and enemy_on_site is not None:
+            #Only the enemy, no need for the batch
+            return self.aim_at_enemy()
+        target = aiming.choose_target(my_position, positions, velocities, priorities, self.bullet_speed)
+        if target is None:
+            return None
+        return target[1]
     
+    def is_heading_clear(self, angle, distance=40):
+        """
+        Check if the tank can move distance units at angle without hitting a wall
+        """
+        x, y = self.my_tank.position
+        target = [x + distance * math.cos(math.radians(angle)), y + distance * math.sin(math.radians(angle))]
+        grid = self.occupancy_grid
+        return grid.line_is_free(grid.cell_of([x, y]), grid.cell_of(target))
+
+    def get_dodge_direction(self):
+        """
+        Move angle that takes the tank out of the way of incoming bullets
+        :return: angle or None if no bullet is going to hit us on the current course
+        """
+        bullets = self.object_store.bullet_arrays
+        if not len(bullets):
+            return None
+        position, velocity = self.my_tank.position, self.my_tank.velocity
+        offsets = bullets.positions - position
+        distances_squared = np.einsum("nk,nk->n", offsets, offsets)
+        #Our own bullets never hit us
+        near = np.flatnonzero((distances_squared <= self.dodge_range ** 2) & ~bullets.owned)
+        if not len(near):
+            return None
+        if len(near) > self.dodge_max_bullets_when_late and self.turn_deadline is not None \
+                and self.turn_deadline.expired():
+            #Out of time, the closest bullets are the ones that hit first
+            closest = np.argpartition(distances_squared[near], self.dodge_max_bullets_when_late)
+            near = near[closest[:self.dodge_max_bullets_when_late]]
+        positions, velocities = bullets.positions[near], bullets.velocities[near]
+        if not self.dodge_engine.is_threatened(position, velocity, positions, velocities):
+            return None
+        allowed = [self.is_heading_clear(angle) for angle in self.dodge_engine.headings]
+        return self.dodge_engine.best_move(position, velocity, positions, velocities, allowed=allowed,
+                                           preferred_angle=self.get_strafe_direction())
+
+    def get_strafe_direction(self):
+        """
+        Of the two headings square to the line to the enemy's predicted position, the one closest to our course: moving
+        across the enemy's line of fire makes us the hardest to lead.
+        """
+        enemy_position = self.enemy_prediction(self.attack_lead_seconds)[0]
+        bearing = aiming.angle_to(self.my_tank.position, enemy_position)
+        course = self.tank_current_movement_direction
+        if course is None:
+            course = math.degrees(math.atan2(self.my_tank.vy, self.my_tank.vx))
+        return min(((bearing + 90) % 360, (bearing - 90) % 360),
+                   key=lambda angle: abs((angle - course + 180) % 360 - 180))
+
+    def send_path(self, suggested_path):
+        """
+        Whether suggested_path should be posted this turn, see PathGovernor. Follows self.tank_current_path, a path
+        dropped elsewhere (None) is always replaced.
+        """
+        if self.tank_current_path is None:
+            self.path_governor.invalidate()
+        if self.path_governor.request(self.my_tank.position, suggested_path) is None:
+            return False
+        self.tank_current_path = suggested_path
+        return True
+
     def check_if_tank_in_optimal_velocity(self):
         """
         Check velocity of the tank, if they are in optimal velocity
@@ -339,17 +735,65 @@ class Game:
         True if tank in optimal velocity
         False if not
         """
-        tank_velocity_float = self.my_tank_dict["velocity"]
-        current_tank_velocity = math.sqrt(tank_velocity_float[0]**2 + tank_velocity_float[1]**2)
+        current_tank_velocity = self.my_tank.speed
         if current_tank_velocity > self.optimal_velocity:
             return True
         else:
             return False
         
 
+    def get_fallback_action(self):
+        """
+        Cheapest safe response: keep moving on the current heading and shoot at the enemy if we see them past the walls.
+        Posted when deciding the turn failed, so we never miss a turn.
+        """
+        if self.tank_current_movement_direction is None:
+            #Downhill on the threat field, it is already up to date for this tick
+            self.tank_current_movement_direction = self.threat_field.steer(self.my_tank.position)
+        if self.tank_current_movement_direction is None:
+            self.tank_current_movement_direction = self.go_random_direction()
+        post_message = {"move": self.tank_current_movement_direction}
+        enemy_on_site = self.tank_detectable_object.get(self.enemy_tank_id)
+        if enemy_on_site is not None and self.line_of_sight.blocker(self.my_tank.position,
+                                                                    enemy_on_site["position"]) != SOLID:
+            shoot_direction = self.aim_at_enemy()
+            if shoot_direction is not None:
+                post_message["shoot"] = shoot_direction
+        return post_message
+
     def respond_to_turn(self):
         """
         This is where you should write your bot code to process the data and respond to the game.
+        The decision has to fit in the turn deadline: path planning gets what is left of it and returns its best path
+        so far, dodging and aiming run in the reserve. If anything goes wrong the fallback action is posted instead.
+        """
+        profiler = self.profiler
+        started = profiler.mark()
+        try:
+            post_message = self.decide_turn()
+        except Exception:
+            #Keep the bot alive, the traceback goes to stderr (stdout belongs to the game server)
+            traceback.print_exc(file=sys.stderr)
+            post_message = self.get_fallback_action()
+            profiler.count("fallbacks")
+        started = profiler.lap("decide", started)
+        comms.post_message(post_message)
+        self.path_governor.record_turn(post_message)
+        profiler.lap("post", started)
+        profiler.count("turns")
+        if "path" in post_message:
+            profiler.count("paths_sent")
+        profiler.end_turn()
+
+        if self.turn_sampled:
+            self.telemetry.record(
+                self.turn, self.tick, self.tank_state.name, post_message, self.read_seconds,
+                time.perf_counter() - self.turn_started, comms.transport.last_coalesced,
+                list(self.tank_detectable_object) if self.telemetry.level >= Level.DEBUG else None)
+
+    def decide_turn(self):
+        """
+        Update the tank state and build this turn's message.
         """
         pause_tick = False
         
@@ -361,17 +805,16 @@ class Game:
         #Check if tank is not moving on optimum speed
         if self.check_if_tank_in_optimal_velocity() is False:
             # change movement direction
-            self.tank_current_movement_direction = self.go_random_direction()
+            self.tank_current_movement_direction = self.plan_move_direction()
 
         #Check if there is important powerups!! when defensive mode
         if self.tank_state is TankState.DEFENSIVE and self.check_pu < 0:
-            self.check_pu = 10
-            for key in self.tank_detectable_object:
-                object_game = self.tank_detectable_object[key]
-                if object_game["type"] is ObjectTypes.POWERUP.value:
-                    self.tank_current_PU_target = key
-                    self.tank_state = TankState.GO_FOR_PU
-                    break
+            self.check_pu = self.params["powerup_check_interval"]
+            #Best scored powerup, see PowerupSelector
+            powerup_id = self.powerup_selector.best()
+            if powerup_id is not None and powerup_id in self.tank_detectable_object:
+                self.tank_current_PU_target = powerup_id
+                self.tank_state = TankState.GO_FOR_PU
 
         #If current path is initialised
 
@@ -379,7 +822,7 @@ class Game:
             case TankState.DEFENSIVE:
                 #Check init stage - DEFENSIVE is always init
                 if self.tank_current_movement_direction is None and self.tank_current_path is None:
-                    self.tank_current_movement_direction = self.go_random_direction()
+                    self.tank_current_movement_direction = self.plan_move_direction()
                 
                 #If Path is None keep moving
                 if self.tank_current_path is None:
@@ -390,12 +833,11 @@ class Game:
             case TankState.ATTACK:
 
                 #Check create path to enemy tank
-                suggested_path = self.create_path_to_enemy_tank(self.enemy_tank_dict["position"])
-                if self.tank_current_path is None or self.tank_current_path != suggested_path:
-                    self.tank_current_path = suggested_path
+                suggested_path = self.create_path_to_enemy_tank(self.enemy_prediction(self.attack_lead_seconds)[0])
+                if self.send_path(suggested_path):
                     post_message["path"] = suggested_path
                 
-                if self.my_tank_dict["velocity"] == [0.0,0.0]:
+                if self.my_tank.velocity == (0.0, 0.0):
                     self.tank_state = TankState.DEFENSIVE
 
                     #re-initialise var
@@ -406,8 +848,9 @@ class Game:
             case TankState.GO_FOR_PU:
                 try:
                     pause_tick = True
-                    if self.tank_current_path is None or self.tank_current_path != self.tank_detectable_object[self.tank_current_PU_target]["position"]:
-                        self.tank_current_path = self.tank_detectable_object[self.tank_current_PU_target]["position"]
+                    powerup_position = self.tank_detectable_object[self.tank_current_PU_target]["position"]
+                    suggested_path = self.get_next_waypoint(powerup_position) or powerup_position
+                    if self.send_path(suggested_path):
                         post_message["path"] = self.tank_current_path
                 except KeyError:
                     self.tank_state = TankState.DEFENSIVE
@@ -420,19 +863,22 @@ class Game:
             case _:
                 pass
         
-        print(self.tank_state, file=sys.stderr)
-        print(self.tank_detectable_object, file=sys.stderr)
         #Check object surrounding tank
         self.get_other_direction_if_near_boundary()
+        #Dodge incoming bullets, this overrides any path for this tick
+        dodge_direction = self.get_dodge_direction()
+        if dodge_direction is not None:
+            post_message.pop("path", None)
+            post_message["move"] = dodge_direction
+            self.tank_current_movement_direction = dodge_direction
+            self.tank_current_path = None
         #Post message
-        #Check if enemy detectable -> Shoot whenever u see them
-        try:
-            enemy_on_site = self.tank_detectable_object[self.enemy_tank_id]
-            post_message["shoot"] = self.shoot_direction(enemy_on_site["position"])
-        except KeyError:
-            pass
+        #Check if enemy detectable -> Shoot whenever u see them, or clear walls on the way
+        shoot_direction = self.get_shoot_direction()
+        if shoot_direction is not None:
+            post_message["shoot"] = shoot_direction
         if not pause_tick:
             self.tick += 1
-        if self.tick > 15:
+        if self.tick > self.params["attack_after_ticks"]:
             self.tank_state = TankState.ATTACK
-        comms.post_message(post_message)
+        return post_message
@@ -0,0 +1,135 @@
+import math
+import typing
+
+from pathfinding import WALL_HALF_SIZE
+from spatial_index import segment_cells
+
+
+# What a ray meets first in order of severity: nothing, only destructible walls (a bullet would clear the first one),
+# or a wall no bullet gets through
+CLEAR = 0
+DESTRUCTIBLE = 1
+SOLID = 2
+
+
+class LineOfSight:
+    """
+    Ray casts against the walls: "what stops a bullet going from A to B?".
+
+    Walls are axis aligned squares, bucketed once in a uniform grid (a wall is in every bucket its square overlaps), so
+    a cast only tests the walls of the buckets the segment crosses (grid traversal / DDA) and stops at the first SOLID
+    one. Answers are memoized per pair of coarse cells, cast between the cell centres, so all checks within
+    `memo_resolution` of the same points share one cast. Removing a destructible wall drops the answers it was part of.
+    """
+    def __init__(self, bucket_size=50, memo_resolution=10, margin=2.0, max_memo=50000):
+        self.bucket_size = bucket_size
+        self.memo_resolution = memo_resolution
+        # Walls grow by this much, bullets are not points
+        self.half_size = WALL_HALF_SIZE + margin
+        self.max_memo = max_memo
+        # (bucket_x, bucket_y) -> {wall-id: (min_x, min_y, max_x, max_y, kind)}
+        self.buckets = {}
+        # wall-id -> buckets it is in
+        self.wall_buckets = {}
+        # (cell_a, cell_b) -> CLEAR/DESTRUCTIBLE/SOLID, and destructible wall-id -> memo keys that went through it
+        self.memo = {}
+        self.dependents = {}
+        self.casts = 0
+        self.memo_hits = 0
+
+    def add_wall(self, wall_id, position, destructible=False):
+        x, y = position[0], position[1]
+        half = self.half_size
+        box = (x - half, y - half, x + half, y + half, DESTRUCTIBLE if destructible else SOLID)
+        size = self.bucket_size
+        buckets = [(bucket_x, bucket_y)
+                   for bucket_x in range(math.floor(box[0] / size), math.floor(box[2] / size) + 1)
+                   for bucket_y in range(math.floor(box[1] / size), math.floor(box[3] / size) + 1)]
+        for bucket in buckets:
+            self.buckets.setdefault(bucket, {})[wall_id] = box
+        self.wall_buckets[wall_id] = buckets
+        #Casts made before this wall existed may be wrong now
+        self.memo.clear()
+        self.dependents.clear()
+
+    def remove_wall(self, wall_id):
+        """
+        Forget a wall (a destroyed destructible wall) and the memoized answers it took part in, unknown ids are
+        ignored.
+        """
+        buckets = self.wall_buckets.pop(wall_id, None)
+        if buckets is None:
+            return
+        for bucket in buckets:
+            walls = self.buckets[bucket]
+            del walls[wall_id]
+            if not walls:
+                del self.buckets[bucket]
+        for key in self.dependents.pop(wall_id, ()):
+            self.memo.pop(key, None)
+
+    def blocker(self, start, end) -> int:
+        """
+        Severity of what stands between start and end, memoized by coarse cell pair.
+        :return: CLEAR, DESTRUCTIBLE or SOLID
+        """
+        resolution = self.memo_resolution
+        cell_a = (int(start[0] // resolution), int(start[1] // resolution))
+        cell_b = (int(end[0] // resolution), int(end[1] // resolution))
+        # Same answer both ways
+        key = (cell_a, cell_b) if cell_a <= cell_b else (cell_b, cell_a)
+        result = self.memo.get(key)
+        if result is not None:
+            self.memo_hits += 1
+            return result
+
+        if len(self.memo) >= self.max_memo:
+            self.memo.clear()
+            self.dependents.clear()
+        result, crossed = self.cast(((key[0][0] + 0.5) * resolution, (key[0][1] + 0.5) * resolution),
+                                    ((key[1][0] + 0.5) * resolution, (key[1][1] + 0.5) * resolution))
+        self.memo[key] = result
+        if result == DESTRUCTIBLE:
+            for wall_id in crossed:
+                self.dependents.setdefault(wall_id, set()).add(key)
+        return result
+
+    def cast(self, start, end) -> typing.Tuple[int, typing.List[str]]:
+        """
+        Uncached ray cast.
+        :return: the severity and, unless SOLID, the ids of the destructible walls crossed
+        """
+        self.casts += 1
+        x0, y0 = start[0], start[1]
+        dx, dy = end[0] - x0, end[1] - y0
+        buckets = self.buckets
+        tested = set()
+        crossed = []
+        for bucket in segment_cells(start, end, self.bucket_size):
+            walls = buckets.get(bucket)
+            if walls is None:
+                continue
+            for wall_id, (min_x, min_y, max_x, max_y, kind) in walls.items():
+                if wall_id in tested:
+                    continue
+                tested.add(wall_id)
+                #Slab test of the segment against the square
+                t_enter, t_exit = 0.0, 1.0
+                for origin, delta, low, high in ((x0, dx, min_x, max_x), (y0, dy, min_y, max_y)):
+                    if delta == 0.0:
+                        if origin < low or origin > high:
+                            t_enter = 2.0
+                            break
+                        continue
+                    t_low, t_high = (low - origin) / delta, (high - origin) / delta
+                    if t_low > t_high:
+                        t_low, t_high = t_high, t_low
+                    t_enter, t_exit = max(t_enter, t_low), min(t_exit, t_high)
+                    if t_enter > t_exit:
+                        break
+                if t_enter > t_exit:
+                    continue
+                if kind == SOLID:
+                    return SOLID, []
+                crossed.append(wall_id)
+        return (DESTRUCTIBLE if crossed else CLEAR), crossed
@@ -0,0 +1,195 @@
+import random
+import time
+import typing
+
+import numpy as np
+
+from pathfinding import OccupancyGrid, TANK_RADIUS, TANK_SPEED
+
+
+class HeadingPlanner:
+    """
+    Monte Carlo lookahead for the move angle: every candidate heading is rolled out a few ticks ahead, many times
+    with some noise on our heading and on the bullets, and scored on safety and progress. All rollouts of a batch are
+    one NumPy computation, shaped (headings, samples, steps[, bullets]).
+
+    What a rollout checks, step by step over the horizon:
+    - walls and the current boundary: the occupancy grid cells (already inflated by the tank radius); the tank stops
+      at the first blocked cell, like the server stops it
+    - bullets: closest approach between the tank and every bullet during each step (both move in straight lines)
+    - the closing boundary: distance to the rectangle it will have shrunk to at that time
+
+    Samples are evaluated in batches until `samples` is reached, the next batch would not fit before the deadline or
+    would take the work (headings x samples x bullets x steps) past `max_work`, so the planner always answers within
+    the tick and many bullets cost fewer samples instead of more time. The first batch always runs.
+    :param horizon: seconds to look ahead, split in `steps` steps
+    :param heading_noise: standard deviation in degrees of the heading we actually end up following
+    :param bullet_noise: standard deviation of the bullet positions, as a fraction of the distance they fly in a step
+    :param field_weight: weight of the threat field (see ThreatField) along the way, if plan is given one
+    :param max_elements: cap on the size of the per bullet temporaries, more bullets are checked in chunks
+    """
+    def __init__(self, num_headings=24, horizon=1.0, steps=10, samples=8, batch=4, heading_noise=8.0,
+                 bullet_noise=0.2, radius=TANK_RADIUS + 5, boundary_margin=90, goal_weight=0.5, field_weight=0.5,
+                 max_elements=16384, max_work=32768, seed=None):
+        self.headings = np.arange(num_headings) * (360.0 / num_headings)
+        self.horizon = horizon
+        self.steps = steps
+        self.samples = samples
+        self.batch = batch
+        self.heading_noise = heading_noise
+        self.bullet_noise = bullet_noise
+        self.radius = radius
+        self.boundary_margin = boundary_margin
+        self.goal_weight = goal_weight
+        self.field_weight = field_weight
+        self.max_elements = max_elements
+        self.max_work = max_work
+        # Seeded from `random` so runs with a fixed random.seed are reproducible
+        self.rng = np.random.default_rng(random.getrandbits(32) if seed is None else seed)
+        self.times = np.arange(1, steps + 1) * (horizon / steps)
+        self.last_samples = 0
+
+    def allowed_mask(self, low, high) -> np.ndarray:
+        """
+        Headings within [low, high] degrees, the range may wrap around (e.g. 310 to 410).
+        """
+        return (self.headings - low) % 360.0 <= (high - low)
+
+    def plan(self, grid: OccupancyGrid, tank_pos, speed=TANK_SPEED, bullet_positions=None, bullet_velocities=None,
+             bounds=None, bounds_velocity=None, goal=None, allowed=None, deadline=None,
+             field=None) -> typing.Optional[float]:
+        """
+        :param bounds: (min_x, min_y, max_x, max_y) of the closing boundary, bounds_velocity how fast each moves
+        :param goal: optional point to make progress towards
+        :param allowed: optional boolean mask over self.headings
+        :param field: optional ThreatField, its mean cost along each rollout is a penalty
+        :return: best heading in degrees, None if no heading is allowed
+        """
+        if allowed is not None and not np.any(allowed):
+            return None
+        if bullet_positions is None or len(bullet_positions) == 0:
+            bullet_positions = bullet_velocities = np.zeros((0, 2))
+        else:
+            bullet_positions, bullet_velocities = self.reachable_bullets(tank_pos, speed, bullet_positions,
+                                                                         bullet_velocities)
+
+        # Rollout elements per sample, the bullet check is the bulk of the work
+        sample_work = len(self.headings) * max(1, len(bullet_positions)) * self.steps
+        total = np.zeros(len(self.headings))
+        done = 0
+        while done < self.samples:
+            started = time.perf_counter()
+            total += self.rollout(grid, tank_pos, speed, bullet_positions, bullet_velocities, bounds,
+                                  bounds_velocity, goal, field).sum(axis=1)
+            done += self.batch
+            if (done + self.batch) * sample_work > self.max_work:
+                break
+            # Batches all take about as long, stop if another one would not fit
+            if deadline is not None and deadline.remaining() < time.perf_counter() - started:
+                break
+        self.last_samples = done
+
+        expected = total / done
+        if allowed is not None:
+            expected = np.where(allowed, expected, -np.inf)
+        return float(self.headings[int(np.argmax(expected))])
+
+    def reachable_bullets(self, tank_pos, speed, bullet_positions, bullet_velocities):
+        """
+        Only the bullets that pass within reach of the tank during the horizon can hit any rollout.
+        """
+        offsets = np.asarray(bullet_positions, dtype=np.float64) - tank_pos
+        flight = np.asarray(bullet_velocities, dtype=np.float64) * self.horizon
+        length_squared = np.einsum("nk,nk->n", flight, flight)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.nan_to_num(np.clip(-np.einsum("nk,nk->n", offsets, flight) / length_squared, 0.0, 1.0))
+        closest = offsets + flight * t[:, None]
+        reach = speed * self.horizon + self.radius + self.bullet_noise * np.sqrt(length_squared) / self.steps * 3
+        near = np.einsum("nk,nk->n", closest, closest) <= reach ** 2
+        return bullet_positions[near], bullet_velocities[near]
+
+    def bullet_hits(self, tank, bullets) -> np.ndarray:
+        """
+        :param tank: tank positions (H, S, T + 1, 2), bullets: bullet positions (S, N, T + 1, 2)
+        :return: (H, S, T), whether any of the bullets comes within radius of the tank during each step
+        """
+        # x and y apart, (H, S, N, T + 1) each
+        relative_x = bullets[None, :, :, :, 0] - tank[:, :, None, :, 0]
+        relative_y = bullets[None, :, :, :, 1] - tank[:, :, None, :, 1]
+        begin_x, begin_y = relative_x[..., :-1], relative_y[..., :-1]
+        delta_x, delta_y = np.diff(relative_x, axis=-1), np.diff(relative_y, axis=-1)
+        length_squared = delta_x * delta_x + delta_y * delta_y
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.nan_to_num(np.clip(-(begin_x * delta_x + begin_y * delta_y) / length_squared, 0.0, 1.0))
+        closest_x, closest_y = begin_x + delta_x * t, begin_y + delta_y * t
+        return (closest_x * closest_x + closest_y * closest_y <= self.radius ** 2).any(axis=2)
+
+    def rollout(self, grid, tank_pos, speed, bullet_positions, bullet_velocities, bounds, bounds_velocity,
+                goal, field=None) -> np.ndarray:
+        """
+        One batch of rollouts.
+        :return: scores (headings, batch)
+        """
+        num_headings, batch, steps = len(self.headings), self.batch, self.steps
+        start = np.asarray(tank_pos, dtype=np.float64)
+        reach = speed * self.horizon
+
+        # Tank positions (H, S, T, 2), stopped at the first blocked cell
+        angles = np.radians(self.headings[:, None] + self.rng.normal(0.0, self.heading_noise, (num_headings, batch)))
+        directions = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+        positions = start + directions[:, :, None, :] * (speed * self.times)[None, None, :, None]
+        cells = np.frombuffer(grid.cells, dtype=np.uint8)
+        cols = np.clip((positions[..., 0] // grid.resolution).astype(np.intp), 0, grid.cols - 1)
+        rows = np.clip((positions[..., 1] // grid.resolution).astype(np.intp), 0, grid.rows - 1)
+        blocked = cells[rows * grid.cols + cols] == OccupancyGrid.BLOCKED
+        free_steps = np.where(blocked.any(axis=2), blocked.argmax(axis=2), steps)
+        last_free = np.minimum(np.arange(steps)[None, None, :], free_steps[:, :, None] - 1)
+        positions = np.where(last_free[..., None] >= 0,
+                             np.take_along_axis(positions, np.maximum(last_free, 0)[..., None], axis=2),
+                             start)
+        travelled = free_steps / steps
+
+        score = travelled.copy()
+
+        # Bullets: closest approach during each step, on the relative motion
+        if len(bullet_positions):
+            step_seconds = self.horizon / steps
+            noise = self.rng.normal(0.0, self.bullet_noise, (batch, len(bullet_positions), 2)) * \
+                np.linalg.norm(bullet_velocities, axis=1)[None, :, None] * step_seconds
+            # (S, N, T + 1, 2), including the current positions
+            times = np.concatenate([[0.0], self.times])
+            bullets = (bullet_positions[None, :, None, :] + noise[:, :, None, :]
+                       + bullet_velocities[None, :, None, :] * times[None, None, :, None]).astype(np.float32)
+            tank = np.concatenate([np.broadcast_to(start, (num_headings, batch, 1, 2)), positions],
+                                  axis=2).astype(np.float32)
+            # (H, S, T): is any bullet hitting us during step k. The bullets go through in chunks so the (H, S, N, T)
+            # temporaries stay within max_elements however many bullets there are
+            hit_steps = np.zeros((num_headings, batch, steps), dtype=bool)
+            chunk = max(1, self.max_elements // (num_headings * batch * (steps + 1)))
+            for first in range(0, len(bullet_positions), chunk):
+                hit_steps |= self.bullet_hits(tank, bullets[:, first:first + chunk])
+            hit = hit_steps.any(axis=2)
+            first_hit = np.where(hit, hit_steps.argmax(axis=2), steps)
+            # The sooner, the worse
+            score -= np.where(hit, 10.0 * (2.0 - first_hit / steps), 0.0)
+
+        # Closing boundary, where it will be at each step
+        if bounds is not None:
+            bounds = np.asarray(bounds, dtype=np.float64)
+            velocity = np.zeros(4) if bounds_velocity is None else np.asarray(bounds_velocity, dtype=np.float64)
+            future = bounds[None, :] + velocity[None, :] * self.times[:, None]
+            margin = np.minimum.reduce([
+                positions[..., 0] - future[None, None, :, 0], future[None, None, :, 2] - positions[..., 0],
+                positions[..., 1] - future[None, None, :, 1], future[None, None, :, 3] - positions[..., 1],
+            ]).min(axis=2)
+            score -= np.where(margin < self.radius, 5.0, np.clip(1.0 - margin / self.boundary_margin, 0.0, 1.0))
+
+        if goal is not None:
+            goal = np.asarray(goal, dtype=np.float64)
+            final = positions[:, :, -1, :]
+            progress = np.linalg.norm(goal - start) - np.linalg.norm(final - goal, axis=-1)
+            score += self.goal_weight * progress / reach
+
+        if field is not None:
+            score -= self.field_weight * field.costs_at(positions).mean(axis=2)
+        return score
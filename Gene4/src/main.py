@@ -3,10 +3,13 @@ This is your starting point for a Python bot. It will read and store the game in
 with an action. For now, this action is just shooting with a random angle. Write your own logic in game.py.
 """
 
+import comms
 from game import Game
 
 
 if __name__ == "__main__":
+    #Parse messages as they arrive and merge the turns we fall behind on
+    comms.transport.start_reader()
     game = Game()
     while game.read_next_turn_data():
         game.respond_to_turn()
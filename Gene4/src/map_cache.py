@@ -0,0 +1,102 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import typing
+
+import numpy as np
+
+
+# Bump when what is cached or how it is computed changes, older entries are then never hit again
+FORMAT_VERSION = 1
+# Next to the code like params.json, so entries prewarmed before the image is built ship with the bot (the Dockerfile
+# copies src/) and hit in a fresh container. See tools/README.md for prewarming.
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "map_cache")
+
+
+class MapCache:
+    """
+    The static analysis of a map (occupancy grid cells, the wall layer of the threat field), kept on disk between
+    matches so a map seen before does not have to be rasterized again.
+
+    Entries are keyed by a hash of the map size, the analysis parameters and the walls at END_INIT (type and position,
+    not their ids, which change from match to match). An entry is a directory of .npy files named after the arrays;
+    they are opened memory-mapped, so a hit costs a few file opens and a copy into the live structures.
+    Entries are written to a temporary directory renamed into place, a reader never sees half an entry, and any
+    entry that fails to load is treated as a miss.
+
+    Configured from the environment (see `from_env`):
+    - MAP_CACHE_DIR: where the entries live (default DEFAULT_DIRECTORY, map_cache next to this module), empty to
+      disable
+    """
+    def __init__(self, directory=None):
+        self.directory = directory or None
+        self.enabled = self.directory is not None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, environ=None) -> "MapCache":
+        environ = os.environ if environ is None else environ
+        return cls(directory=environ.get("MAP_CACHE_DIR", DEFAULT_DIRECTORY))
+
+    @staticmethod
+    def key(width, height, walls: typing.Iterable[typing.Sequence[float]],
+            destructible_walls: typing.Iterable[typing.Sequence[float]], params: typing.Sequence = ()) -> str:
+        """
+        :param walls, destructible_walls: positions of the walls of each kind
+        :param params: anything else the cached arrays depend on, e.g. grid resolutions
+        """
+        digest = hashlib.sha1(repr((FORMAT_VERSION, float(width), float(height), tuple(params))).encode())
+        for kind, positions in ((b"W", walls), (b"D", destructible_walls)):
+            layout = np.array(sorted((float(position[0]), float(position[1])) for position in positions),
+                              dtype=np.float64)
+            digest.update(kind)
+            digest.update(layout.tobytes())
+        return digest.hexdigest()
+
+    def contains(self, key) -> bool:
+        return self.enabled and os.path.isdir(os.path.join(self.directory, key))
+
+    def load(self, key) -> typing.Optional[typing.Dict[str, np.ndarray]]:
+        """
+        :return: name -> read-only memory-mapped array, None on a miss
+        """
+        if not self.enabled:
+            return None
+        entry = os.path.join(self.directory, key)
+        try:
+            arrays = {name[:-4]: np.load(os.path.join(entry, name), mmap_mode="r", allow_pickle=False)
+                      for name in os.listdir(entry) if name.endswith(".npy")}
+        except (OSError, ValueError):
+            arrays = None
+        if not arrays:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return arrays
+
+    def store(self, key, arrays: typing.Dict[str, np.ndarray]):
+        """
+        Save an entry, failures (read-only or full disk) only cost the next match a miss.
+        """
+        if not self.enabled:
+            return
+        entry = os.path.join(self.directory, key)
+        staging = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=key + ".", dir=self.directory)
+            for name, array in arrays.items():
+                np.save(os.path.join(staging, name + ".npy"), np.ascontiguousarray(array), allow_pickle=False)
+            os.rename(staging, entry)
+            staging = None
+        except OSError:
+            #Another bot stored the same entry first, or the directory is not writable
+            pass
+        finally:
+            if staging is not None:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def stats(self) -> typing.Dict:
+        return {"directory": self.directory, "hits": self.hits, "misses": self.misses}
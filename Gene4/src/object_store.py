@@ -0,0 +1,219 @@
+import math
+import typing
+
+import numpy as np
+
+from object_types import ObjectTypes
+
+
+TANK = ObjectTypes.TANK.value
+BULLET = ObjectTypes.BULLET.value
+
+class TankRecord:
+    """
+    Compact, mutable copy of a tank dict, updated in place so references to it stay valid between ticks.
+    """
+    __slots__ = ("id", "x", "y", "vx", "vy", "hp")
+
+    def __init__(self, object_id):
+        self.id = object_id
+        self.x = self.y = self.vx = self.vy = 0.0
+        self.hp = 0
+
+    def update(self, tank: dict):
+        self.x, self.y = tank["position"]
+        self.vx, self.vy = tank["velocity"]
+        self.hp = tank.get("hp", self.hp)
+
+    @property
+    def position(self) -> typing.Tuple[float, float]:
+        return self.x, self.y
+
+    @property
+    def velocity(self) -> typing.Tuple[float, float]:
+        return self.vx, self.vy
+
+    @property
+    def speed(self) -> float:
+        return math.hypot(self.vx, self.vy)
+
+
+class PointArrays:
+    """
+    Struct-of-arrays for the bullets: contiguous float arrays of positions and velocities, one row per bullet, so
+    consumers can work on all of them with NumPy at once. The other object types stay dicts in ObjectStore, the few
+    that are read every tick have their own compact form (TankRecord, the wall grids built from the walls at init).
+
+    Rows are packed: removing an object moves the last row into its place. Use the `positions`/`velocities`
+    properties, they are views of the live rows (invalidated by the next change).
+    """
+    def __init__(self, capacity=64):
+        self.ids = []
+        self.rows = {}
+        self._positions = np.zeros((capacity, 2), dtype=np.float64)
+        self._velocities = np.zeros((capacity, 2), dtype=np.float64)
+        # True for rows that belong to us (e.g. our own bullets)
+        self._owned = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, object_id):
+        return object_id in self.rows
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._positions[:len(self.ids)]
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self._velocities[:len(self.ids)]
+
+    @property
+    def owned(self) -> np.ndarray:
+        return self._owned[:len(self.ids)]
+
+    def _grow(self, size):
+        capacity = len(self._positions)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self._positions = np.resize(self._positions, (capacity, 2))
+        self._velocities = np.resize(self._velocities, (capacity, 2))
+        self._owned = np.resize(self._owned, capacity)
+
+    def update(self, objects: typing.List[typing.Tuple[str, dict]], own_tank_id=None):
+        """
+        Add or overwrite many objects with one fancy-indexed write per array.
+        :param objects: (object-id, object-dict) pairs
+        :param own_tank_id: new objects with this "tank_id" (our bullets) are flagged as owned
+        """
+        if not objects:
+            return
+        rows = self.rows
+        ids = self.ids
+        self._grow(len(ids) + len(objects))
+        indices = []
+        flat = []
+        new_rows = []
+        new_owned = []
+        get_row, add_index, add_values = rows.get, indices.append, flat.extend
+        for object_id, game_object in objects:
+            row = get_row(object_id)
+            if row is None:
+                row = rows[object_id] = len(ids)
+                ids.append(object_id)
+                new_rows.append(row)
+                new_owned.append(own_tank_id is not None and game_object.get("tank_id") == own_tank_id)
+            add_index(row)
+            add_values(game_object["position"])
+            add_values(game_object["velocity"])
+        values = np.array(flat, dtype=np.float64).reshape(len(indices), 4)
+        indices = np.array(indices, dtype=np.intp)
+        self._positions[indices] = values[:, :2]
+        self._velocities[indices] = values[:, 2:]
+        if new_rows:
+            self._owned[new_rows] = new_owned
+
+    def remove(self, object_id) -> typing.Optional[typing.List[float]]:
+        """
+        :return: the position of the removed object, None if it was not stored
+        """
+        row = self.rows.pop(object_id, None)
+        if row is None:
+            return None
+        position = self._positions[row].tolist()
+        last = len(self.ids) - 1
+        last_id = self.ids.pop()
+        if row != last:
+            self.ids[row] = last_id
+            self.rows[last_id] = row
+            self._positions[row] = self._positions[last]
+            self._velocities[row] = self._velocities[last]
+            self._owned[row] = self._owned[last]
+        return position
+
+
+class ObjectStore:
+    """
+    Every game object by id, plus one index per object type ({object-id: object-dict}).
+    The indexes are kept up to date from the updated_objects/deleted_objects of each message, so the work per tick
+    only depends on the size of the delta. Static objects (walls, boundaries) are only touched once, at init.
+
+    - objects: all objects but the bullets, same format as the old Game.objects
+    - tanks, walls, destructible_walls, boundaries, closing_boundaries, powerups: the per type indexes
+    - tank_records: {object-id: TankRecord}, the tanks we read every tick, updated in place
+    - bullet_arrays: PointArrays of every bullet, our own flagged as owned. Bullets are only kept there, they are
+        only ever looked at all together.
+
+    :param own_tank_id: our tank, to flag our own bullets
+    """
+    def __init__(self, own_tank_id=None):
+        self.own_tank_id = own_tank_id
+        self.objects = {}
+        self.by_type = {object_type.value: {} for object_type in ObjectTypes if object_type.value != BULLET}
+
+        self.tanks = self.by_type[ObjectTypes.TANK.value]
+        self.walls = self.by_type[ObjectTypes.WALL.value]
+        self.destructible_walls = self.by_type[ObjectTypes.DESTRUCTIBLE_WALL.value]
+        self.boundaries = self.by_type[ObjectTypes.BOUNDARY.value]
+        self.closing_boundaries = self.by_type[ObjectTypes.CLOSING_BOUNDARY.value]
+        self.powerups = self.by_type[ObjectTypes.POWERUP.value]
+
+        self.tank_records = {}
+        self.bullet_arrays = PointArrays()
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __contains__(self, object_id):
+        return object_id in self.objects
+
+    def __getitem__(self, object_id):
+        return self.objects[object_id]
+
+    def update(self, updated_objects: typing.Dict[str, dict]):
+        """
+        Add new objects and replace updated ones.
+        """
+        objects = self.objects
+        by_type = self.by_type
+        tank_records = self.tank_records
+        bullets = []
+        for object_id, game_object in updated_objects.items():
+            object_type = game_object["type"]
+            if object_type == BULLET:
+                bullets.append((object_id, game_object))
+                continue
+            if object_type == TANK:
+                record = tank_records.get(object_id)
+                if record is None:
+                    record = tank_records[object_id] = TankRecord(object_id)
+                record.update(game_object)
+            old_object = objects.get(object_id)
+            if old_object is not None and old_object["type"] != object_type:
+                del by_type[old_object["type"]][object_id]
+            objects[object_id] = game_object
+            by_type[object_type][object_id] = game_object
+        self.bullet_arrays.update(bullets, self.own_tank_id)
+
+    def delete(self, deleted_object_ids: typing.Iterable[str]) -> typing.List[typing.Tuple[str, dict]]:
+        """
+        Remove objects, ids we do not know about are ignored.
+        :return: (object-id, object-dict) of every object that was actually removed. Bullets come back as a dict of
+            their type and position only.
+        """
+        removed = []
+        for object_id in deleted_object_ids:
+            game_object = self.objects.pop(object_id, None)
+            if game_object is not None:
+                del self.by_type[game_object["type"]][object_id]
+                self.tank_records.pop(object_id, None)
+            else:
+                position = self.bullet_arrays.remove(object_id)
+                if position is None:
+                    continue
+                game_object = {"type": BULLET, "position": position}
+            removed.append((object_id, game_object))
+        return removed
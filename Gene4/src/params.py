@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import typing
+
+
+# The tuned values are written here by tools/tune.py and shipped with the bot (the Dockerfile copies src/)
+PARAMS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "params.json")
+
+# name -> (default, lowest, highest, is integer). The range is the search space of tools/tune.py
+PARAM_SPACE = {
+    # Below this fraction of the top speed the tank picks a new random direction
+    "optimal_velocity_fraction": (0.5, 0.2, 0.9, False),
+    # Distance to the closing boundary at which the tank turns away from it
+    "boundary_margin": (90, 40, 200, True),
+    # ATTACK stops this far from the enemy, on one of attack_ring_points points around it if the planner fails
+    "attack_radius": (80, 40, 200, True),
+    "attack_ring_points": (6, 3, 12, True),
+    # DEFENSIVE ticks between two looks for powerups
+    "powerup_check_interval": (10, 2, 30, True),
+    # The enemy is only tracked (and shot at) within this distance
+    "detect_range": (500, 200, 900, True),
+    # Ticks spent DEFENSIVE before switching to ATTACK
+    "attack_after_ticks": (15, 0, 60, True),
+}
+
+DEFAULT_PARAMS = {name: default for name, (default, _, _, _) in PARAM_SPACE.items()}
+
+
+def load_params(path: typing.Optional[str] = None) -> typing.Dict[str, float]:
+    """
+    Defaults overridden by the params file: `path`, else the GENE4_PARAMS environment variable, else params.json
+    next to this module if there is one. Unknown names and values that are not numbers are reported on stderr and
+    ignored, and a file that cannot be read or parsed is reported and leaves all the defaults, so a stale or broken
+    file can never stop the bot from starting.
+    """
+    path = path or os.environ.get("GENE4_PARAMS") or PARAMS_FILE
+    params = dict(DEFAULT_PARAMS)
+    if not os.path.exists(path):
+        return params
+    try:
+        with open(path) as params_file:
+            overrides = json.load(params_file)
+    except (OSError, ValueError) as error:
+        print(f"Cannot read parameters from {path}, using the defaults: {error}", file=sys.stderr)
+        return params
+    if not isinstance(overrides, dict):
+        print(f"Parameters in {path} are not a JSON object, using the defaults", file=sys.stderr)
+        return params
+    for name, value in overrides.items():
+        if name not in PARAM_SPACE:
+            print(f"Unknown parameter {name} in {path}", file=sys.stderr)
+            continue
+        try:
+            params[name] = int(round(value)) if PARAM_SPACE[name][3] else float(value)
+        except (TypeError, ValueError):
+            print(f"Parameter {name} in {path} is not a number: {value!r}", file=sys.stderr)
+    return params
@@ -0,0 +1,99 @@
+import math
+import typing
+
+from pathfinding import OccupancyGrid, TANK_RADIUS
+
+
+class PathGovernor:
+    """
+    Decides when a new "path" is worth sending. The server re-plans on every path it gets, so posting a slightly
+    different target every tick makes the tank stutter.
+
+    A target is sent when there is no active path, when it is more than distance_threshold away from the active
+    target, when the direction to it turned more than heading_threshold degrees from the direction to the active one
+    (only checked further than two distance_threshold from us, close by any step is a big turn), or when the active
+    path became invalid: we posted a move since (record_turn), the caller dropped it (invalidate), we are within
+    arrival_distance of the active target and the new one is further (the server is done with that path, the tank
+    stands still) or a wall now stands between us and the active target and the new target is not that same point.
+    Otherwise the request is suppressed.
+
+    Also counts what went out, for the match summary (see stats): paths issued and suppressed, changes of move angle
+    and switches between moving and following a path.
+    """
+    def __init__(self, grid: typing.Optional[OccupancyGrid] = None, distance_threshold=30.0, heading_threshold=20.0,
+                 arrival_distance=TANK_RADIUS):
+        self.grid = grid
+        self.distance_threshold = distance_threshold
+        self.heading_threshold = heading_threshold
+        self.arrival_distance = arrival_distance
+        self.active = None
+
+        self.issued = 0
+        self.suppressed = 0
+        self.move_changes = 0
+        self.mode_switches = 0
+        self.turns = 0
+        self.last_move = None
+        self.last_mode = None
+
+    def invalidate(self):
+        self.active = None
+
+    def request(self, position, target) -> typing.Optional[typing.List[float]]:
+        """
+        :return: target if it should be posted as the new path, None if the active path is close enough
+        """
+        if self.active is not None and self._within_reach(position, self.active) and \
+                not self._within_reach(position, target):
+            self.active = None
+        if self.active is None or self._differs(position, target) or \
+                (target != self.active and not self._still_valid(position)):
+            self.active = target
+            self.issued += 1
+            return target
+        self.suppressed += 1
+        return None
+
+    def _differs(self, position, target) -> bool:
+        active_x, active_y = self.active[0], self.active[1]
+        if math.hypot(target[0] - active_x, target[1] - active_y) > self.distance_threshold:
+            return True
+        if math.hypot(target[0] - position[0], target[1] - position[1]) <= 2 * self.distance_threshold:
+            return False
+        active_heading = math.atan2(active_y - position[1], active_x - position[0])
+        heading = math.atan2(target[1] - position[1], target[0] - position[0])
+        turn = abs((math.degrees(heading - active_heading) + 180) % 360 - 180)
+        return turn > self.heading_threshold
+
+    def _within_reach(self, position, point) -> bool:
+        return math.hypot(point[0] - position[0], point[1] - position[1]) <= self.arrival_distance
+
+    def _still_valid(self, position) -> bool:
+        if self.grid is None:
+            return True
+        grid = self.grid
+        return grid.line_is_free(grid.cell_of(position), grid.cell_of(self.active))
+
+    def record_turn(self, post_message: dict):
+        """
+        Account for the message posted this turn. A move replaces whatever path the server was following.
+        """
+        self.turns += 1
+        mode = "path" if "path" in post_message else "move" if "move" in post_message else self.last_mode
+        if mode != self.last_mode and self.last_mode is not None:
+            self.mode_switches += 1
+        self.last_mode = mode
+        if "move" in post_message:
+            self.active = None
+            if self.last_move is not None and post_message["move"] != self.last_move:
+                self.move_changes += 1
+            self.last_move = post_message["move"]
+
+    def stats(self) -> typing.Dict:
+        return {
+            "paths_issued": self.issued,
+            "paths_suppressed": self.suppressed,
+            "move_changes": self.move_changes,
+            "mode_switches": self.mode_switches,
+            "turns": self.turns,
+        }
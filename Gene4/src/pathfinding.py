@@ -0,0 +1,643 @@
+import heapq
+import math
+import typing
+
+import numpy as np
+
+
+# Walls are squares centred on their position
+WALL_HALF_SIZE = 10
+TANK_RADIUS = 10
+# Top speed of a tank, in map units per second
+TANK_SPEED = 141.42
+# Destructible walls can be shot down, so paths may go through them if there is no good way around
+DESTRUCTIBLE_WALL_COST = 100
+
+# Planners given a deadline (see scheduler.Deadline) look at the clock once every this many expansions
+DEADLINE_CHECK_EVERY = 64
+
+SQRT2 = math.sqrt(2)
+# (d_col, d_row, step cost in cells)
+NEIGHBOURS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+              (1, 1, SQRT2), (1, -1, SQRT2), (-1, 1, SQRT2), (-1, -1, SQRT2)]
+
+
+class OccupancyGrid:
+    """
+    The walls of the map rasterized once at END_INIT.
+    Walls are inflated by the tank radius: a cell is blocked if a tank centred in it would overlap a wall, so the
+    planner can treat the tank as a point.
+
+    cells holds one byte per cell: FREE, BLOCKED, or anything in between as an extra cost to go through the cell.
+    After init it only changes through remove_wall and set_closing_boundary, which return the cells they changed so
+    planners can repair their search, and bump `version`.
+    """
+    FREE = 0
+    BLOCKED = 255
+
+    def __init__(self, width, height, resolution=10, clearance=TANK_RADIUS):
+        self.width = width
+        self.height = height
+        self.resolution = resolution
+        self.clearance = clearance
+        self.cols = max(1, math.ceil(width / resolution))
+        self.rows = max(1, math.ceil(height / resolution))
+        self.cells = bytearray(self.cols * self.rows)
+        self.version = 0
+
+        # Walls by coarse bucket, to find the walls covering a cell again when one of them is removed
+        self.bucket_size = 2 * (WALL_HALF_SIZE + clearance)
+        self.wall_buckets = {}
+        # Cells whose centre is outside [min_col, max_col] x [min_row, max_row] are blocked by the closing boundary
+        self.free_cols = (0, self.cols - 1)
+        self.free_rows = (0, self.rows - 1)
+
+        # Tanks cannot get closer than their radius to the map edge either, and the planner relies on the outer ring of
+        # cells being blocked
+        self.edge = edge = max(1, math.ceil(clearance / resolution - 0.5))
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if col < edge or row < edge or col >= self.cols - edge or row >= self.rows - edge:
+                    self.cells[row * self.cols + col] = self.BLOCKED
+
+    def cell_of(self, position) -> typing.Tuple[int, int]:
+        col = min(self.cols - 1, max(0, int(position[0] // self.resolution)))
+        row = min(self.rows - 1, max(0, int(position[1] // self.resolution)))
+        return col, row
+
+    def center_of(self, col, row) -> typing.List[float]:
+        return [(col + 0.5) * self.resolution, (row + 0.5) * self.resolution]
+
+    def wall_cells(self, position) -> typing.List[int]:
+        """
+        Indexes of the cells a wall at position blocks once inflated by the clearance.
+        """
+        x, y = position[0], position[1]
+        reach = WALL_HALF_SIZE + self.clearance
+        min_col, min_row = self.cell_of((x - reach, y - reach))
+        max_col, max_row = self.cell_of((x + reach, y + reach))
+        clearance_squared = self.clearance * self.clearance
+        indexes = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                center_x, center_y = (col + 0.5) * self.resolution, (row + 0.5) * self.resolution
+                # Distance from the cell centre to the wall square
+                dx = max(abs(center_x - x) - WALL_HALF_SIZE, 0.0)
+                dy = max(abs(center_y - y) - WALL_HALF_SIZE, 0.0)
+                if dx * dx + dy * dy < clearance_squared:
+                    indexes.append(row * self.cols + col)
+        return indexes
+
+    def add_wall(self, position, cost=BLOCKED, rasterize=True):
+        """
+        Rasterize one wall, keeping the highest cost if cells overlap.
+        :param rasterize: False to only remember the wall, when the cells come from load_cells
+        """
+        bucket = (int(position[0] // self.bucket_size), int(position[1] // self.bucket_size))
+        self.wall_buckets.setdefault(bucket, {})[(position[0], position[1])] = cost
+        if not rasterize:
+            return
+        cells = self.cells
+        for index in self.wall_cells(position):
+            if cells[index] < cost:
+                cells[index] = cost
+
+    def load_cells(self, cells):
+        """
+        Take the cells of a grid rasterized before from the same walls (see MapCache) instead of rasterizing them.
+        :param cells: one uint8 per cell, row after row
+        """
+        if len(cells) != len(self.cells):
+            raise ValueError("expected %d cells, got %d" % (len(self.cells), len(cells)))
+        self.cells[:] = np.asarray(cells, dtype=np.uint8).tobytes()
+
+    def remove_wall(self, position) -> typing.List[int]:
+        """
+        Remove a wall (e.g. a destroyed destructible wall) and recompute the cells it covered from the walls left.
+        :return: indexes of the cells whose cost changed
+        """
+        bucket = (int(position[0] // self.bucket_size), int(position[1] // self.bucket_size))
+        walls = self.wall_buckets.get(bucket)
+        if walls is None or walls.pop((position[0], position[1]), None) is None:
+            return []
+        changed = []
+        for index in self.wall_cells(position):
+            cost = self._cell_cost(index)
+            if self.cells[index] != cost:
+                self.cells[index] = cost
+                changed.append(index)
+        if changed:
+            self.version += 1
+        return changed
+
+    def _cell_cost(self, index) -> int:
+        """
+        Cost of a cell from scratch: edges and closing boundary, then the highest cost wall covering it.
+        """
+        col, row = index % self.cols, index // self.cols
+        if not (self.free_cols[0] <= col <= self.free_cols[1] and self.free_rows[0] <= row <= self.free_rows[1]):
+            return self.BLOCKED
+        edge = self.edge
+        if col < edge or row < edge or col >= self.cols - edge or row >= self.rows - edge:
+            return self.BLOCKED
+        center_x, center_y = self.center_of(col, row)
+        bucket_x, bucket_y = int(center_x // self.bucket_size), int(center_y // self.bucket_size)
+        clearance_squared = self.clearance * self.clearance
+        cost = self.FREE
+        for d_x in (-1, 0, 1):
+            for d_y in (-1, 0, 1):
+                for (x, y), wall_cost in self.wall_buckets.get((bucket_x + d_x, bucket_y + d_y), {}).items():
+                    dx = max(abs(center_x - x) - WALL_HALF_SIZE, 0.0)
+                    dy = max(abs(center_y - y) - WALL_HALF_SIZE, 0.0)
+                    if dx * dx + dy * dy < clearance_squared and wall_cost > cost:
+                        cost = wall_cost
+        return cost
+
+    def set_closing_boundary(self, vertices) -> typing.List[int]:
+        """
+        Block every cell a tank could not be in without touching the closing boundary.
+        The boundary only shrinks, so this only ever blocks the strips it moved over since the last call.
+        :param vertices: closing boundary position: top left, bottom left, bottom right, top right
+        :return: indexes of the cells that became blocked
+        """
+        top_left, bot_left, bot_right, top_right = vertices
+        # Largest axis aligned rectangle inside the quad, minus the tank radius
+        left = max(top_left[0], bot_left[0]) + self.clearance
+        right = min(top_right[0], bot_right[0]) - self.clearance
+        bottom = max(bot_left[1], bot_right[1]) + self.clearance
+        top = min(top_left[1], top_right[1]) - self.clearance
+        resolution = self.resolution
+        # Cells whose centre is inside
+        free_cols = (max(self.free_cols[0], math.ceil(left / resolution - 0.5)),
+                     min(self.free_cols[1], math.floor(right / resolution - 0.5)))
+        free_rows = (max(self.free_rows[0], math.ceil(bottom / resolution - 0.5)),
+                     min(self.free_rows[1], math.floor(top / resolution - 0.5)))
+        if free_cols == self.free_cols and free_rows == self.free_rows:
+            return []
+
+        old_cols, old_rows = self.free_cols, self.free_rows
+        self.free_cols, self.free_rows = free_cols, free_rows
+        cells = self.cells
+        cols = self.cols
+        changed = []
+        for row in range(max(0, old_rows[0]), min(self.rows - 1, old_rows[1]) + 1):
+            inside_row = free_rows[0] <= row <= free_rows[1]
+            for col in range(max(0, old_cols[0]), min(cols - 1, old_cols[1]) + 1):
+                if inside_row and free_cols[0] <= col <= free_cols[1]:
+                    continue
+                index = row * cols + col
+                if cells[index] != self.BLOCKED:
+                    cells[index] = self.BLOCKED
+                    changed.append(index)
+        if changed:
+            self.version += 1
+        return changed
+
+    def is_free(self, col, row) -> bool:
+        return self.cells[row * self.cols + col] == self.FREE
+
+    def line_is_free(self, start_cell, end_cell) -> bool:
+        """
+        True if every cell on the straight line between the two cells is free (sampled every half cell).
+        The start cell itself is not checked, the tank may already be brushing a wall.
+        """
+        (col0, row0), (col1, row1) = start_cell, end_cell
+        steps = int(max(abs(col1 - col0), abs(row1 - row0)) * 2) + 1
+        cells = self.cells
+        cols = self.cols
+        for step in range(1, steps + 1):
+            t = step / steps
+            col = int(col0 + 0.5 + (col1 - col0) * t)
+            row = int(row0 + 0.5 + (row1 - row0) * t)
+            if cells[row * cols + col] != self.FREE:
+                return False
+        return True
+
+    def smooth_path(self, start_cell, path_cells) -> typing.List[tuple]:
+        """
+        Drop every cell of a path that can be skipped with a straight free line (string pulling).
+        """
+        if not path_cells:
+            return []
+        waypoints = []
+        anchor = previous = start_cell
+        for cell in path_cells:
+            if previous != anchor and not self.line_is_free(anchor, cell):
+                waypoints.append(previous)
+                anchor = previous
+            previous = cell
+        waypoints.append(path_cells[-1])
+        return waypoints
+
+    def nearest_free(self, col, row, max_ring=5) -> typing.Optional[typing.Tuple[int, int]]:
+        """
+        Closest free cell around (col, row), used when a goal sits inside an inflated wall.
+        """
+        for ring in range(max_ring + 1):
+            candidates = []
+            for d_row in range(-ring, ring + 1):
+                for d_col in range(-ring, ring + 1):
+                    if max(abs(d_col), abs(d_row)) != ring:
+                        continue
+                    c, r = col + d_col, row + d_row
+                    if 0 <= c < self.cols and 0 <= r < self.rows and self.is_free(c, r):
+                        candidates.append((d_col * d_col + d_row * d_row, c, r))
+            if candidates:
+                _, c, r = min(candidates)
+                return c, r
+        return None
+
+
+def edge_cost(step_cost, cell_cost, cost_weight) -> float:
+    """
+    Cost of one move into a cell, shared by both planners: the length of the move in cells, `cost_weight * cell_cost`
+    times more for a cell between FREE and BLOCKED, inf into a BLOCKED cell.
+    """
+    if cell_cost == OccupancyGrid.BLOCKED:
+        return math.inf
+    return step_cost * (1.0 + cost_weight * cell_cost)
+
+
+def edge_cost_table(step_cost, cost_weight) -> typing.List[float]:
+    """
+    edge_cost of a move for every cell cost, indexed by the cell's byte, for the hot loops.
+    """
+    return [edge_cost(step_cost, cell_cost, cost_weight) for cell_cost in range(256)]
+
+
+class PathPlanner:
+    """
+    A* over an OccupancyGrid with 8-connected moves (no corner cutting).
+    Cells with a cost between FREE and BLOCKED can be crossed but every step into them costs more (see edge_cost).
+
+    The heuristic is inflated by heuristic_weight (weighted A*): paths can be up to that factor longer than the
+    shortest one, in exchange for expanding far fewer nodes.
+
+    Every call expands at most max_expansions nodes, and stops earlier if its deadline expires, so it never blows the
+    tick. If the budget runs out, the path to the most promising node found so far is returned instead,
+    `last_complete` tells which one it was.
+    """
+    def __init__(self, grid: OccupancyGrid, max_expansions=1500, cost_weight=0.2, heuristic_weight=1.5):
+        self.grid = grid
+        self.max_expansions = max_expansions
+        self.cost_weight = cost_weight
+        self.heuristic_weight = heuristic_weight
+        cols = grid.cols
+        # (d_col, d_row, offset, edge cost of the move by cost of the cell moved into, corner cells)
+        self._neighbours = [(d_col, d_row, d_row * cols + d_col, edge_cost_table(step_cost, cost_weight),
+                             d_col if d_row else 0, d_row * cols if d_col else 0)
+                            for d_col, d_row, step_cost in NEIGHBOURS]
+        self.last_expansions = 0
+        self.last_complete = False
+        self.last_interrupted = False
+        # The last search, reused while neither end changes cell
+        self._last_query = None
+        self._last_cells = None
+
+    def plan(self, start, goal, goal_radius=0.0, max_expansions=None,
+             deadline=None) -> typing.Optional[typing.List[typing.List[float]]]:
+        """
+        Waypoints from start towards goal, each one in a straight free line from the previous.
+        :param goal_radius: stop as soon as the path is within this distance of goal (e.g. to stay near the enemy)
+        :param deadline: optional scheduler.Deadline, the search returns its best node so far when it expires
+        :return: list of [x, y] (empty if start is already there) or None if no cell could be reached
+        """
+        grid = self.grid
+        start_cell = grid.cell_of(start)
+        if not grid.is_free(*start_cell):
+            # Brushing a wall, start from the closest cell the tank can be in
+            start_cell = grid.nearest_free(*start_cell) or start_cell
+        goal_col, goal_row = grid.cell_of(goal)
+        if goal_radius == 0.0 and not grid.is_free(goal_col, goal_row):
+            free_goal = grid.nearest_free(goal_col, goal_row)
+            if free_goal is None:
+                return None
+            goal_col, goal_row = free_goal
+
+        query = (start_cell, goal_col, goal_row, goal_radius, grid.version)
+        if query == self._last_query:
+            cells = self._last_cells
+        else:
+            cells = self.search(start_cell, (goal_col, goal_row), goal_radius / grid.resolution,
+                                max_expansions or self.max_expansions, deadline)
+            # A search cut short by the clock may do better next tick, do not keep it
+            if not self.last_interrupted:
+                self._last_query, self._last_cells = query, cells
+        if cells is None:
+            return None
+        waypoints = [grid.center_of(col, row) for col, row in grid.smooth_path(start_cell, cells)]
+        if waypoints and self.last_complete and goal_radius == 0.0 and cells[-1] == (goal_col, goal_row):
+            waypoints[-1] = [goal[0], goal[1]]
+        return waypoints
+
+    def search(self, start_cell, goal_cell, goal_radius, max_expansions,
+               deadline=None) -> typing.Optional[typing.List[tuple]]:
+        """
+        Plain A* in cell units. Returns the cells after start_cell up to the goal (or the best node on budget).
+        """
+        grid = self.grid
+        cells = grid.cells
+        cols = grid.cols
+        blocked = OccupancyGrid.BLOCKED
+        heuristic_weight = self.heuristic_weight
+        goal_col, goal_row = goal_cell
+        hypot = math.hypot
+        heappush, heappop = heapq.heappush, heapq.heappop
+        # The outer ring of cells is always blocked, so neighbours never need a bounds check
+        neighbours = self._neighbours
+
+        start = start_cell[1] * cols + start_cell[0]
+        start_h = max(0.0, hypot(start_cell[0] - goal_col, start_cell[1] - goal_row) - goal_radius) * heuristic_weight
+        g_score = {start: 0.0}
+        came_from = {}
+        open_heap = [(start_h, 0.0, start, start_h)]
+        best, best_h = start, start_h
+        expansions = 0
+        self.last_complete = False
+        self.last_interrupted = False
+
+        while open_heap:
+            _, g, current, h = heappop(open_heap)
+            if g > g_score[current]:
+                continue
+            if h < best_h:
+                best, best_h = current, h
+            if h == 0.0:
+                self.last_complete = True
+                best = current
+                break
+            if expansions >= max_expansions:
+                break
+            if deadline is not None and expansions % DEADLINE_CHECK_EVERY == 0 and deadline.expired():
+                self.last_interrupted = True
+                break
+            expansions += 1
+
+            col, row = current % cols, current // cols
+            for d_col, d_row, offset, step_costs, side_a, side_b in neighbours:
+                neighbour = current + offset
+                cost = cells[neighbour]
+                if cost == blocked:
+                    continue
+                # No cutting corners of walls
+                if side_a and (cells[current + side_a] == blocked or cells[current + side_b] == blocked):
+                    continue
+                new_g = g + step_costs[cost]
+                if new_g < g_score.get(neighbour, math.inf):
+                    g_score[neighbour] = new_g
+                    came_from[neighbour] = current
+                    n_h = hypot(col + d_col - goal_col, row + d_row - goal_row) - goal_radius
+                    n_h = n_h * heuristic_weight if n_h > 0.0 else 0.0
+                    heappush(open_heap, (new_g + n_h, new_g, neighbour, n_h))
+
+        self.last_expansions = expansions
+        if best == start:
+            return [] if self.last_complete else None
+        path = []
+        node = best
+        while node != start:
+            path.append((node % cols, node // cols))
+            node = came_from[node]
+        path.reverse()
+        return path
+
+
+class IncrementalPlanner:
+    """
+    D* Lite over an OccupancyGrid, for a goal that stays put (e.g. a powerup) while our tank moves.
+
+    The search runs backwards from the goal and is kept between calls. When cells change (a destructible wall is
+    destroyed, the closing boundary moves over some cells) `update_cells` only reopens the nodes next to them, and
+    the next `plan` repairs the affected part of the search instead of starting over. Moving the start costs nothing.
+
+    Costs are the same as PathPlanner's (see edge_cost), so destructible walls are expensive but passable. A call expands at most
+    max_expansions nodes and stops when its deadline expires; if that is not enough the search simply carries on at
+    the next call.
+    """
+    def __init__(self, grid: OccupancyGrid, max_expansions=1500, cost_weight=0.2):
+        self.grid = grid
+        self.max_expansions = max_expansions
+        self.cost_weight = cost_weight
+        cols = grid.cols
+        # (offset, edge cost of the move by cost of the cell moved into, corner cells)
+        self._neighbours = [(d_row * cols + d_col, edge_cost_table(step_cost, cost_weight), d_col if d_row else 0,
+                             d_row * cols if d_col else 0)
+                            for d_col, d_row, step_cost in NEIGHBOURS]
+        self.goal = None
+        self.goal_position = None
+        self.last_expansions = 0
+        self._reset()
+
+    def _reset(self):
+        self.g = {}
+        self.rhs = {}
+        self.queue = []
+        # node -> key it is queued with, entries of the heap with another key are stale
+        self.queued = {}
+        self.km = 0.0
+        self.last_start = None
+
+    def _heuristic(self, a, b):
+        cols = self.grid.cols
+        return math.hypot(a % cols - b % cols, a // cols - b // cols)
+
+    def _cost(self, a, b, step_costs, side_a, side_b):
+        """
+        Cost of the move from a to its neighbour b.
+        """
+        cells = self.grid.cells
+        blocked = OccupancyGrid.BLOCKED
+        if cells[a] == blocked:
+            return math.inf
+        if side_a and (cells[a + side_a] == blocked or cells[a + side_b] == blocked):
+            return math.inf
+        return step_costs[cells[b]]
+
+    def _key(self, node, start):
+        value = min(self.g.get(node, math.inf), self.rhs.get(node, math.inf))
+        return value + self._heuristic(start, node) + self.km, value
+
+    def _update_node(self, node, start):
+        g, rhs = self.g, self.rhs
+        if node != self.goal:
+            # Same as min(_cost + g) over the neighbours, inlined as this is the hot loop
+            best = math.inf
+            cells = self.grid.cells
+            blocked = OccupancyGrid.BLOCKED
+            if cells[node] != blocked:
+                g_get = g.get
+                for offset, step_costs, side_a, side_b in self._neighbours:
+                    neighbour = node + offset
+                    neighbour_g = g_get(neighbour, math.inf)
+                    if neighbour_g == math.inf:
+                        continue
+                    if side_a and (cells[node + side_a] == blocked or cells[node + side_b] == blocked):
+                        continue
+                    value = neighbour_g + step_costs[cells[neighbour]]
+                    if value < best:
+                        best = value
+            rhs[node] = best
+        self._requeue(node, start)
+
+    def _requeue(self, node, start):
+        self.queued.pop(node, None)
+        if self.g.get(node, math.inf) != self.rhs.get(node, math.inf):
+            key = self._key(node, start)
+            self.queued[node] = key
+            heapq.heappush(self.queue, (key, node))
+
+    def _neighbours_of(self, node):
+        """
+        Neighbours of a node that are inside the grid (the blocked outer ring is never expanded, but its cells can
+        still be updated when the boundary closes).
+        """
+        grid = self.grid
+        col, row = node % grid.cols, node // grid.cols
+        for d_col, d_row, _ in NEIGHBOURS:
+            if 0 <= col + d_col < grid.cols and 0 <= row + d_row < grid.rows:
+                yield node + d_row * grid.cols + d_col
+
+    def _compute(self, start, max_expansions, deadline=None) -> bool:
+        """
+        Main D* Lite loop. :return: True if the start's cost to the goal is settled
+        """
+        g, rhs, queue, queued = self.g, self.rhs, self.queue, self.queued
+        # Only free cells get expanded and the outer ring is always blocked, so no bounds checks are needed
+        offsets = [offset for offset, _, _, _ in self._neighbours]
+        update_node = self._update_node
+        requeue = self._requeue
+        cells = self.grid.cells
+        blocked = OccupancyGrid.BLOCKED
+        goal = self.goal
+        expansions = 0
+        while queue:
+            key, node = queue[0]
+            if queued.get(node) != key:
+                heapq.heappop(queue)
+                continue
+            start_key = self._key(start, start)
+            if key >= start_key and rhs.get(start, math.inf) == g.get(start, math.inf):
+                break
+            if expansions >= max_expansions or (
+                    deadline is not None and expansions % DEADLINE_CHECK_EVERY == 0 and deadline.expired()):
+                self.last_expansions = expansions
+                return False
+            expansions += 1
+            heapq.heappop(queue)
+            del queued[node]
+            new_key = self._key(node, start)
+            node_g, node_rhs = g.get(node, math.inf), rhs.get(node, math.inf)
+            if key < new_key:
+                queued[node] = new_key
+                heapq.heappush(queue, (new_key, node))
+            elif node_g > node_rhs:
+                # The node got cheaper: its neighbours can only get cheaper through it, no need for a full update.
+                # Moves are symmetric but for the cost of the cell moved into, here always this node's
+                g[node] = node_rhs
+                node_cost = cells[node]
+                for offset, step_costs, side_a, side_b in self._neighbours:
+                    neighbour = node + offset
+                    if neighbour == goal or cells[neighbour] == blocked:
+                        continue
+                    if side_a and (cells[node + side_a] == blocked or cells[node + side_b] == blocked):
+                        continue
+                    value = node_rhs + step_costs[node_cost]
+                    if value < rhs.get(neighbour, math.inf):
+                        rhs[neighbour] = value
+                        requeue(neighbour, start)
+            else:
+                g[node] = math.inf
+                update_node(node, start)
+                for offset in offsets:
+                    update_node(node + offset, start)
+        self.last_expansions = expansions
+        return True
+
+    def set_goal(self, goal):
+        """
+        Start a new search if the goal moved to another cell, otherwise keep the current one.
+        """
+        grid = self.grid
+        col, row = grid.cell_of(goal)
+        if not grid.is_free(col, row):
+            col, row = grid.nearest_free(col, row) or (col, row)
+        goal_node = row * grid.cols + col
+        self.goal_position = [goal[0], goal[1]]
+        if goal_node == self.goal:
+            return
+        self._reset()
+        self.goal = goal_node
+        self.rhs[goal_node] = 0.0
+
+    def update_cells(self, changed_cells: typing.Iterable[int]):
+        """
+        Tell the planner which cells changed cost (as returned by OccupancyGrid.remove_wall/set_closing_boundary).
+        """
+        if self.goal is None or self.last_start is None:
+            return
+        cells = self.grid.cells
+        g, rhs = self.g, self.rhs
+        nodes = set()
+        for index in changed_cells:
+            nodes.add(index)
+            # A newly blocked cell only matters to neighbours the search already reached (it may cut their diagonals)
+            freed = cells[index] != OccupancyGrid.BLOCKED
+            for neighbour in self._neighbours_of(index):
+                if freed or neighbour in g or neighbour in rhs:
+                    nodes.add(neighbour)
+        for node in nodes:
+            self._update_node(node, self.last_start)
+
+    def plan(self, start, max_expansions=None, deadline=None) -> typing.Optional[typing.List[typing.List[float]]]:
+        """
+        Waypoints from start to the goal given to set_goal, in the same format as PathPlanner.plan.
+        :param deadline: optional scheduler.Deadline, see PathPlanner.plan
+        :return: list of [x, y] (empty if already there) or None if there is no path (yet)
+        """
+        if self.goal is None:
+            return None
+        grid = self.grid
+        start_cell = grid.cell_of(start)
+        if not grid.is_free(*start_cell):
+            start_cell = grid.nearest_free(*start_cell) or start_cell
+        start_node = start_cell[1] * grid.cols + start_cell[0]
+        if start_node == self.goal:
+            return []
+
+        if self.last_start is None:
+            if not self.queue:
+                self.queued[self.goal] = self._key(self.goal, start_node)
+                heapq.heappush(self.queue, (self.queued[self.goal], self.goal))
+        elif start_node != self.last_start:
+            self.km += self._heuristic(self.last_start, start_node)
+        self.last_start = start_node
+
+        if not self._compute(start_node, max_expansions or self.max_expansions, deadline):
+            return None
+        if self.g.get(start_node, math.inf) == math.inf:
+            return None
+
+        # Walk down the cost-to-goal from the start
+        path = []
+        node = start_node
+        g = self.g
+        for _ in range(grid.cols * grid.rows):
+            if node == self.goal:
+                break
+            best, best_value = None, math.inf
+            for offset, step_costs, side_a, side_b in self._neighbours:
+                neighbour = node + offset
+                value = g.get(neighbour, math.inf) + self._cost(node, neighbour, step_costs, side_a, side_b)
+                if value < best_value:
+                    best, best_value = neighbour, value
+            if best is None:
+                return None
+            node = best
+            path.append((node % grid.cols, node // grid.cols))
+        else:
+            return None
+
+        waypoints = [grid.center_of(col, row) for col, row in grid.smooth_path(start_cell, path)]
+        if waypoints:
+            waypoints[-1] = self.goal_position
+        return waypoints
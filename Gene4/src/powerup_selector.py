@@ -0,0 +1,135 @@
+import heapq
+import math
+import typing
+
+from pathfinding import OccupancyGrid, TANK_RADIUS, TANK_SPEED
+
+
+# Worth of each powerup type in seconds of travel, types not listed are never targeted (SPEED makes the tank harder to
+# steer)
+TYPE_BONUS = {"HEALTH": 2.0, "DAMAGE": 1.5}
+# A path around walls is about this much longer than the straight line
+DETOUR_FACTOR = 1.5
+
+
+class PowerupSelector:
+    """
+    Priority queue of the powerups worth going for, lowest score first. The score is in seconds:
+    travel time (longer if walls are in the way) + how close to the closing boundary the powerup will be when we get
+    there + how much closer the enemy is to it than we are + the threat field under it, if there is one - the bonus
+    of its type. Powerups the boundary will have swallowed by then are left out.
+
+    The heap is kept up to date from the deltas: spawned powerups are pushed, deleted ones are dropped lazily when
+    they reach the top. Scores only depend on where we, the enemy and the boundary are, so everything is rescored only
+    once one of them moved more than `rescore_distance` since the last scoring; on other ticks best() is O(log n).
+    """
+    def __init__(self, grid: OccupancyGrid, boundary_margin=90, rescore_distance=50.0, field=None):
+        self.grid = grid
+        self.field = field
+        self.boundary_margin = boundary_margin
+        self.rescore_distance = rescore_distance
+        # powerup-id -> (position, powerup type)
+        self.powerups = {}
+        # (score, version, powerup-id), entries whose version is not the powerup's current one are stale
+        self.heap = []
+        self.versions = {}
+        self.version = 0
+        # Where things were at the last scoring
+        self.my_pos = None
+        self.enemy_pos = None
+        self.bounds = None
+        self.bounds_velocity = None
+        self.rescores = 0
+
+    def add(self, powerup_id, position, powerup_type):
+        """
+        A powerup spawned (or moved), known ones at the same place are ignored.
+        """
+        if powerup_type not in TYPE_BONUS:
+            return
+        known = self.powerups.get(powerup_id)
+        if known is not None and known[0] == (position[0], position[1]):
+            return
+        self.powerups[powerup_id] = ((position[0], position[1]), powerup_type)
+        if self.my_pos is not None:
+            self._push(powerup_id)
+
+    def remove(self, powerup_id):
+        """
+        A powerup was picked up or despawned, its heap entry is dropped once it reaches the top.
+        """
+        if self.powerups.pop(powerup_id, None) is not None:
+            self.versions.pop(powerup_id, None)
+
+    def update_context(self, my_pos, enemy_pos, bounds, bounds_velocity=None):
+        """
+        Rescore every powerup if we, the enemy or the closing boundary moved too much since the last scoring.
+        :param bounds: (min_x, min_y, max_x, max_y) of the closing boundary, bounds_velocity how fast each moves
+        """
+        if self.my_pos is not None and not self._moved(my_pos, enemy_pos, bounds):
+            return
+        self.my_pos, self.enemy_pos = (my_pos[0], my_pos[1]), (enemy_pos[0], enemy_pos[1])
+        self.bounds, self.bounds_velocity = tuple(bounds), bounds_velocity
+        self.rescores += 1
+        self.heap = []
+        self.versions = {}
+        for powerup_id in self.powerups:
+            self._push(powerup_id)
+
+    def best(self) -> typing.Optional[str]:
+        """
+        :return: id of the best powerup to go for, None if none is worth it
+        """
+        heap = self.heap
+        while heap:
+            _, version, powerup_id = heap[0]
+            if self.versions.get(powerup_id) == version:
+                return powerup_id
+            heapq.heappop(heap)
+        return None
+
+    def _moved(self, my_pos, enemy_pos, bounds) -> bool:
+        limit = self.rescore_distance
+        if math.hypot(my_pos[0] - self.my_pos[0], my_pos[1] - self.my_pos[1]) > limit:
+            return True
+        if math.hypot(enemy_pos[0] - self.enemy_pos[0], enemy_pos[1] - self.enemy_pos[1]) > limit:
+            return True
+        return any(abs(new - old) > limit for new, old in zip(bounds, self.bounds))
+
+    def _push(self, powerup_id):
+        score = self.score(powerup_id)
+        self.version += 1
+        if score is None:
+            self.versions.pop(powerup_id, None)
+            return
+        self.versions[powerup_id] = self.version
+        heapq.heappush(self.heap, (score, self.version, powerup_id))
+
+    def score(self, powerup_id) -> typing.Optional[float]:
+        """
+        Score of a powerup from the last context, lower is better.
+        :return: None if the boundary will have closed on it before we get there
+        """
+        (x, y), powerup_type = self.powerups[powerup_id]
+        my_x, my_y = self.my_pos
+        distance = math.hypot(x - my_x, y - my_y)
+        grid = self.grid
+        if not grid.line_is_free(grid.cell_of(self.my_pos), grid.cell_of((x, y))):
+            distance *= DETOUR_FACTOR
+        travel = distance / TANK_SPEED
+
+        min_x, min_y, max_x, max_y = self.bounds
+        if self.bounds_velocity is not None:
+            min_x, min_y, max_x, max_y = (edge + velocity * travel
+                                          for edge, velocity in zip(self.bounds, self.bounds_velocity))
+        margin = min(x - min_x, max_x - x, y - min_y, max_y - y)
+        if margin < TANK_RADIUS:
+            return None
+        boundary_penalty = 2.0 * max(0.0, 1.0 - margin / self.boundary_margin)
+
+        enemy_distance = math.hypot(x - self.enemy_pos[0], y - self.enemy_pos[1])
+        enemy_penalty = 2.0 * max(0.0, 1.0 - enemy_distance / distance) if distance else 0.0
+
+        threat = 0.0 if self.field is None else self.field.cost_at((x, y))
+
+        return travel + boundary_penalty + enemy_penalty + threat - TYPE_BONUS[powerup_type]
@@ -0,0 +1,123 @@
+import atexit
+import bisect
+import cProfile
+import json
+import os
+import time
+import typing
+
+
+# Upper bounds of the latency buckets in microseconds, the last bucket takes everything slower
+BUCKETS_US = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+
+class PhaseProfiler:
+    """
+    Per phase latency histograms and counters for the bot loop, dumped as JSON at the end of the game.
+
+    The game loop brackets its phases with lap():
+        started = profiler.mark()
+        ...
+        started = profiler.lap("delete", started)
+    Each lap adds one count to a fixed bucket of that phase's histogram, nothing is allocated on the hot path. When
+    disabled, mark() and lap() return right away.
+
+    A sampled subset of turns can also run under cProfile (begin_turn/end_turn), the stats of all of them are dumped
+    together with the histograms.
+
+    Configured from the environment (see `from_env`):
+    - PROFILE_FILE: where to dump the histograms, profiling is off without it
+    - PROFILE_CPROFILE_EVERY: also run one turn out of this many under cProfile (default 0, never)
+    - PROFILE_CPROFILE_FILE: where to dump the cProfile stats (default PROFILE_FILE + ".pstats")
+    """
+    def __init__(self, path=None, cprofile_every=0, cprofile_path=None):
+        self.path = path
+        self.enabled = path is not None
+        self.cprofile_every = max(0, int(cprofile_every)) if self.enabled else 0
+        self.cprofile_path = cprofile_path or (path + ".pstats" if path else None)
+
+        # phase -> [bucket counts..., total seconds, max seconds]
+        self.phases = {}
+        self.counters = {}
+        self.profile = cProfile.Profile() if self.cprofile_every else None
+        self.profiling = False
+        self.profiled_turns = 0
+        self.dumped = False
+        if self.enabled:
+            atexit.register(self.dump, "exit")
+
+    @classmethod
+    def from_env(cls, environ=None) -> "PhaseProfiler":
+        environ = os.environ if environ is None else environ
+        return cls(
+            path=environ.get("PROFILE_FILE"),
+            cprofile_every=environ.get("PROFILE_CPROFILE_EVERY", 0),
+            cprofile_path=environ.get("PROFILE_CPROFILE_FILE"),
+        )
+
+    def mark(self) -> float:
+        return time.perf_counter() if self.enabled else 0.0
+
+    def lap(self, phase, started) -> float:
+        """
+        Record the time since started under phase.
+        :return: now, the start of the next phase
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        seconds = now - started
+        histogram = self.phases.get(phase)
+        if histogram is None:
+            histogram = self.phases[phase] = [0] * (len(BUCKETS_US) + 1) + [0.0, 0.0]
+        histogram[bisect.bisect_left(BUCKETS_US, seconds * 1e6)] += 1
+        histogram[-2] += seconds
+        if seconds > histogram[-1]:
+            histogram[-1] = seconds
+        return now
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def begin_turn(self, turn):
+        if self.profile is not None and turn % self.cprofile_every == 0:
+            self.profiling = True
+            self.profiled_turns += 1
+            self.profile.enable()
+
+    def end_turn(self):
+        if self.profiling:
+            self.profile.disable()
+            self.profiling = False
+
+    def report(self) -> typing.Dict:
+        phases = {}
+        for phase, histogram in self.phases.items():
+            counts = histogram[:-2]
+            total = sum(counts)
+            phases[phase] = {
+                "count": total,
+                "mean_us": histogram[-2] / total * 1e6 if total else 0.0,
+                "max_us": histogram[-1] * 1e6,
+                "buckets_us": list(BUCKETS_US) + ["inf"],
+                "counts": counts,
+            }
+        return {"phases": phases, "counters": dict(self.counters), "cprofile_turns": self.profiled_turns}
+
+    def dump(self, reason="end", extra=None):
+        """
+        Write the histograms and counters (and the cProfile stats if any), once.
+        :param extra: more stats to include, e.g. comms.transport.stats()
+        """
+        if not self.enabled or self.dumped:
+            return
+        self.dumped = True
+        self.end_turn()
+        report = dict(self.report(), reason=reason)
+        if extra is not None:
+            report.update(extra)
+        with open(self.path, "w") as file:
+            json.dump(report, file, indent=2, default=str)
+        if self.profile is not None and self.profiled_turns:
+            self.profile.dump_stats(self.cprofile_path)
@@ -0,0 +1,268 @@
+"""
+Match recordings: every message the server sent us and every response we posted, in one compact file.
+
+File layout, all integers little endian:
+
+    MAGIC
+    record*             kind (1 byte) | tick (uint32) | payload length (uint32) | zlib compressed payload
+    index record        kind INDEX, payload is the JSON index (only if the recording was closed cleanly)
+    footer              offset of the index record (uint64) | INDEX_MAGIC
+
+Record kinds:
+- INBOUND: one line as the server sent it (tick 0 for the init messages, then the turn number)
+- OUTBOUND: one of our responses, with the tick it answers
+- KEYFRAME: the full state after the inbound message of that tick, {"init": first message, "objects": {...}}
+
+Keyframes are written every `keyframe_every` ticks so a reader can jump to any tick by loading the closest keyframe
+before it and applying only the few deltas after it. If the process died before writing the index, the reader
+rebuilds it by walking the record headers.
+"""
+import json
+import mmap
+import struct
+import threading
+import typing
+import zlib
+
+
+MAGIC = b"CQREC1\n"
+INDEX_MAGIC = b"CQIDX1"
+HEADER = struct.Struct("<cII")
+FOOTER = struct.Struct("<Q6s")
+
+INBOUND = b"I"
+OUTBOUND = b"O"
+KEYFRAME = b"K"
+INDEX = b"X"
+
+END_SIGNAL = "END"
+END_INIT_SIGNAL = "END_INIT"
+
+
+class MatchRecorder:
+    """
+    Appends what goes through comms.Transport to a recording, see the module docstring for the format.
+    Writes go through a buffered file, nothing is flushed per tick; `close` writes the index. Inbound and outbound
+    records may come from different threads (see comms.BackgroundReader).
+    :param compression: zlib level, 1 is plenty for JSON and keeps the cost per message low
+    """
+    def __init__(self, path, keyframe_every=100, compression=1):
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.compression = compression
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.offset = len(MAGIC)
+
+        self.tick = 0
+        self.in_init = True
+        self.init_message = None
+        # Full state, kept from the deltas for the keyframes
+        self.objects = {}
+        # tick -> offset of the first inbound record of the tick / of its keyframe
+        self.tick_offsets = {}
+        self.keyframe_offsets = {}
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def _write(self, kind, payload: bytes, tick=None):
+        data = zlib.compress(payload, self.compression)
+        with self.lock:
+            offset = self.offset
+            self.file.write(HEADER.pack(kind, self.tick if tick is None else tick, len(data)))
+            self.file.write(data)
+            self.offset += HEADER.size + len(data)
+        return offset
+
+    def inbound(self, line: bytes, message):
+        """
+        Record one line read from the server and the message it parsed to.
+        """
+        if self.closed:
+            return
+        new_tick = not self.in_init and message != END_SIGNAL
+        if message == END_INIT_SIGNAL:
+            self.in_init = False
+        elif new_tick:
+            self.tick += 1
+        offset = self._write(INBOUND, line.rstrip(b"\n"))
+        if new_tick:
+            self.tick_offsets[self.tick] = offset
+        elif self.init_message is None:
+            self.init_message = message
+            self.tick_offsets[0] = offset
+
+        if isinstance(message, dict) and "updated_objects" in message.get("message", ()):
+            for object_id in message["message"].get("deleted_objects", ()):
+                self.objects.pop(object_id, None)
+            self.objects.update(message["message"]["updated_objects"])
+            if not self.in_init and self.tick % self.keyframe_every == 0:
+                self.keyframe()
+        elif message == END_SIGNAL:
+            self.close()
+
+    def outbound(self, data: bytes, tick):
+        """
+        Record one response as it was written to the server.
+        :param tick: the turn it answers, the reader thread may already have recorded the next ones
+        """
+        if not self.closed:
+            try:
+                self._write(OUTBOUND, data.rstrip(b"\n"), tick)
+            except ValueError:
+                # Closed by the reader thread in the meantime
+                pass
+
+    def keyframe(self):
+        state = {"init": self.init_message, "objects": self.objects}
+        self.keyframe_offsets[self.tick] = self._write(KEYFRAME, json.dumps(state).encode())
+
+    def close(self):
+        if self.closed:
+            return
+        index = {"ticks": self.tick, "tick_offsets": self.tick_offsets, "keyframe_offsets": self.keyframe_offsets}
+        index_offset = self._write(INDEX, json.dumps(index).encode())
+        with self.lock:
+            self.closed = True
+            self.file.write(FOOTER.pack(index_offset, INDEX_MAGIC))
+            self.file.close()
+
+
+class MatchReader:
+    """
+    Random access to a recording through a memory map, nothing is read until it is asked for.
+
+    - messages(from_tick): the stream a Game would have received if the match had started at that tick, ready to be
+      fed to any bot (e.g. tools/benchmark.py --recording)
+    - state(tick): full objects dict after the given tick
+    - responses(): our responses, by tick
+    """
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a match recording")
+        self.tick_offsets, self.keyframe_offsets, self.ticks = self._load_index()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _record_at(self, offset) -> typing.Tuple[bytes, int, int, int]:
+        """
+        :return: kind, tick, offset of the payload, offset of the next record
+        """
+        kind, tick, length = HEADER.unpack_from(self.map, offset)
+        start = offset + HEADER.size
+        return kind, tick, start, start + length
+
+    def _payload(self, start, end) -> bytes:
+        return zlib.decompress(self.map[start:end])
+
+    def _load_index(self):
+        size = len(self.map)
+        if size >= len(MAGIC) + FOOTER.size:
+            index_offset, magic = FOOTER.unpack_from(self.map, size - FOOTER.size)
+            if magic == INDEX_MAGIC:
+                _, _, start, end = self._record_at(index_offset)
+                index = json.loads(self._payload(start, end))
+                return ({int(tick): offset for tick, offset in index["tick_offsets"].items()},
+                        {int(tick): offset for tick, offset in index["keyframe_offsets"].items()},
+                        index["ticks"])
+
+        # No index (the bot did not exit cleanly), walk the headers
+        tick_offsets, keyframe_offsets = {}, {}
+        offset = len(MAGIC)
+        while offset + HEADER.size <= size:
+            kind, tick, _, next_offset = self._record_at(offset)
+            if next_offset > size:
+                # Truncated last record
+                break
+            if kind == INBOUND:
+                tick_offsets.setdefault(tick, offset)
+            elif kind == KEYFRAME:
+                keyframe_offsets[tick] = offset
+            offset = next_offset
+        return tick_offsets, keyframe_offsets, max(tick_offsets, default=0)
+
+    def records(self, offset=len(MAGIC), kinds=(INBOUND, OUTBOUND, KEYFRAME)):
+        """
+        (kind, tick, payload) of the records from offset on.
+        """
+        size = len(self.map)
+        while offset + HEADER.size <= size:
+            kind, tick, start, next_offset = self._record_at(offset)
+            if kind == INDEX or next_offset > size:
+                return
+            if kind in kinds:
+                yield kind, tick, self._payload(start, next_offset)
+            offset = next_offset
+
+    def _check_tick(self, tick):
+        if not 0 <= tick <= self.ticks:
+            raise ValueError(f"tick {tick} is not in the recording, it has ticks 0 to {self.ticks}")
+
+    def state(self, tick) -> typing.Tuple[dict, dict]:
+        """
+        :return: the first message of the match (tank ids) and the full objects dict after the given tick
+        :raises ValueError: if the tick is not in the recording
+        """
+        self._check_tick(tick)
+        keyframes = [keyframe_tick for keyframe_tick in self.keyframe_offsets if keyframe_tick <= tick]
+        if keyframes:
+            start_tick = max(keyframes)
+            _, _, start, end = self._record_at(self.keyframe_offsets[start_tick])
+            keyframe = json.loads(self._payload(start, end))
+            init_message, objects = keyframe["init"], keyframe["objects"]
+            offset = self.tick_offsets.get(start_tick + 1)
+        else:
+            init_message, objects = None, {}
+            offset = len(MAGIC)
+
+        if offset is not None:
+            for _, record_tick, payload in self.records(offset, kinds=(INBOUND,)):
+                if record_tick > tick:
+                    break
+                message = json.loads(payload)
+                if init_message is None:
+                    init_message = message
+                if isinstance(message, dict) and "updated_objects" in message.get("message", ()):
+                    for object_id in message["message"].get("deleted_objects", ()):
+                        objects.pop(object_id, None)
+                    objects.update(message["message"]["updated_objects"])
+        return init_message, objects
+
+    def messages(self, from_tick=0) -> typing.Iterator[str]:
+        """
+        JSON lines of the match as seen from from_tick: the init messages carry the state at that tick, then every
+        turn after it follows as recorded.
+        :raises ValueError: if from_tick is not in the recording
+        """
+        self._check_tick(from_tick)
+        if from_tick <= 0:
+            for _, _, payload in self.records(kinds=(INBOUND,)):
+                yield payload.decode()
+            return
+
+        init_message, objects = self.state(from_tick)
+        yield json.dumps(init_message)
+        yield json.dumps({"message": {"updated_objects": objects, "deleted_objects": []}})
+        yield json.dumps(END_INIT_SIGNAL)
+        offset = self.tick_offsets.get(from_tick + 1)
+        if offset is None:
+            yield json.dumps(END_SIGNAL)
+            return
+        for _, _, payload in self.records(offset, kinds=(INBOUND,)):
+            yield payload.decode()
+
+    def responses(self) -> typing.Dict[int, typing.List[dict]]:
+        responses = {}
+        for _, tick, payload in self.records(kinds=(OUTBOUND,)):
+            responses.setdefault(tick, []).append(json.loads(payload))
+        return responses
@@ -0,0 +1,30 @@
+import os
+import time
+
+
+# Time we allow ourselves per turn, from the moment the turn message is read until our response is written
+TURN_BUDGET_SECONDS = float(os.environ.get("TURN_BUDGET_MS", 40)) / 1000
+
+
+class Deadline:
+    """
+    Time budget of one turn. Planners take one as `deadline` and stop with their best answer so far once it expires,
+    so a slow turn costs us path quality instead of a missed turn.
+    :param budget: seconds from now
+    :param reserve: part of the budget kept for what runs after the planners (dodging, aiming, posting the response)
+    """
+    __slots__ = ("end", "reserve")
+
+    def __init__(self, budget=TURN_BUDGET_SECONDS, reserve=0.005):
+        self.end = time.perf_counter() + budget
+        self.reserve = reserve
+
+    def remaining(self) -> float:
+        """
+        Seconds left for planning, the reserve excluded (can be negative).
+        """
+        return self.end - self.reserve - time.perf_counter()
+
+    def expired(self) -> bool:
+        return time.perf_counter() >= self.end - self.reserve
+
@@ -0,0 +1,173 @@
+import math
+import typing
+
+from object_types import ObjectTypes
+
+
+# Boundaries are polygons, they have a list of vertices as position and are not indexed
+UNINDEXED_TYPES = (ObjectTypes.BOUNDARY.value, ObjectTypes.CLOSING_BOUNDARY.value)
+
+
+def segment_cells(start, end, cell_size) -> typing.Iterator[typing.Tuple[int, int]]:
+    """
+    Cells of a uniform grid of `cell_size` crossed by the segment start->end, in order (grid traversal / DDA).
+    """
+    x0, y0 = start[0] / cell_size, start[1] / cell_size
+    x1, y1 = end[0] / cell_size, end[1] / cell_size
+    cell_x, cell_y = math.floor(x0), math.floor(y0)
+    end_x, end_y = math.floor(x1), math.floor(y1)
+    dx, dy = x1 - x0, y1 - y0
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    t_delta_x = abs(1 / dx) if dx else math.inf
+    t_delta_y = abs(1 / dy) if dy else math.inf
+    t_max_x = ((cell_x + (dx > 0)) - x0) / dx if dx else math.inf
+    t_max_y = ((cell_y + (dy > 0)) - y0) / dy if dy else math.inf
+
+    yield cell_x, cell_y
+    for _ in range(abs(end_x - cell_x) + abs(end_y - cell_y)):
+        if t_max_x < t_max_y:
+            cell_x += step_x
+            t_max_x += t_delta_x
+        else:
+            cell_y += step_y
+            t_max_y += t_delta_y
+        yield cell_x, cell_y
+
+
+class SpatialIndex:
+    """
+    Uniform grid (spatial hash) over object positions, one grid per object type.
+    Updated from the per tick deltas like ObjectStore, so moving bullets and tanks only cost their own update.
+
+    Queries only look at the cells around the query, so they do not depend on the size of the map:
+    - query_radius: objects within a distance of a point
+    - query_segment: objects close to a segment, e.g. a bullet path or a line of fire
+    """
+    def __init__(self, cell_size=100):
+        self.cell_size = cell_size
+        # object type -> {(cell_x, cell_y): {object-id: object-dict}}
+        self.cells = {object_type.value: {} for object_type in ObjectTypes}
+        # object-id -> (object type, cell)
+        self.locations = {}
+
+    def cell_of(self, position) -> typing.Tuple[int, int]:
+        return int(position[0] // self.cell_size), int(position[1] // self.cell_size)
+
+    def update(self, updated_objects: typing.Dict[str, dict]):
+        """
+        Add new objects and move updated ones to their new cell.
+        """
+        cells = self.cells
+        locations = self.locations
+        cell_size = self.cell_size
+        for object_id, game_object in updated_objects.items():
+            object_type = game_object["type"]
+            if object_type in UNINDEXED_TYPES:
+                continue
+            position = game_object["position"]
+            cell = (int(position[0] // cell_size), int(position[1] // cell_size))
+            location = locations.get(object_id)
+            grid = cells[object_type]
+            if location is None or location[1] != cell or location[0] != object_type:
+                if location is not None:
+                    self._remove_from_cell(object_id, *location)
+                locations[object_id] = (object_type, cell)
+                bucket = grid.get(cell)
+                if bucket is None:
+                    bucket = grid[cell] = {}
+            else:
+                bucket = grid[cell]
+            # The server sends a new dict on every update, keep the latest one
+            bucket[object_id] = game_object
+
+    def remove(self, object_ids: typing.Iterable[str]):
+        """
+        Forget deleted objects, unknown ids are ignored.
+        """
+        for object_id in object_ids:
+            location = self.locations.pop(object_id, None)
+            if location is not None:
+                self._remove_from_cell(object_id, *location)
+
+    def _remove_from_cell(self, object_id, object_type, cell):
+        bucket = self.cells[object_type][cell]
+        del bucket[object_id]
+        if not bucket:
+            del self.cells[object_type][cell]
+
+    def _grids(self, object_type):
+        if object_type is None:
+            return self.cells.values()
+        return (self.cells[object_type],)
+
+    def query_radius(self, position, radius, object_type=None) -> typing.List[typing.Tuple[str, dict]]:
+        """
+        All objects (of object_type, or any type if None) within radius of position.
+        """
+        x, y = position[0], position[1]
+        radius_squared = radius * radius
+        min_cell_x, min_cell_y = self.cell_of((x - radius, y - radius))
+        max_cell_x, max_cell_y = self.cell_of((x + radius, y + radius))
+        query_cells = (max_cell_x - min_cell_x + 1) * (max_cell_y - min_cell_y + 1)
+        found = []
+        for grid in self._grids(object_type):
+            if not grid:
+                continue
+            if len(grid) < query_cells:
+                # Sparse grid (e.g. the two tanks), cheaper to walk the occupied cells than the query area
+                buckets = [bucket for (cell_x, cell_y), bucket in grid.items()
+                           if min_cell_x <= cell_x <= max_cell_x and min_cell_y <= cell_y <= max_cell_y]
+            else:
+                buckets = [grid[(cell_x, cell_y)]
+                           for cell_x in range(min_cell_x, max_cell_x + 1)
+                           for cell_y in range(min_cell_y, max_cell_y + 1)
+                           if (cell_x, cell_y) in grid]
+            for bucket in buckets:
+                for object_id, game_object in bucket.items():
+                    object_position = game_object["position"]
+                    dx = object_position[0] - x
+                    dy = object_position[1] - y
+                    if dx * dx + dy * dy <= radius_squared:
+                        found.append((object_id, game_object))
+        return found
+
+    def segment_cells(self, start, end) -> typing.Iterator[typing.Tuple[int, int]]:
+        """
+        Cells crossed by the segment start->end, in order.
+        """
+        return segment_cells(start, end, self.cell_size)
+
+    def query_segment(self, start, end, object_type=None, radius=0.0) -> typing.List[typing.Tuple[str, dict]]:
+        """
+        Objects whose position is within radius of the segment start->end, ordered by how far along the segment they
+        are (the first one is the first thing a bullet from start would meet).
+        """
+        reach = math.ceil(radius / self.cell_size)
+        cells = set()
+        for cell_x, cell_y in self.segment_cells(start, end):
+            for offset_x in range(-reach, reach + 1):
+                for offset_y in range(-reach, reach + 1):
+                    cells.add((cell_x + offset_x, cell_y + offset_y))
+
+        x0, y0 = start[0], start[1]
+        seg_x, seg_y = end[0] - x0, end[1] - y0
+        length_squared = seg_x * seg_x + seg_y * seg_y
+        radius_squared = radius * radius
+        found = []
+        for grid in self._grids(object_type):
+            if not grid:
+                continue
+            for cell in cells:
+                bucket = grid.get(cell)
+                if bucket is None:
+                    continue
+                for object_id, game_object in bucket.items():
+                    px, py = game_object["position"][0] - x0, game_object["position"][1] - y0
+                    t = (px * seg_x + py * seg_y) / length_squared if length_squared else 0.0
+                    t = min(1.0, max(0.0, t))
+                    dx, dy = px - t * seg_x, py - t * seg_y
+                    if dx * dx + dy * dy <= radius_squared:
+                        found.append((t, object_id, game_object))
+        found.sort(key=lambda item: item[0])
+        return [(object_id, game_object) for _, object_id, game_object in found]
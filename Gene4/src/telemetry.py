@@ -0,0 +1,137 @@
+import atexit
+import json
+import os
+import sys
+import typing
+from enum import IntEnum
+
+
+class Level(IntEnum):
+    """
+    OFF - nothing is recorded
+    INFO - one record per sampled turn: tick, state, action, phase timings and turns coalesced by comms
+    DEBUG - INFO plus the ids of the objects the tank currently detects
+    """
+    OFF = 0
+    INFO = 1
+    DEBUG = 2
+
+
+class Telemetry:
+    """
+    Fixed size ring buffer of compact per turn records, replacing the old stderr dumps on every tick.
+
+    Recording only stores a tuple in a preallocated list, nothing is formatted or written on the hot path. The buffer
+    keeps the latest `capacity` records and is written out as JSON lines by `flush`, which runs at the end of the game,
+    on exit and when the bot crashes. With the level OFF `sampled` is a single comparison and nothing else runs.
+
+    Configured from the environment (see `from_env`):
+    - TELEMETRY_LEVEL: off, info or debug (default off)
+    - TELEMETRY_SAMPLE: record one turn out of this many (default 1)
+    - TELEMETRY_CAPACITY: number of records kept (default 1024)
+    - TELEMETRY_FILE: where to flush, default stderr (stdout belongs to the game server)
+    """
+    FIELDS = ("turn", "tick", "state", "action", "read_us", "respond_us", "coalesced", "extra")
+
+    def __init__(self, level=Level.OFF, sample_every=1, capacity=1024, path=None):
+        self.level = Level(level)
+        self.sample_every = max(1, int(sample_every))
+        self.capacity = max(1, int(capacity))
+        self.path = path
+
+        self.records = [None] * self.capacity
+        self.next_index = 0
+        self.count = 0
+        self.dropped = 0
+
+        self._hooked = False
+        if self.level > Level.OFF:
+            self.install_hooks()
+
+    @classmethod
+    def from_env(cls, environ=None) -> "Telemetry":
+        environ = os.environ if environ is None else environ
+        level = environ.get("TELEMETRY_LEVEL", "off").upper()
+        return cls(
+            level=Level[level] if level in Level.__members__ else Level.OFF,
+            sample_every=environ.get("TELEMETRY_SAMPLE", 1),
+            capacity=environ.get("TELEMETRY_CAPACITY", 1024),
+            path=environ.get("TELEMETRY_FILE"),
+        )
+
+    def sampled(self, turn: int) -> bool:
+        """
+        Whether this turn should be recorded, check it before doing any work for the record (timings, ...).
+        """
+        return self.level > Level.OFF and turn % self.sample_every == 0
+
+    def record(self, turn, tick, state, action, read_seconds, respond_seconds, coalesced=0, extra=None):
+        """
+        Store one turn. Oldest records are overwritten once the buffer is full.
+        :param action: the message posted to the server this turn
+        :param coalesced: how many turns behind we were, see comms.Transport.last_coalesced
+        :param extra: anything else worth keeping, only stored at DEBUG level
+        """
+        if self.count == self.capacity:
+            self.dropped += 1
+        else:
+            self.count += 1
+        self.records[self.next_index] = (
+            turn, tick, state, action, int(read_seconds * 1e6), int(respond_seconds * 1e6), coalesced,
+            extra if self.level >= Level.DEBUG else None,
+        )
+        self.next_index = (self.next_index + 1) % self.capacity
+
+    def __len__(self):
+        return self.count
+
+    def snapshot(self) -> typing.List[tuple]:
+        """
+        Buffered records, oldest first.
+        """
+        start = (self.next_index - self.count) % self.capacity
+        return [self.records[(start + i) % self.capacity] for i in range(self.count)]
+
+    def flush(self, reason="flush", summary=None):
+        """
+        Write the buffered records as JSON lines and empty the buffer.
+        :param summary: per match counters to add to the header line, e.g. at the end of the game
+        """
+        if self.count == 0 and (summary is None or self.level == Level.OFF):
+            return
+        header = {"telemetry": reason, "records": self.count, "dropped": self.dropped}
+        if summary is not None:
+            header["summary"] = summary
+        lines = [json.dumps(header, default=str)]
+        for record in self.snapshot():
+            lines.append(json.dumps(dict(zip(self.FIELDS, record)), default=str))
+        data = "\n".join(lines) + "\n"
+
+        if self.path:
+            with open(self.path, "a") as file:
+                file.write(data)
+        else:
+            sys.stderr.write(data)
+            sys.stderr.flush()
+
+        self.records = [None] * self.capacity
+        self.next_index = 0
+        self.count = 0
+        self.dropped = 0
+
+    def install_hooks(self):
+        """
+        Flush on interpreter exit and before the traceback of an uncaught exception.
+        """
+        if self._hooked:
+            return
+        self._hooked = True
+        atexit.register(self.flush, "exit")
+        previous_hook = sys.excepthook
+
+        def excepthook(exc_type, exc_value, traceback):
+            self.flush("crash")
+            previous_hook(exc_type, exc_value, traceback)
+
+        sys.excepthook = excepthook
+
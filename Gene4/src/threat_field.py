@@ -0,0 +1,406 @@
+import math
+import typing
+
+import numpy as np
+
+from pathfinding import WALL_HALF_SIZE
+
+
+class ThreatField:
+    """
+    Coarse cost grid over the whole map, higher is more dangerous, shared by movement, pathing and powerup choice.
+    Four layers in [0, 1] (the boundary one goes up to 2 outside the boundary), weighted into `total`:
+    - walls: proximity to the nearest wall, within wall_range
+    - boundary: proximity to the closing boundary, within boundary_range on either side of it
+    - bullets: where the visible bullets will fly over the next bullet_horizon seconds, the sooner the heavier
+    - enemy: cells the enemy sees (no wall cell in between) within enemy_range, the closer the heavier
+
+    Every change is applied as a delta, and `total` is only recomputed on the cells whose layers changed:
+    - walls: the cells around an added or removed wall
+    - boundary: kept as one cost per row and one per column (a cell's cost is the larger of the two), only the rows
+      and columns whose cost changed when the boundary moved; cells far outside it stay at the cap
+    - bullets: the cells drawn last tick are cleared and the new trajectories drawn (np.add.at over their samples)
+    - enemy: recomputed within enemy_range of the enemy when they changed cell, from the wall shadows around them (see
+      shadow) instead of a ray per cell. When walls fall, only the cells in the bins of angle whose shadow moved are
+      recomputed.
+    Cells are indexed [row, col], row along y like OccupancyGrid.
+    :param max_elements: cap on the size of the line of fire temporaries, the cells to cast go through in chunks
+    :param shadow_bins: angular resolution of the wall shadows around the enemy
+    """
+    # Cells further than boundary_range outside the boundary all cost this much, so they do not change as it closes
+    BOUNDARY_CAP = 2.0
+
+    def __init__(self, width, height, resolution=25, wall_range=60.0, boundary_range=120.0, bullet_horizon=1.0,
+                 bullet_samples=8, enemy_range=500.0, weights=(0.5, 1.0, 1.0, 0.5), max_elements=16384,
+                 shadow_bins=720):
+        self.resolution = resolution
+        self.cols = max(1, math.ceil(width / resolution))
+        self.rows = max(1, math.ceil(height / resolution))
+        self.wall_range = wall_range
+        self.boundary_range = boundary_range
+        self.bullet_times = np.linspace(0.0, bullet_horizon, bullet_samples)
+        self.bullet_weights = 1.0 - self.bullet_times / (bullet_horizon * 1.25)
+        self.enemy_range = enemy_range
+        self.weights = weights
+        self.max_elements = max_elements
+        self.shadow_bins = shadow_bins
+        # Inverse direction of the ray through the middle of each bin of angle, the cosines and sines never vanish
+        ray_angles = (np.arange(shadow_bins) + 0.5) * (2 * np.pi / shadow_bins) - np.pi
+        self.ray_inverse_x, self.ray_inverse_y = 1.0 / np.cos(ray_angles), 1.0 / np.sin(ray_angles)
+
+        self.col_centres = (np.arange(self.cols) + 0.5) * resolution
+        self.row_centres = (np.arange(self.rows) + 0.5) * resolution
+        self.xs, self.ys = np.meshgrid(self.col_centres, self.row_centres)
+        shape = (self.rows, self.cols)
+        self.walls = {}
+        # Number of walls overlapping each cell, the line of fire stops at cells with any
+        self.wall_count = np.zeros(shape, dtype=np.int32)
+        self.wall_cost = np.zeros(shape)
+        self.boundary_row_cost = np.zeros(self.rows)
+        self.boundary_col_cost = np.zeros(self.cols)
+        self.bullet_cost = np.zeros(shape)
+        # (rows, cols) the bullet layer is non-zero on
+        self.bullet_cells = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp))
+        self.enemy_cost = np.zeros(shape)
+        # Where the enemy layer was cast from, the (rows, cols) slices it is non-zero on and its shadow
+        self.enemy_origin = None
+        self.enemy_window = None
+        self.enemy_shadow = None
+        self.total = np.zeros(shape)
+        self._gradient = None
+
+        self.bounds = None
+        self.enemy_cell = None
+        self.walls_removed = False
+
+    def add_walls(self, walls: typing.Iterable[typing.Tuple[str, typing.Sequence[float]]]):
+        """
+        Add many walls at once, e.g. a batch of the map at init. Walls only ever raise the wall layer, so each one is
+        stamped on the cells within wall_range of it instead of recomputing the whole map from all the walls.
+        :param walls: (wall-id, position) pairs
+        """
+        reach = self.wall_range + WALL_HALF_SIZE
+        for wall_id, position in walls:
+            self.walls[wall_id] = (position[0], position[1])
+            self._count_wall(position, 1)
+            rows = self._cell_range(position[1] - reach, position[1] + reach, self.rows)
+            cols = self._cell_range(position[0] - reach, position[0] + reach, self.cols)
+            dx = np.maximum(np.abs(self.xs[rows, cols] - position[0]) - WALL_HALF_SIZE, 0.0)
+            dy = np.maximum(np.abs(self.ys[rows, cols] - position[1]) - WALL_HALF_SIZE, 0.0)
+            cost = np.clip(1.0 - np.sqrt(dx * dx + dy * dy) / self.wall_range, 0.0, 1.0)
+            np.maximum(self.wall_cost[rows, cols], cost, out=self.wall_cost[rows, cols])
+        self._walls_added()
+
+    def load_walls(self, walls: typing.Iterable[typing.Tuple[str, typing.Sequence[float]]], wall_cost, wall_count):
+        """
+        Like add_walls, with the wall layer and counts of a field computed before from the same walls (see MapCache).
+        """
+        if wall_cost.shape != self.wall_cost.shape or wall_count.shape != self.wall_count.shape:
+            raise ValueError("cached wall layer is %s, expected %s" % (wall_cost.shape, self.wall_cost.shape))
+        for wall_id, position in walls:
+            self.walls[wall_id] = (position[0], position[1])
+        self.wall_cost[...] = wall_cost
+        self.wall_count[...] = wall_count
+        self._walls_added()
+
+    def _walls_added(self):
+        #New walls can hide cells from the enemy, the next update casts its line of fire from scratch
+        self.enemy_cell = None
+        self._refresh_total(slice(None), slice(None))
+
+    def remove_wall(self, wall_id):
+        """
+        Forget a wall (a destroyed destructible wall), unknown ids are ignored.
+        """
+        position = self.walls.pop(wall_id, None)
+        if position is not None:
+            self._count_wall(position, -1)
+            self._refresh_walls_around(position)
+            self.walls_removed = True
+
+    def _cell_range(self, low, high, cells) -> slice:
+        return slice(max(0, int(low // self.resolution)), min(cells, int(high // self.resolution) + 1))
+
+    def _count_wall(self, position, delta):
+        rows = self._cell_range(position[1] - WALL_HALF_SIZE, position[1] + WALL_HALF_SIZE, self.rows)
+        cols = self._cell_range(position[0] - WALL_HALF_SIZE, position[0] + WALL_HALF_SIZE, self.cols)
+        self.wall_count[rows, cols] += delta
+
+    def _refresh_walls_around(self, position):
+        """
+        Recompute the wall layer of the cells within wall_range of position, from the walls that can reach them.
+        """
+        reach = self.wall_range + WALL_HALF_SIZE
+        rows = self._cell_range(position[1] - reach, position[1] + reach, self.rows)
+        cols = self._cell_range(position[0] - reach, position[0] + reach, self.cols)
+        # The block is whole cells, a little wider than reach, the walls that matter are within reach of its edges
+        low_x, high_x = cols.start * self.resolution - reach, cols.stop * self.resolution + reach
+        low_y, high_y = rows.start * self.resolution - reach, rows.stop * self.resolution + reach
+        nearby = [wall for wall in self.walls.values() if low_x <= wall[0] <= high_x and low_y <= wall[1] <= high_y]
+        self._refresh_walls(rows, cols, nearby)
+        self._refresh_total(rows, cols)
+
+    def _refresh_walls(self, rows, cols, walls):
+        if not walls:
+            self.wall_cost[rows, cols] = 0.0
+            return
+        xs, ys = self.xs[rows, cols], self.ys[rows, cols]
+        walls = np.array(walls)
+        # Distance from every cell centre to every wall square, (rows, cols, walls)
+        dx = np.maximum(np.abs(xs[..., None] - walls[:, 0]) - WALL_HALF_SIZE, 0.0)
+        dy = np.maximum(np.abs(ys[..., None] - walls[:, 1]) - WALL_HALF_SIZE, 0.0)
+        distance = np.sqrt(dx * dx + dy * dy).min(axis=-1)
+        self.wall_cost[rows, cols] = np.clip(1.0 - distance / self.wall_range, 0.0, 1.0)
+
+    def _refresh_total(self, rows, cols):
+        """
+        Recompute `total` on a block of cells from the layers.
+        :param rows, cols: slices, or one of them an array of indices
+        """
+        wall_weight, boundary_weight, bullet_weight, enemy_weight = self.weights
+        boundary = np.maximum(self.boundary_row_cost[rows][:, None], self.boundary_col_cost[cols][None, :])
+        self.total[rows, cols] = (wall_weight * self.wall_cost[rows, cols] + boundary_weight * boundary
+                                  + bullet_weight * self.bullet_cost[rows, cols]
+                                  + enemy_weight * self.enemy_cost[rows, cols])
+        self._gradient = None
+
+    def _refresh_total_cells(self, rows, cols):
+        """
+        Like _refresh_total for scattered cells, rows and cols are arrays of the same length.
+        """
+        wall_weight, boundary_weight, bullet_weight, enemy_weight = self.weights
+        boundary = np.maximum(self.boundary_row_cost[rows], self.boundary_col_cost[cols])
+        self.total[rows, cols] = (wall_weight * self.wall_cost[rows, cols] + boundary_weight * boundary
+                                  + bullet_weight * self.bullet_cost[rows, cols]
+                                  + enemy_weight * self.enemy_cost[rows, cols])
+        self._gradient = None
+
+    def boundary_cost(self) -> np.ndarray:
+        """
+        The boundary layer over the whole map.
+        """
+        return np.maximum(self.boundary_row_cost[:, None], self.boundary_col_cost[None, :])
+
+    def update(self, bounds, bullet_positions, bullet_velocities, enemy_pos):
+        """
+        Bring the field up to date for this tick.
+        :param bounds: (min_x, min_y, max_x, max_y) of the closing boundary
+        :param bullet_positions, bullet_velocities: (N, 2) arrays of the bullets that can hit us
+        :param enemy_pos: None if we do not know where the enemy is
+        """
+        bounds = tuple(bounds)
+        if bounds != self.bounds:
+            self.bounds = bounds
+            self._update_boundary(bounds)
+        self._update_bullets(bullet_positions, bullet_velocities)
+
+        enemy_cell = None if enemy_pos is None else self.cell_of(enemy_pos)
+        if enemy_cell != self.enemy_cell:
+            self.enemy_cell = enemy_cell
+            self.walls_removed = False
+            self._update_enemy(enemy_pos)
+        elif self.walls_removed and enemy_cell is not None:
+            self.walls_removed = False
+            self._uncover_enemy()
+
+    def _update_boundary(self, bounds):
+        min_x, min_y, max_x, max_y = bounds
+        cap = self.BOUNDARY_CAP
+        col_cost = np.clip(1.0 - np.minimum(self.col_centres - min_x, max_x - self.col_centres) / self.boundary_range,
+                           0.0, cap)
+        row_cost = np.clip(1.0 - np.minimum(self.row_centres - min_y, max_y - self.row_centres) / self.boundary_range,
+                           0.0, cap)
+        changed_cols = np.flatnonzero(col_cost != self.boundary_col_cost)
+        changed_rows = np.flatnonzero(row_cost != self.boundary_row_cost)
+        self.boundary_col_cost = col_cost
+        self.boundary_row_cost = row_cost
+        if len(changed_rows):
+            self._refresh_total(changed_rows, slice(None))
+        if len(changed_cols):
+            self._refresh_total(slice(None), changed_cols)
+
+    def _update_bullets(self, bullet_positions, bullet_velocities):
+        old_rows, old_cols = self.bullet_cells
+        self.bullet_cost[old_rows, old_cols] = 0.0
+        rows = cols = np.zeros(0, dtype=np.intp)
+        if len(bullet_positions):
+            trajectories = (bullet_positions[None, :, :]
+                            + bullet_velocities[None, :, :] * self.bullet_times[:, None, None])
+            cols = (trajectories[..., 0] // self.resolution).astype(np.intp)
+            rows = (trajectories[..., 1] // self.resolution).astype(np.intp)
+            inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+            weights = np.broadcast_to(self.bullet_weights[:, None], cols.shape)[inside]
+            rows, cols = rows[inside], cols[inside]
+            np.add.at(self.bullet_cost, (rows, cols), weights)
+            self.bullet_cost[rows, cols] = np.minimum(self.bullet_cost[rows, cols], 1.0)
+        self.bullet_cells = (rows, cols)
+        if len(old_rows) or len(rows):
+            self._refresh_total_cells(np.concatenate([old_rows, rows]), np.concatenate([old_cols, cols]))
+
+    def _update_enemy(self, enemy_pos):
+        old_window = self.enemy_window
+        if old_window is not None:
+            self.enemy_cost[old_window] = 0.0
+        self.enemy_origin = self.enemy_window = self.enemy_shadow = None
+        if enemy_pos is not None:
+            self.enemy_origin = (enemy_pos[0], enemy_pos[1])
+            self.enemy_window = self._range_window(enemy_pos)
+            self.enemy_shadow = self.shadow(enemy_pos)
+            self.enemy_cost[self.enemy_window] = self._line_of_fire_block(enemy_pos, self.enemy_shadow,
+                                                                          *self.enemy_window)
+        for window in (old_window, self.enemy_window):
+            if window is not None:
+                self._refresh_total(*window)
+
+    def _uncover_enemy(self):
+        """
+        Walls fell: only the cells in the bins of angle whose shadow moved get a new cost.
+        """
+        shadow = self.shadow(self.enemy_origin)
+        changed = shadow != self.enemy_shadow
+        self.enemy_shadow = shadow
+        if not changed.any():
+            return
+        rows, cols = self.enemy_window
+        x, y = self.enemy_origin
+        dx, dy = self.xs[rows, cols] - x, self.ys[rows, cols] - y
+        bins = self._angle_bins(dx, dy)
+        cells = changed[bins]
+        block = self.enemy_cost[rows, cols]
+        block[cells] = self._fire_cost(np.hypot(dx[cells], dy[cells]), shadow[bins[cells]])
+        cell_rows, cell_cols = np.nonzero(cells)
+        self._refresh_total_cells(cell_rows + rows.start, cell_cols + cols.start)
+
+    def _range_window(self, position) -> typing.Tuple[slice, slice]:
+        """
+        Rows and columns of the cells within enemy_range of position.
+        """
+        reach = self.enemy_range
+        return (self._cell_range(position[1] - reach, position[1] + reach, self.rows),
+                self._cell_range(position[0] - reach, position[0] + reach, self.cols))
+
+    def line_of_fire(self, enemy_pos) -> np.ndarray:
+        """
+        Enemy layer over the whole map: a cell is in the line of fire if it is within enemy_range and closer to the
+        enemy than the first wall cell in its direction (see shadow).
+        """
+        cost = np.zeros((self.rows, self.cols))
+        rows, cols = self._range_window(enemy_pos)
+        cost[rows, cols] = self._line_of_fire_block(enemy_pos, self.shadow(enemy_pos), rows, cols)
+        return cost
+
+    def _line_of_fire_block(self, enemy_pos, shadow, rows, cols) -> np.ndarray:
+        dx, dy = self.xs[rows, cols] - enemy_pos[0], self.ys[rows, cols] - enemy_pos[1]
+        return self._fire_cost(np.hypot(dx, dy), shadow[self._angle_bins(dx, dy)])
+
+    def _fire_cost(self, distance, wall_distance) -> np.ndarray:
+        return np.where((distance <= self.enemy_range) & (distance <= wall_distance),
+                        1.0 - distance / self.enemy_range, 0.0)
+
+    def _angle_bins(self, dx, dy) -> np.ndarray:
+        bins = self.shadow_bins
+        return np.floor((np.arctan2(dy, dx) + np.pi) * (bins / (2 * np.pi))).astype(np.intp) % bins
+
+    def shadow(self, origin) -> np.ndarray:
+        """
+        Shadow casting from origin: for each of shadow_bins bins of angle, how far the ray through the middle of the
+        bin goes before it enters a wall cell, inf if it meets none within enemy_range. Every wall cell in range is
+        only checked against the few bins it covers; the (wall cell, bin) pairs go through max_elements at a time.
+        """
+        x, y = origin[0], origin[1]
+        bins = self.shadow_bins
+        shadow = np.full(bins, np.inf)
+        rows, cols = self._range_window(origin)
+        wall_rows, wall_cols = np.nonzero(self.wall_count[rows, cols] > 0)
+        resolution = self.resolution
+        # Sides of the wall cells, relative to origin
+        low_x = (wall_cols + cols.start) * resolution - x
+        low_y = (wall_rows + rows.start) * resolution - y
+        high_x, high_y = low_x + resolution, low_y + resolution
+        near = np.hypot(np.maximum(np.maximum(low_x, -high_x), 0.0), np.maximum(np.maximum(low_y, -high_y), 0.0))
+        if np.any(near == 0.0):
+            #The enemy is on a wall cell, nothing it shoots gets out
+            shadow[:] = 0.0
+            return shadow
+        keep = near <= self.enemy_range
+        low_x, low_y, high_x, high_y = low_x[keep], low_y[keep], high_x[keep], high_y[keep]
+
+        # Seen from outside, a cell covers less than half a turn: the bins between its corners' angles
+        scale = bins / (2 * np.pi)
+        centre = np.arctan2(low_y + high_y, low_x + high_x)
+        corners = np.arctan2([low_y, low_y, high_y, high_y], [low_x, high_x, low_x, high_x])
+        offsets = (corners - centre + np.pi) % (2 * np.pi) - np.pi
+        first = np.floor((centre + offsets.min(axis=0) + np.pi) * scale).astype(np.intp)
+        counts = np.floor((centre + offsets.max(axis=0) + np.pi) * scale).astype(np.intp) - first + 1
+
+        ends = np.cumsum(counts)
+        start = 0
+        while start < len(counts):
+            stop = max(start + 1, int(np.searchsorted(ends, ends[start] - counts[start] + self.max_elements,
+                                                      side="right")))
+            chunk = slice(start, stop)
+            self._cast_shadow(shadow, first[chunk], counts[chunk], low_x[chunk], low_y[chunk], high_x[chunk],
+                              high_y[chunk])
+            start = stop
+        return shadow
+
+    def _cast_shadow(self, shadow, first, counts, low_x, low_y, high_x, high_y):
+        """
+        Lower shadow to where the rays of the bins first..first + count - 1 enter each cell (slab test).
+        """
+        walls = np.repeat(np.arange(len(counts)), counts)
+        pair_bins = (first[walls] + np.arange(len(walls)) - np.repeat(np.cumsum(counts) - counts, counts)) \
+            % self.shadow_bins
+        inverse_x, inverse_y = self.ray_inverse_x[pair_bins], self.ray_inverse_y[pair_bins]
+        x1, x2 = low_x[walls] * inverse_x, high_x[walls] * inverse_x
+        y1, y2 = low_y[walls] * inverse_y, high_y[walls] * inverse_y
+        enter = np.maximum(np.minimum(x1, x2), np.minimum(y1, y2))
+        leave = np.minimum(np.maximum(x1, x2), np.maximum(y1, y2))
+        hit = (enter <= leave) & (enter >= 0.0)
+        np.minimum.at(shadow, pair_bins[hit], enter[hit])
+
+    def cell_of(self, position) -> typing.Tuple[int, int]:
+        """
+        :return: (row, col) of the cell under position, clamped to the map
+        """
+        col = min(self.cols - 1, max(0, int(position[0] // self.resolution)))
+        row = min(self.rows - 1, max(0, int(position[1] // self.resolution)))
+        return row, col
+
+    def cost_at(self, position) -> float:
+        return float(self.total[self.cell_of(position)])
+
+    def costs_at(self, positions) -> np.ndarray:
+        """
+        Vectorized cost_at for an array of positions (..., 2).
+        """
+        cols = np.clip((positions[..., 0] // self.resolution).astype(np.intp), 0, self.cols - 1)
+        rows = np.clip((positions[..., 1] // self.resolution).astype(np.intp), 0, self.rows - 1)
+        return self.total[rows, cols]
+
+    def steer(self, position) -> typing.Optional[float]:
+        """
+        Gradient descent: the angle in degrees in which the cost falls fastest from position, None on flat ground.
+        """
+        if self._gradient is None:
+            self._gradient = np.gradient(self.total)
+        row, col = self.cell_of(position)
+        gradient_y, gradient_x = self._gradient[0][row, col], self._gradient[1][row, col]
+        if gradient_x == 0.0 and gradient_y == 0.0:
+            return None
+        return math.degrees(math.atan2(-gradient_y, -gradient_x)) % 360
+
+    def best_nearby(self, position, radius) -> typing.Tuple[float, float]:
+        """
+        Centre of the cheapest cell within radius of position, the closest one on ties.
+        """
+        rows = self._cell_range(position[1] - radius, position[1] + radius, self.rows)
+        cols = self._cell_range(position[0] - radius, position[0] + radius, self.cols)
+        xs, ys = self.xs[rows, cols], self.ys[rows, cols]
+        distance = np.hypot(xs - position[0], ys - position[1])
+        # Distance only breaks ties, it is well below any cost difference
+        cost = np.where(distance <= radius, self.total[rows, cols] + distance * 1e-6, np.inf)
+        best = np.unravel_index(int(np.argmin(cost)), cost.shape)
+        if not np.isfinite(cost[best]):
+            return position[0], position[1]
+        return float(xs[best]), float(ys[best])
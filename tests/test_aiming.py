@@ -0,0 +1,38 @@
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Gene4", "src"))
+
+from aiming import lead_angle, lead_angles
+
+BULLET_SPEED = 450.0
+
+# (shooter, target, velocity, expected angle, expected seconds to impact)
+CASES = [
+    #Stationary target: straight at it, distance / bullet speed
+    ((100.0, 100.0), (100.0, 550.0), (0.0, 0.0), 90.0, 1.0),
+    #Faster than the bullet and moving away: no intercept, straight at it
+    ((0.0, 0.0), (300.0, 0.0), (600.0, 0.0), 0.0, math.inf),
+    #Crossing at right angles at distance d and speed v: |(d, v t)| = s t, t = d / sqrt(s^2 - v^2), sin(angle) = v / s
+    ((0.0, 0.0), (300.0, 0.0), (0.0, 200.0), math.degrees(math.asin(200.0 / BULLET_SPEED)),
+     300.0 / math.sqrt(BULLET_SPEED ** 2 - 200.0 ** 2)),
+]
+
+
+@pytest.mark.parametrize("shooter, target, velocity, angle, seconds", CASES)
+def test_lead_angle(shooter, target, velocity, angle, seconds):
+    assert lead_angle(shooter, target, velocity, BULLET_SPEED) == pytest.approx((angle, seconds))
+
+
+def test_lead_angles_matches_lead_angle():
+    angles, times = lead_angles((0.0, 0.0), [case[1] for case in CASES[1:]], [case[2] for case in CASES[1:]],
+                                BULLET_SPEED)
+    assert angles == pytest.approx([case[3] for case in CASES[1:]])
+    assert times == pytest.approx([case[4] for case in CASES[1:]])
+    angles, times = lead_angles(CASES[0][0], np.array([CASES[0][1]]), np.array([CASES[0][2]]), BULLET_SPEED)
+    assert (angles[0], times[0]) == pytest.approx((CASES[0][3], CASES[0][4]))
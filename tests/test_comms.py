@@ -0,0 +1,58 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Gene4", "src"))
+
+import comms
+
+
+def turn(updated, deleted=()):
+    return {"message": {"updated_objects": updated, "deleted_objects": list(deleted)}}
+
+
+def test_coalesce_merges_updates():
+    merged = comms.coalesce_turn_messages([
+        turn({"tank": {"position": [0, 0]}, "bullet-1": {"position": [5, 5]}}),
+        turn({"tank": {"position": [1, 0]}}),
+        turn({"tank": {"position": [2, 0]}, "powerup": {"position": [9, 9]}}),
+    ])
+    assert merged["message"]["updated_objects"] == {"tank": {"position": [2, 0]}, "bullet-1": {"position": [5, 5]},
+                                                    "powerup": {"position": [9, 9]}}
+    assert merged["message"]["deleted_objects"] == []
+
+
+def test_coalesce_deleted_objects():
+    merged = comms.coalesce_turn_messages([
+        turn({"bullet-1": {"position": [0, 0]}, "bullet-2": {"position": [1, 1]}}, deleted=["wall-1"]),
+        #Updated then deleted: only deleted
+        turn({}, deleted=["bullet-1"]),
+        #Deleted then sent again: in both lists, Game deletes first so it ends up present
+        turn({"wall-2": {"position": [3, 3]}}, deleted=["wall-2"]),
+        turn({"wall-2": {"position": [4, 4]}}),
+    ])
+    assert merged["message"]["updated_objects"] == {"bullet-2": {"position": [1, 1]}, "wall-2": {"position": [4, 4]}}
+    assert merged["message"]["deleted_objects"] == ["wall-1", "bullet-1", "wall-2"]
+
+
+def test_reader_passes_signals_through():
+    lines = [comms.END_INIT_SIGNAL, turn({"a": {"hp": 1}}), turn({"a": {"hp": 2}}, deleted=["b"]), comms.END_SIGNAL,
+             turn({"a": {"hp": 3}})]
+    stdin = io.BytesIO(b"".join(json.dumps(line).encode() + b"\n" for line in lines))
+    transport = comms.Transport(codec=comms.JsonCodec(), stdin=stdin, stdout=io.BytesIO())
+    reader = comms.BackgroundReader(transport)
+    reader.start()
+    reader.thread.join(timeout=5)
+
+    assert reader.get() == (comms.END_INIT_SIGNAL, 0)
+    assert reader.get() == (turn({"a": {"hp": 2}}, deleted=["b"]), 1)
+    #END is never merged over, nor into
+    assert reader.get() == (comms.END_SIGNAL, 0)
+    assert reader.get() == (turn({"a": {"hp": 3}}), 0)
+    for _ in range(2):
+        with pytest.raises(EOFError):
+            reader.get()
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Gene4", "src"))
+
+from enemy_tracker import EnemyTracker, HISTORY_SIZE, TICK_SECONDS
+
+
+def test_constant_velocity_track():
+    """
+    An enemy going straight at constant speed is predicted on its line, and every observation makes the tracker more
+    sure of it.
+    """
+    tracker = EnemyTracker()
+    velocity = (100.0, -50.0)
+    uncertainties = []
+    for turn in range(20):
+        seconds = turn * TICK_SECONDS
+        tracker.observe(turn, (200.0 + velocity[0] * seconds, 300.0 + velocity[1] * seconds), velocity)
+        uncertainties.append(tracker.uncertainty(turn, 0.5))
+
+    assert all(later < earlier for earlier, later in zip(uncertainties[1:5], uncertainties[2:6]))
+    assert uncertainties[-1] < uncertainties[1]
+
+    (x, y), (vx, vy) = tracker.predict(19, 1.0)
+    assert x == pytest.approx(200.0 + velocity[0] * 2.9, abs=1.0)
+    assert y == pytest.approx(300.0 + velocity[1] * 2.9, abs=1.0)
+    assert (vx, vy) == pytest.approx(velocity, abs=0.5)
+    #Further ahead is less certain
+    assert tracker.uncertainty(19, 1.0) > tracker.uncertainty(19, 0.5) > tracker.uncertainty(19)
+
+
+def test_history_keeps_the_latest_observations():
+    tracker = EnemyTracker()
+    for turn in range(HISTORY_SIZE + 10):
+        tracker.observe(turn, (float(turn), 0.0), (10.0, 0.0))
+    observations = tracker.observations()
+    assert len(observations) == HISTORY_SIZE
+    assert observations[0, 0] == 10 and observations[-1, 0] == HISTORY_SIZE + 9
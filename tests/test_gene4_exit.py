@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "tools"))
+
+import simulator
+
+
+def test_exits_cleanly_with_stdin_still_open():
+    """
+    The server does not close our stdin after END, the bot has to stop its reader thread and exit 0 by itself.
+    """
+    match = simulator.Simulator(seed=1)
+    process = subprocess.Popen([sys.executable, os.path.join("src", "main.py")], cwd=os.path.join(REPO_ROOT, "Gene4"),
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for message in match.init_messages(0):
+            process.stdin.write(json.dumps(message).encode() + b"\n")
+        for _ in range(5):
+            process.stdin.write(json.dumps(match.turn_message()).encode() + b"\n")
+            process.stdin.flush()
+            assert process.stdout.readline()
+            match.step([None, None])
+        process.stdin.write(json.dumps(simulator.END_SIGNAL).encode() + b"\n")
+        process.stdin.flush()
+        assert process.wait(timeout=10) == 0, process.stderr.read().decode()
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdin.close()
+        process.stdout.close()
+        process.stderr.close()
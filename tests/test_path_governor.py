@@ -0,0 +1,30 @@
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Gene4", "src"))
+
+from path_governor import PathGovernor
+
+
+def test_close_target_is_suppressed_on_the_way():
+    governor = PathGovernor()
+    assert governor.request([0.0, 0.0], [200.0, 0.0]) == [200.0, 0.0]
+    assert governor.request([100.0, 0.0], [205.0, 0.0]) is None
+
+
+def test_arriving_at_the_active_target_lets_the_next_one_out():
+    """
+    Once the tank reached the active target the server is done with that path, a target close to it must be sent
+    again or the tank stands still.
+    """
+    governor = PathGovernor()
+    assert governor.request([0.0, 0.0], [200.0, 0.0]) == [200.0, 0.0]
+    assert governor.request([195.0, 0.0], [215.0, 0.0]) == [215.0, 0.0]
+    assert governor.stats()["paths_issued"] == 2
+
+
+def test_target_where_we_stand_is_not_sent_again():
+    governor = PathGovernor()
+    assert governor.request([0.0, 0.0], [200.0, 0.0]) == [200.0, 0.0]
+    assert governor.request([200.0, 0.0], [202.0, 0.0]) is None
@@ -0,0 +1,61 @@
+import os
+import random
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Gene4", "src"))
+
+from pathfinding import (DESTRUCTIBLE_WALL_COST, NEIGHBOURS, IncrementalPlanner, OccupancyGrid, PathPlanner,
+                         edge_cost)
+
+
+def path_cost(grid, start_cell, cells, cost_weight):
+    """
+    Cost of a path of cells from start_cell, with edge_cost.
+    """
+    steps = {(d_col, d_row): step_cost for d_col, d_row, step_cost in NEIGHBOURS}
+    total = 0.0
+    previous = start_cell
+    for col, row in cells:
+        step_cost = steps[(col - previous[0], row - previous[1])]
+        total += edge_cost(step_cost, grid.cells[row * grid.cols + col], cost_weight)
+        previous = (col, row)
+    return total
+
+
+def optimal_cost(grid, start, goal):
+    """
+    Cost of the cheapest path with plain (unweighted) A*.
+    """
+    planner = PathPlanner(grid, heuristic_weight=1.0)
+    start_cell, goal_cell = grid.cell_of(start), grid.cell_of(goal)
+    cells = planner.search(start_cell, goal_cell, 0.0, max_expansions=10 ** 6)
+    assert planner.last_complete
+    return path_cost(grid, start_cell, cells, planner.cost_weight)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_repaired_incremental_planner_matches_a_star(seed):
+    rng = random.Random(seed)
+    grid = OccupancyGrid(400, 300)
+    walls = [(rng.uniform(60, 340), rng.uniform(40, 260)) for _ in range(25)]
+    destructible = [(rng.uniform(60, 340), rng.uniform(40, 260)) for _ in range(15)]
+    for position in walls:
+        grid.add_wall(position)
+    for position in destructible:
+        grid.add_wall(position, DESTRUCTIBLE_WALL_COST)
+    start, goal = (25.0, 25.0), (375.0, 275.0)
+
+    planner = IncrementalPlanner(grid, max_expansions=10 ** 6)
+    planner.set_goal(goal)
+    assert planner.plan(start) is not None
+    start_node = grid.cell_of(start)[1] * grid.cols + grid.cell_of(start)[0]
+    assert planner.g[start_node] == pytest.approx(optimal_cost(grid, start, goal))
+
+    #Destructible walls fall, the planner repairs its search
+    for position in destructible[:8]:
+        planner.update_cells(grid.remove_wall(position))
+    assert planner.plan(start) is not None
+    assert planner.g[start_node] == pytest.approx(optimal_cost(grid, start, goal))
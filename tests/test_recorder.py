@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Gene4", "src"))
+
+from recorder import END_INIT_SIGNAL, END_SIGNAL, MatchReader, MatchRecorder
+
+TICKS = 23
+KEYFRAME_EVERY = 5
+
+
+def match_messages():
+    """
+    A short match: tank ids, two init batches, then turns moving a tank, firing bullets and deleting them.
+    """
+    messages = [{"message": {"your-tank-id": "tank-1", "enemy-tank-id": "tank-2"}},
+                {"message": {"updated_objects": {"wall-%d" % i: {"type": 3, "position": [i * 20.0, 0.0]}
+                                                 for i in range(5)}}},
+                {"message": {"updated_objects": {"tank-1": {"type": 1, "position": [0.0, 0.0], "hp": 5}}}},
+                END_INIT_SIGNAL]
+    for tick in range(1, TICKS + 1):
+        updated = {"tank-1": {"type": 1, "position": [tick * 2.0, tick * 1.0], "hp": 5},
+                   "bullet-%d" % tick: {"type": 2, "position": [tick * 1.0, 0.0]}}
+        deleted = ["bullet-%d" % (tick - 2)] if tick > 2 else []
+        if tick == 7:
+            deleted.append("wall-3")
+        messages.append({"message": {"updated_objects": updated, "deleted_objects": deleted}})
+    return messages + [END_SIGNAL]
+
+
+def record(path, close=True):
+    recorder = MatchRecorder(str(path), keyframe_every=KEYFRAME_EVERY)
+    for message in match_messages():
+        if message == END_SIGNAL and not close:
+            break
+        recorder.inbound(json.dumps(message).encode() + b"\n", message)
+        if recorder.tick:
+            recorder.outbound(json.dumps({"move": recorder.tick}).encode() + b"\n", recorder.tick)
+    if not close:
+        #As if the bot died here: what was written so far, no index
+        recorder.file.flush()
+    return recorder
+
+
+def sequential_state(lines, tick):
+    """
+    Objects after tick, from applying the deltas of the whole stream in order.
+    """
+    objects = {}
+    turn = 0
+    in_game = False
+    for message in map(json.loads, lines):
+        if message == END_INIT_SIGNAL:
+            in_game = True
+            continue
+        if in_game:
+            turn += 1
+            if turn > tick:
+                break
+        if isinstance(message, dict) and "updated_objects" in message["message"]:
+            for object_id in message["message"].get("deleted_objects", ()):
+                objects.pop(object_id, None)
+            objects.update(message["message"]["updated_objects"])
+    return objects
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "match.rec"
+    record(path)
+    tick = 12
+    assert tick % KEYFRAME_EVERY
+    with MatchReader(str(path)) as reader:
+        assert reader.ticks == TICKS
+        assert sorted(reader.keyframe_offsets) == list(range(KEYFRAME_EVERY, TICKS + 1, KEYFRAME_EVERY))
+        expected = sequential_state(reader.messages(), tick)
+        #Seek: from the keyframe at tick 10 plus two deltas
+        init_message, objects = reader.state(tick)
+        assert objects == expected
+        assert init_message == match_messages()[0]
+        assert "wall-3" not in objects and {"bullet-11", "bullet-12"} <= set(objects) and "bullet-10" not in objects
+        #Restarting the stream from the tick brings the same state in its init batch
+        assert sequential_state(reader.messages(tick), 0) == expected
+        assert reader.responses()[tick] == [{"move": tick}]
+
+
+def test_unclosed_recording_rebuilds_its_index(tmp_path):
+    closed, unclosed = tmp_path / "closed.rec", tmp_path / "unclosed.rec"
+    record(closed)
+    record(unclosed, close=False)
+    with MatchReader(str(closed)) as reader, MatchReader(str(unclosed)) as rebuilt:
+        assert rebuilt.keyframe_offsets == reader.keyframe_offsets
+        for tick in (0, 3, KEYFRAME_EVERY, 12, TICKS):
+            assert rebuilt.state(tick) == reader.state(tick)
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Gene4", "src"))
+
+from threat_field import ThreatField
+
+WIDTH, HEIGHT = 1000, 800
+
+
+def random_walls(seed, count=120):
+    rng = np.random.default_rng(seed)
+    return [("wall-%d" % i, (float(x), float(y)))
+            for i, (x, y) in enumerate(rng.uniform((0, 0), (WIDTH, HEIGHT), (count, 2)))]
+
+
+def random_bullets(rng, count):
+    return rng.uniform((0, 0), (WIDTH, HEIGHT), (count, 2)), rng.uniform(-300, 300, (count, 2))
+
+
+def test_chunked_line_of_fire_matches_unchunked():
+    walls = random_walls(1)
+    chunked, unchunked = ThreatField(WIDTH, HEIGHT, max_elements=7), ThreatField(WIDTH, HEIGHT, max_elements=10 ** 9)
+    chunked.add_walls(walls)
+    unchunked.add_walls(walls)
+    rng = np.random.default_rng(2)
+    for enemy in rng.uniform((0, 0), (WIDTH, HEIGHT), (20, 2)):
+        assert np.array_equal(chunked.shadow(enemy), unchunked.shadow(enemy))
+        assert np.array_equal(chunked.line_of_fire(enemy), unchunked.line_of_fire(enemy))
+
+
+def test_line_of_fire_stops_at_walls():
+    field = ThreatField(WIDTH, HEIGHT)
+    field.add_walls([("wall", (512.5, 412.5))])
+    cost = field.line_of_fire((312.5, 412.5))
+    #Same row, in front of and behind the wall
+    assert cost[16, 18] > 0.0
+    assert cost[16, 22] == 0.0
+    #Out of range
+    assert cost[16, 36] == 0.0
+
+
+def test_incremental_updates_match_a_fresh_field():
+    """
+    After moving bounds, bullets and enemy, and walls falling, the field kept up to date by deltas is the one built
+    from scratch on the same state.
+    """
+    walls = random_walls(3)
+    field = ThreatField(WIDTH, HEIGHT)
+    field.add_walls(walls)
+    rng = np.random.default_rng(4)
+    #The enemy layer is cast from where the enemy entered its cell, they hop from cell centre to cell centre
+    enemy = np.array([512.5, 412.5])
+    for tick in range(40):
+        shrink = tick * 5.0
+        bounds = (shrink, shrink * 0.8, WIDTH - shrink, HEIGHT - shrink * 0.8)
+        bullets = random_bullets(rng, tick % 6)
+        enemy = np.clip(enemy + rng.integers(-1, 2, 2) * 25.0, 12.5, (WIDTH - 12.5, HEIGHT - 12.5))
+        if tick % 7 == 3:
+            field.remove_wall(walls.pop(int(rng.integers(len(walls))))[0])
+        field.update(bounds, *bullets, None if tick % 13 == 12 else enemy)
+
+        fresh = ThreatField(WIDTH, HEIGHT)
+        fresh.add_walls(walls)
+        fresh.update(bounds, *bullets, None if tick % 13 == 12 else enemy)
+        np.testing.assert_allclose(field.wall_cost, fresh.wall_cost, atol=1e-12)
+        np.testing.assert_allclose(field.total, fresh.total, atol=1e-12)
@@ -0,0 +1,352 @@
+"""
+Per-tick latency benchmark for our bots' Game classes.
+
+Recorded turn streams (what the server sent to one player, one JSON per line) are replayed into a bot's
+`Game` in-process: the stream is put behind sys.stdin so the bot's own `comms` parses it exactly like in a match.
+Every tick we time `read_next_turn_data` and `respond_to_turn` separately.
+
+    python tools/benchmark.py                       # every bot on the built-in scenarios
+    python tools/benchmark.py Gene3 Gene4 --check   # fail if slower than tools/bench_baseline.json
+    python tools/benchmark.py Gene4 --stream stream.jsonl
+    python tools/benchmark.py Gene4 --recording match.rec --from-tick 300
+
+The built-in scenarios are generated with the simulator (scripted players, fixed seeds) so they are the same on every
+machine. Timings are not, so refresh the baseline with --save-baseline when moving to a different machine.
+"""
+import argparse
+import contextlib
+import gc
+import importlib
+import importlib.util
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import simulator
+
+REPO_ROOT = simulator.REPO_ROOT
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+#The match recording format lives with the bot that writes it
+RECORDER_FILE = os.path.join(REPO_ROOT, "Gene4", "src", "recorder.py")
+BOTS = ["Gene", "Gene2", "Gene3", "Gene4", "test_bot"]
+PHASES = ["read", "respond", "total"]
+
+#name -> (simulator options, ticks, fire_every of the scripted players)
+SCENARIOS = {
+    "small": (dict(seed=1, width=1000, height=800, wall_density=0.3, tank_hp=10 ** 6, closing_speed=2), 300, 10),
+    "mid-game": (dict(seed=2, width=1800, height=1200, wall_density=1.5, tank_hp=10 ** 6, closing_speed=4), 600, 5),
+    "bullet-heavy": (dict(seed=3, width=1800, height=1200, wall_density=0.2, tank_hp=10 ** 6, closing_speed=4), 600, 1),
+    "late-boundary": (dict(seed=4, width=1400, height=1000, wall_density=1.0, tank_hp=10 ** 6, closing_speed=40), 600,
+                      5),
+}
+
+
+def record_scenario(name) -> str:
+    """
+    Play the scenario between two scripted players and return the stream sent to the first one.
+    """
+    options, ticks, fire_every = SCENARIOS[name]
+    players = [simulator.ScriptedPlayer(seed=options["seed"] + index, fire_every=fire_every) for index in range(2)]
+    record = io.StringIO()
+    simulator.run_match(players, record=record, max_ticks=ticks, **options)
+    return record.getvalue()
+
+
+def load_recorder():
+    """
+    Import Gene4's recorder module under its own name, so it does not get mixed up with the bots' modules.
+    """
+    spec = importlib.util.spec_from_file_location("match_recorder", RECORDER_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def recording_stream(path, from_tick=0) -> str:
+    """
+    Stream of a match recording (see Gene4/src/recorder.py) as if the match had started at from_tick.
+    """
+    with load_recorder().MatchReader(path) as reader:
+        return "\n".join(reader.messages(from_tick)) + "\n"
+
+
+def adapt_gene3(game_module):
+    """
+    Gene3 is a work in progress that cannot play as is: respond_to_turn reads both tanks' positions from my_tank and
+    enemy_tank, where read_next_turn_data stores the whole tank dicts, and the distance between them from a global
+    `distance` nothing defines. Give it both after every read, so what it does per tick can be measured at all.
+    """
+    class Game(game_module.Game):
+        def read_next_turn_data(self):
+            if not super().read_next_turn_data():
+                return False
+            self.my_tank, self.enemy_tank = self.my_tank["position"], self.enemy_tank["position"]
+            game_module.distance = self.euclidean_distance(*self.my_tank, *self.enemy_tank)
+            return True
+
+    game_module.Game = Game
+
+
+#bot -> function patching its game module before it is benchmarked
+BOT_ADAPTERS = {
+    "Gene3": adapt_gene3,
+}
+
+
+def stream_object_counts(stream) -> list:
+    """
+    Number of objects in the game after every turn of the stream, bullets included. Taken from the stream rather than
+    from each bot's own bookkeeping, which leaves out different things (Gene4 keeps its bullets out of Game.objects).
+    """
+    objects = set()
+    counts = []
+    in_game = False
+    for line in stream.splitlines():
+        if not line.strip():
+            continue
+        message = json.loads(line)
+        if message == simulator.END_INIT_SIGNAL:
+            in_game = True
+            continue
+        if not isinstance(message, dict) or "updated_objects" not in message.get("message", ()):
+            continue
+        objects.difference_update(message["message"].get("deleted_objects", ()))
+        objects.update(message["message"]["updated_objects"])
+        if in_game:
+            counts.append(len(objects))
+    return counts
+
+
+@contextlib.contextmanager
+def bot_modules(bot):
+    """
+    Make `bot/src` importable as the top level modules (game, comms, ...) the bot expects, without mixing them up with
+    another bot's modules of the same name.
+    """
+    src = os.path.join(REPO_ROOT, bot, "src")
+
+    def forget_bot_modules():
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None) or ""
+            if path.startswith(REPO_ROOT) and os.path.basename(os.path.dirname(path)) == "src":
+                del sys.modules[name]
+
+    forget_bot_modules()
+    sys.path.insert(0, src)
+    try:
+        game_module = importlib.import_module("game")
+        adapter = BOT_ADAPTERS.get(os.path.basename(os.path.normpath(bot)))
+        if adapter is not None:
+            adapter(game_module)
+        yield game_module
+    finally:
+        sys.path.remove(src)
+        forget_bot_modules()
+
+
+@contextlib.contextmanager
+def replay_stdio(stream):
+    """
+    Serve the recorded stream on stdin, swallow stdout (the bot's responses) and stderr (its logs).
+    """
+    saved = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin = io.TextIOWrapper(io.BytesIO(stream.encode()))
+    sys.stdout = io.TextIOWrapper(io.BytesIO())
+    sys.stderr = open(os.devnull, "w")
+    try:
+        yield
+    finally:
+        sys.stderr.close()
+        sys.stdin, sys.stdout, sys.stderr = saved
+
+
+def replay(game_module, stream, measure_memory=False) -> dict:
+    """
+    Run one bot's Game over the whole stream.
+    :return: per phase lists of seconds, object counts per tick, peak traced memory and the error that stopped the
+        bot early (if any)
+    """
+    timings = {phase: [] for phase in PHASES}
+    init_time = None
+    error = None
+    random.seed(0)
+    gc.collect()
+    #Bots with a comms.Transport count their own parse/serialize time
+    transport = getattr(game_module.comms, "transport", None)
+    io_before = transport.parse_seconds + transport.serialize_seconds if transport is not None else None
+    with replay_stdio(stream):
+        if measure_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            game = game_module.Game()
+            init_time = time.perf_counter() - start
+            while True:
+                tick_start = time.perf_counter()
+                if not game.read_next_turn_data():
+                    break
+                read_end = time.perf_counter()
+                game.respond_to_turn()
+                tick_end = time.perf_counter()
+                timings["read"].append(read_end - tick_start)
+                timings["respond"].append(tick_end - read_end)
+                timings["total"].append(tick_end - tick_start)
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}"
+    peak = None
+    if measure_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    io_seconds = None
+    if transport is not None:
+        io_seconds = transport.parse_seconds + transport.serialize_seconds - io_before
+    object_counts = stream_object_counts(stream)[:len(timings["total"])]
+    return {"timings": timings, "objects": object_counts, "init": init_time, "peak_memory": peak, "error": error,
+            "io": io_seconds}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(runs) -> dict:
+    """
+    Merge repeated runs of one bot on one scenario into the numbers we report and store in the baseline.
+    """
+    summary = {}
+    for phase in PHASES:
+        values = sorted(value for run in runs for value in run["timings"][phase])
+        summary[phase] = {
+            "p50_us": percentile(values, 0.50), "p95_us": percentile(values, 0.95),
+            "p99_us": percentile(values, 0.99), "max_us": values[-1] if values else None,
+        }
+        for key, value in summary[phase].items():
+            if value is not None:
+                summary[phase][key] = round(value * 1e6, 1)
+    total_time = sum(sum(run["timings"]["total"]) for run in runs)
+    ticks = sum(len(run["timings"]["total"]) for run in runs)
+    objects = [count for run in runs for count in run["objects"]]
+    summary["ticks"] = ticks // len(runs)
+    summary["ticks_per_second"] = round(ticks / total_time, 1) if total_time else None
+    summary["mean_objects"] = round(sum(objects) / len(objects), 1) if objects else None
+    summary["init_ms"] = round(runs[0]["init"] * 1000, 3) if runs[0]["init"] is not None else None
+    io_seconds = [run["io"] for run in runs if run["io"] is not None]
+    summary["io_us_per_tick"] = round(sum(io_seconds) / ticks * 1e6, 1) if io_seconds and ticks else None
+    summary["peak_memory_kib"] = None
+    summary["error"] = runs[0]["error"]
+    return summary
+
+
+def benchmark(bots, streams, repeat=3) -> dict:
+    results = {}
+    for bot in bots:
+        results[bot] = {}
+        for scenario, stream in streams.items():
+            with bot_modules(bot) as game_module:
+                runs = [replay(game_module, stream) for _ in range(repeat)]
+                summary = summarize(runs)
+                #Memory is measured in a separate pass, tracemalloc slows everything down
+                peak = replay(game_module, stream, measure_memory=True)["peak_memory"]
+                summary["peak_memory_kib"] = round(peak / 1024, 1)
+            results[bot][scenario] = summary
+    return results
+
+
+def print_report(results):
+    header = f"{'bot':<9} {'scenario':<14} {'ticks':>5} {'objs':>7} {'read p50/p95/p99/max us':>28} " \
+             f"{'respond p50/p95/p99/max us':>30} {'io us':>6} {'ticks/s':>9} {'peak KiB':>9}"
+    print(header)
+    print("-" * len(header))
+    for bot, scenarios in results.items():
+        for scenario, summary in scenarios.items():
+            phases = []
+            for phase in ("read", "respond"):
+                values = summary[phase]
+                phases.append("/".join("-" if values[key] is None else f"{values[key]:.0f}"
+                                       for key in ("p50_us", "p95_us", "p99_us", "max_us")))
+            print(f"{bot:<9} {scenario:<14} {summary['ticks']:>5} {summary['mean_objects'] or 0:>7} {phases[0]:>28} "
+                  f"{phases[1]:>30} {summary['io_us_per_tick'] or '-':>6} {summary['ticks_per_second'] or 0:>9} "
+                  f"{summary['peak_memory_kib']:>9}")
+            if summary["error"]:
+                print(f"{'':<9} {'':<14} stopped early: {summary['error']}")
+
+
+def compare(results, baseline, tolerance) -> list:
+    """
+    :return: human readable regressions of p95 tick time or peak memory against the baseline
+    """
+    regressions = []
+    for bot, scenarios in results.items():
+        for scenario, summary in scenarios.items():
+            old = baseline.get(bot, {}).get(scenario)
+            if old is None:
+                continue
+            checks = [("p95 tick time", summary["total"]["p95_us"], old["total"]["p95_us"]),
+                      ("peak memory", summary["peak_memory_kib"], old["peak_memory_kib"])]
+            for label, new_value, old_value in checks:
+                if new_value is not None and old_value and new_value > old_value * (1 + tolerance):
+                    regressions.append(f"{bot}/{scenario}: {label} {old_value} -> {new_value}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-tick latency of the bots' Game classes.")
+    parser.add_argument("bots", nargs="*", default=BOTS)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="default: all of them")
+    parser.add_argument("--stream", action="append", default=[], help="recorded stream file to replay as well")
+    parser.add_argument("--recording", action="append", default=[], help="match recording to replay as well")
+    parser.add_argument("--from-tick", type=int, default=0, help="start the recordings at this tick")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit with 1 on a regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before it is a regression")
+    parser.add_argument("--json", help="also write the full results to this file")
+    args = parser.parse_args()
+    #Gene4 caches the analysis of the maps it has seen (see Gene4/src/map_cache.py), every run after the first would
+    #time loading it instead of the analysis. Measure cold unless asked otherwise.
+    os.environ.setdefault("MAP_CACHE_DIR", "")
+
+    streams = {}
+    for scenario in args.scenario or ([] if args.stream or args.recording else SCENARIOS):
+        streams[scenario] = record_scenario(scenario)
+    for path in args.stream:
+        with open(path) as stream_file:
+            streams[os.path.basename(path)] = stream_file.read()
+    for path in args.recording:
+        streams[f"{os.path.basename(path)}@{args.from_tick}"] = recording_stream(path, args.from_tick)
+
+    results = benchmark(args.bots, streams, repeat=args.repeat)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    if args.save_baseline:
+        for bot, scenarios in results.items():
+            baseline.setdefault(bot, {}).update(scenarios)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2)
+            baseline_file.write("\n")
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Look into match recordings written by a bot run with COMMS_RECORD=<file> (see Gene4/src/recorder.py).
+
+    python tools/replay.py match.rec                                  # what is in the recording
+    python tools/replay.py match.rec --state 250                      # objects after tick 250
+    python tools/replay.py match.rec --bot Gene4 --from-tick 250 --ticks 20
+
+The last form jumps to tick 250 (closest keyframe + the deltas after it), starts the bot's Game there in-process and
+prints, tick by tick, the response it gives now next to the one recorded in the match.
+"""
+import argparse
+import collections
+import io
+import json
+import os
+import random
+import sys
+
+import benchmark
+
+
+class KeepOpenBytesIO(io.BytesIO):
+    def close(self):
+        pass
+
+
+def summary(reader, path):
+    counts = collections.Counter(kind.decode() for kind, _, _ in reader.records())
+    print(f"{path}: {os.path.getsize(path)} bytes, {reader.ticks} ticks, keyframes at {sorted(reader.keyframe_offsets)}")
+    print(f"records: {dict(counts)}")
+
+
+def print_state(reader, tick):
+    init_message, objects = reader.state(tick)
+    by_type = collections.Counter(game_object["type"] for game_object in objects.values())
+    print(f"tick {tick}: {len(objects)} objects, by type {dict(sorted(by_type.items()))}")
+    my_tank_id = init_message["message"]["your-tank-id"]
+    enemy_tank_id = init_message["message"]["enemy-tank-id"]
+    for name, tank_id in (("us", my_tank_id), ("enemy", enemy_tank_id)):
+        print(f"{name}: {json.dumps(objects.get(tank_id))}")
+
+
+def rerun(reader, bot, from_tick, ticks):
+    """
+    Feed the bot the match from from_tick and compare its responses with the recorded ones.
+    """
+    lines = []
+    for line in reader.messages(from_tick):
+        lines.append(line)
+        if ticks and len(lines) >= 3 + ticks:
+            break
+    if lines[-1] != json.dumps("END"):
+        lines.append(json.dumps("END"))
+    stream = "\n".join(lines) + "\n"
+    recorded = reader.responses()
+
+    output = KeepOpenBytesIO()
+    with benchmark.bot_modules(bot) as game_module:
+        saved = sys.stdin, sys.stdout
+        sys.stdin = io.TextIOWrapper(io.BytesIO(stream.encode()))
+        sys.stdout = io.TextIOWrapper(output, write_through=True)
+        random.seed(0)
+        try:
+            game = game_module.Game()
+            while game.read_next_turn_data():
+                game.respond_to_turn()
+        finally:
+            sys.stdout.flush()
+            sys.stdin, sys.stdout = saved
+
+    for offset, line in enumerate(output.getvalue().decode().splitlines()):
+        tick = from_tick + 1 + offset
+        print(f"{tick:5d}  now {line:60s}  recorded {json.dumps(recorded.get(tick))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay match recordings.")
+    parser.add_argument("recording")
+    parser.add_argument("--state", type=int, help="print the objects after this tick")
+    parser.add_argument("--bot", help="rerun this bot from --from-tick")
+    parser.add_argument("--from-tick", type=int, default=0)
+    parser.add_argument("--ticks", type=int, default=0, help="number of ticks to rerun, default until the end")
+    args = parser.parse_args()
+
+    with benchmark.load_recorder().MatchReader(args.recording) as reader:
+        tick = args.state if args.state is not None else args.from_tick if args.bot else 0
+        if not 0 <= tick <= reader.ticks:
+            parser.error(f"tick {tick} is not in {args.recording}, it has ticks 0 to {reader.ticks}")
+        if args.state is not None:
+            print_state(reader, args.state)
+        elif args.bot:
+            rerun(reader, args.bot, args.from_tick, args.ticks)
+        else:
+            summary(reader, args.recording)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,662 @@
+"""
+Headless stand-in for the CodeQuest 23 game server.
+
+It speaks the same line based JSON protocol as the real server over the bots' stdin/stdout, so any of our bots can be
+played locally, e.g. `python tools/simulator.py Gene4 test_bot --seed 3`. Ticks run as fast as the bots can answer.
+
+The game rules here are a simplified approximation of the real server (square walls on a grid, straight line paths,
+a closing boundary that shrinks at a constant speed). It is meant for benchmarking and comparing our bots offline, not
+for reproducing a live match exactly.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import selectors
+import subprocess
+import sys
+import time
+import typing
+import uuid
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Object type values, same as ObjectTypes in every bot's src/object_types.py
+TANK = 1
+BULLET = 2
+WALL = 3
+DESTRUCTIBLE_WALL = 4
+BOUNDARY = 5
+CLOSING_BOUNDARY = 6
+POWERUP = 7
+
+END_SIGNAL = "END"
+END_INIT_SIGNAL = "END_INIT"
+
+#Game rules
+TICK_SECONDS = 0.1
+TANK_SPEED = 141.42
+TANK_RADIUS = 10
+TANK_HP = 5
+BULLET_SPEED = 450
+BULLET_DAMAGE = 1
+WALL_SIZE = 20
+DESTRUCTIBLE_WALL_HP = 2
+CLOSING_SPEED = 10
+POWERUP_INTERVAL = 60
+POWERUP_RADIUS = 10
+POWERUP_TYPES = ("HEALTH", "DAMAGE", "SPEED")
+SPEED_POWERUP_FACTOR = 1.25
+INIT_BATCH_SIZE = 100
+MAX_TICKS = 3000
+
+
+class Simulator:
+    """
+    Holds the state of one match and produces the messages the real server would send.
+    Objects are kept in the exact dict format the server uses, so `turn_message` can hand them out as they are.
+
+    Usage: send `init_messages(i)` to player i, then every tick send `turn_message()` to both players, collect their
+    responses and pass them to `step`. Once `is_over` is True, send END_SIGNAL.
+    """
+    def __init__(self, seed=0, width=None, height=None, wall_density=1.0, destructible_ratio=0.3,
+                 powerup_interval=POWERUP_INTERVAL, closing_speed=CLOSING_SPEED, max_ticks=MAX_TICKS,
+                 tank_hp=TANK_HP):
+        self.rng = random.Random(seed)
+        self.width = width or self.rng.randrange(1000, 1801, 100)
+        self.height = height or self.rng.randrange(800, 1201, 100)
+        self.powerup_interval = powerup_interval
+        self.closing_speed = closing_speed
+        self.max_ticks = max_ticks
+
+        self.tick = 0
+        self.winner = None
+        self.is_over = False
+
+        self.objects = {}
+        #(col, row) -> id of the wall in that cell
+        self.wall_cells = {}
+        #Pending deltas for the next turn message
+        self._updated = {}
+        self._deleted = []
+
+        #Active command of every tank: ("move", angle), ("path", [x, y]) or None
+        self.commands = {}
+        self.tank_speed = {}
+        self.bullet_damage = {}
+
+        self.boundary_id = self._new_id()
+        self.objects[self.boundary_id] = {
+            "type": BOUNDARY,
+            "position": [[0, self.height], [0, 0], [self.width, 0], [self.width, self.height]],
+            "velocity": [[0, 0], [0, 0], [0, 0], [0, 0]],
+        }
+        self.closing_boundary_id = self._new_id()
+        self.objects[self.closing_boundary_id] = {
+            "type": CLOSING_BOUNDARY,
+            "position": [[0, self.height], [0, 0], [self.width, 0], [self.width, self.height]],
+            "velocity": [[closing_speed, -closing_speed], [closing_speed, closing_speed],
+                         [-closing_speed, closing_speed], [-closing_speed, -closing_speed]],
+        }
+
+        spawns = [[self.width * 0.15, self.height / 2], [self.width * 0.85, self.height / 2]]
+        self._generate_walls(wall_density, destructible_ratio, spawns)
+
+        self.tank_ids = []
+        for spawn in spawns:
+            tank_id = self._new_id()
+            self.tank_ids.append(tank_id)
+            self.objects[tank_id] = {
+                "type": TANK,
+                "position": [spawn[0], spawn[1]],
+                "velocity": [0.0, 0.0],
+                "hp": tank_hp,
+                "powerups": [],
+            }
+            self.commands[tank_id] = None
+            self.tank_speed[tank_id] = TANK_SPEED
+            self.bullet_damage[tank_id] = BULLET_DAMAGE
+
+        #Everything moving is sent in the first turn message
+        self._mark_updated(*self.tank_ids, self.closing_boundary_id)
+
+    def _new_id(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _mark_updated(self, *object_ids):
+        for object_id in object_ids:
+            self._updated[object_id] = self.objects[object_id]
+
+    def _delete(self, object_id):
+        game_object = self.objects.pop(object_id)
+        self._updated.pop(object_id, None)
+        self._deleted.append(object_id)
+        if game_object["type"] in (WALL, DESTRUCTIBLE_WALL):
+            del self.wall_cells[self._cell_of(game_object["position"])]
+
+    def _cell_of(self, position):
+        return int(position[0] // WALL_SIZE), int(position[1] // WALL_SIZE)
+
+    def _generate_walls(self, wall_density, destructible_ratio, spawns):
+        """
+        Scatter straight wall segments over the map grid, keeping the tank spawns clear.
+        """
+        cols, rows = int(self.width // WALL_SIZE), int(self.height // WALL_SIZE)
+        num_segments = int(cols * rows / 60 * wall_density)
+        spawn_cells = [self._cell_of(spawn) for spawn in spawns]
+        for _ in range(num_segments):
+            col, row = self.rng.randrange(cols), self.rng.randrange(rows)
+            d_col, d_row = self.rng.choice([(1, 0), (0, 1)])
+            destructible = self.rng.random() < destructible_ratio
+            for i in range(self.rng.randint(3, 10)):
+                cell = (col + d_col * i, row + d_row * i)
+                if not (0 <= cell[0] < cols and 0 <= cell[1] < rows) or cell in self.wall_cells:
+                    continue
+                if any(abs(cell[0] - spawn[0]) <= 3 and abs(cell[1] - spawn[1]) <= 3 for spawn in spawn_cells):
+                    continue
+                wall_id = self._new_id()
+                wall = {"type": DESTRUCTIBLE_WALL if destructible else WALL,
+                        "position": [(cell[0] + 0.5) * WALL_SIZE, (cell[1] + 0.5) * WALL_SIZE]}
+                if destructible:
+                    wall["hp"] = DESTRUCTIBLE_WALL_HP
+                self.objects[wall_id] = wall
+                self.wall_cells[cell] = wall_id
+
+    def init_messages(self, player_index) -> typing.List[typing.Union[str, dict]]:
+        """
+        Init stream for the given player: tank ids, every object in batches, then END_INIT.
+        """
+        tank_id = self.tank_ids[player_index]
+        enemy_tank_id = self.tank_ids[1 - player_index]
+        messages = [{"message": {"your-tank-id": tank_id, "enemy-tank-id": enemy_tank_id}}]
+        items = list(self.objects.items())
+        for start in range(0, len(items), INIT_BATCH_SIZE):
+            messages.append({"message": {"updated_objects": dict(items[start:start + INIT_BATCH_SIZE])}})
+        messages.append(END_INIT_SIGNAL)
+        return messages
+
+    def turn_message(self) -> dict:
+        """
+        Delta since the previous turn message. Both players get the same message.
+        """
+        message = {"message": {"updated_objects": self._updated, "deleted_objects": self._deleted}}
+        self._updated = {}
+        self._deleted = []
+        return message
+
+    def step(self, responses: typing.List[typing.Optional[dict]]):
+        """
+        Apply the players' responses (None for a missed turn) and advance the game by one tick.
+        """
+        for tank_id, response in zip(self.tank_ids, responses):
+            if not isinstance(response, dict):
+                continue
+            if "move" in response:
+                self.commands[tank_id] = ("move", float(response["move"]))
+            if "path" in response:
+                self.commands[tank_id] = ("path", [float(response["path"][0]), float(response["path"][1])])
+            if "shoot" in response:
+                self._spawn_bullet(tank_id, float(response["shoot"]))
+
+        for tank_id in self.tank_ids:
+            self._move_tank(tank_id)
+        self._move_bullets()
+        self._close_boundary()
+        self._check_tanks()
+        self._spawn_powerup()
+
+        self.tick += 1
+        alive = [tank_id for tank_id in self.tank_ids if tank_id in self.objects]
+        if len(alive) < 2:
+            self.is_over = True
+            self.winner = self.tank_ids.index(alive[0]) if alive else None
+        elif self.tick >= self.max_ticks:
+            self.is_over = True
+            hp = [self.objects[tank_id]["hp"] for tank_id in self.tank_ids]
+            self.winner = None if hp[0] == hp[1] else hp.index(max(hp))
+
+    def _spawn_bullet(self, tank_id, angle):
+        tank = self.objects.get(tank_id)
+        if tank is None:
+            return
+        dx, dy = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+        offset = TANK_RADIUS + 1
+        bullet_id = self._new_id()
+        self.objects[bullet_id] = {
+            "type": BULLET,
+            "position": [tank["position"][0] + dx * offset, tank["position"][1] + dy * offset],
+            "velocity": [dx * BULLET_SPEED, dy * BULLET_SPEED],
+            "damage": self.bullet_damage[tank_id],
+            "tank_id": tank_id,
+        }
+        self._mark_updated(bullet_id)
+
+    def _blocked(self, x, y, radius):
+        """
+        True if a circle at (x, y) overlaps a wall or leaves the map.
+        """
+        if x - radius < 0 or y - radius < 0 or x + radius > self.width or y + radius > self.height:
+            return True
+        for col in range(int((x - radius) // WALL_SIZE), int((x + radius) // WALL_SIZE) + 1):
+            for row in range(int((y - radius) // WALL_SIZE), int((y + radius) // WALL_SIZE) + 1):
+                if (col, row) not in self.wall_cells:
+                    continue
+                #Closest point of the wall square to the circle centre
+                near_x = min(max(x, col * WALL_SIZE), (col + 1) * WALL_SIZE)
+                near_y = min(max(y, row * WALL_SIZE), (row + 1) * WALL_SIZE)
+                if (x - near_x) ** 2 + (y - near_y) ** 2 < radius ** 2:
+                    return True
+        return False
+
+    def _move_tank(self, tank_id):
+        tank = self.objects.get(tank_id)
+        if tank is None:
+            return
+        command = self.commands[tank_id]
+        speed = self.tank_speed[tank_id]
+        x, y = tank["position"]
+        vx = vy = 0.0
+        if command is not None and command[0] == "move":
+            vx = speed * math.cos(math.radians(command[1]))
+            vy = speed * math.sin(math.radians(command[1]))
+        elif command is not None and command[0] == "path":
+            dx, dy = command[1][0] - x, command[1][1] - y
+            distance = math.hypot(dx, dy)
+            if distance <= speed * TICK_SECONDS:
+                #Path reached, the tank stops
+                self.commands[tank_id] = None
+                vx, vy = dx / TICK_SECONDS, dy / TICK_SECONDS
+            else:
+                vx, vy = dx / distance * speed, dy / distance * speed
+
+        #Slide along walls one axis at a time
+        new_x, new_y = x + vx * TICK_SECONDS, y + vy * TICK_SECONDS
+        if self._blocked(new_x, y, TANK_RADIUS):
+            new_x, vx = x, 0.0
+        if self._blocked(new_x, new_y, TANK_RADIUS):
+            new_y, vy = y, 0.0
+        if [new_x, new_y] != tank["position"] or [vx, vy] != tank["velocity"]:
+            tank["position"] = [new_x, new_y]
+            tank["velocity"] = [vx, vy]
+            self._mark_updated(tank_id)
+
+    def _move_bullets(self):
+        bullet_ids = [object_id for object_id, game_object in self.objects.items() if game_object["type"] == BULLET]
+        sub_steps = max(1, math.ceil(BULLET_SPEED * TICK_SECONDS / (WALL_SIZE / 2)))
+        dt = TICK_SECONDS / sub_steps
+        for bullet_id in bullet_ids:
+            bullet = self.objects[bullet_id]
+            x, y = bullet["position"]
+            vx, vy = bullet["velocity"]
+            hit = False
+            for _ in range(sub_steps):
+                x, y = x + vx * dt, y + vy * dt
+                if not (0 <= x <= self.width and 0 <= y <= self.height):
+                    hit = True
+                    break
+                wall_id = self.wall_cells.get(self._cell_of([x, y]))
+                if wall_id is not None:
+                    wall = self.objects[wall_id]
+                    if wall["type"] == DESTRUCTIBLE_WALL:
+                        wall["hp"] -= bullet["damage"]
+                        if wall["hp"] <= 0:
+                            self._delete(wall_id)
+                        else:
+                            self._mark_updated(wall_id)
+                    hit = True
+                    break
+                for tank_id in self.tank_ids:
+                    tank = self.objects.get(tank_id)
+                    if tank is None or tank_id == bullet["tank_id"]:
+                        continue
+                    if (tank["position"][0] - x) ** 2 + (tank["position"][1] - y) ** 2 <= TANK_RADIUS ** 2:
+                        tank["hp"] -= bullet["damage"]
+                        self._mark_updated(tank_id)
+                        hit = True
+                        break
+                if hit:
+                    break
+            if hit:
+                self._delete(bullet_id)
+            else:
+                bullet["position"] = [x, y]
+                self._mark_updated(bullet_id)
+
+    def _close_boundary(self):
+        closing_boundary = self.objects[self.closing_boundary_id]
+        top_left, bot_left, bot_right, top_right = closing_boundary["position"]
+        step = self.closing_speed * TICK_SECONDS
+        if bot_right[0] - bot_left[0] <= 2 * step or top_left[1] - bot_left[1] <= 2 * step:
+            closing_boundary["velocity"] = [[0, 0], [0, 0], [0, 0], [0, 0]]
+            return
+        closing_boundary["position"] = [
+            [top_left[0] + step, top_left[1] - step],
+            [bot_left[0] + step, bot_left[1] + step],
+            [bot_right[0] - step, bot_right[1] + step],
+            [top_right[0] - step, top_right[1] - step],
+        ]
+        self._mark_updated(self.closing_boundary_id)
+
+    def closing_bounds(self):
+        """
+        (min_x, min_y, max_x, max_y) of the closing boundary. It stays an axis aligned rectangle while it shrinks.
+        """
+        top_left, bot_left, bot_right, _ = self.objects[self.closing_boundary_id]["position"]
+        return bot_left[0], bot_left[1], bot_right[0], top_left[1]
+
+    def _check_tanks(self):
+        """
+        Kill tanks touching the closing boundary, hand out powerups and remove dead tanks.
+        """
+        min_x, min_y, max_x, max_y = self.closing_bounds()
+        powerups = [object_id for object_id, game_object in self.objects.items() if game_object["type"] == POWERUP]
+        for tank_id in self.tank_ids:
+            tank = self.objects.get(tank_id)
+            if tank is None:
+                continue
+            x, y = tank["position"]
+            if x - TANK_RADIUS < min_x or y - TANK_RADIUS < min_y or x + TANK_RADIUS > max_x or y + TANK_RADIUS > max_y:
+                tank["hp"] = 0
+            for powerup_id in powerups:
+                powerup = self.objects.get(powerup_id)
+                if powerup is None:
+                    continue
+                if math.hypot(powerup["position"][0] - x, powerup["position"][1] - y) > TANK_RADIUS + POWERUP_RADIUS:
+                    continue
+                match powerup["powerup_type"]:
+                    case "HEALTH":
+                        tank["hp"] += 1
+                    case "DAMAGE":
+                        self.bullet_damage[tank_id] += 1
+                    case "SPEED":
+                        self.tank_speed[tank_id] *= SPEED_POWERUP_FACTOR
+                tank["powerups"].append(powerup["powerup_type"])
+                self._mark_updated(tank_id)
+                self._delete(powerup_id)
+            if tank["hp"] <= 0:
+                self._delete(tank_id)
+
+    def _spawn_powerup(self):
+        if self.powerup_interval <= 0 or self.tick % self.powerup_interval != self.powerup_interval - 1:
+            return
+        min_x, min_y, max_x, max_y = self.closing_bounds()
+        margin = POWERUP_RADIUS + TANK_RADIUS
+        if max_x - min_x <= 2 * margin or max_y - min_y <= 2 * margin:
+            return
+        for _ in range(20):
+            position = [self.rng.uniform(min_x + margin, max_x - margin), self.rng.uniform(min_y + margin, max_y - margin)]
+            if not self._blocked(position[0], position[1], POWERUP_RADIUS):
+                powerup_id = self._new_id()
+                self.objects[powerup_id] = {"type": POWERUP, "position": position,
+                                            "powerup_type": self.rng.choice(POWERUP_TYPES)}
+                self._mark_updated(powerup_id)
+                return
+
+
+class BotProcess:
+    """
+    One of our bot directories (e.g. `Gene4`) running `src/main.py` as a child process, talking over pipes.
+    A bot that crashes or closes its stdout is treated as missing every remaining turn.
+    :param env: extra environment variables for the bot (e.g. GENE4_PARAMS)
+    """
+    def __init__(self, bot, turn_timeout=None, stderr=None, env=None):
+        self.name = os.path.basename(os.path.normpath(bot))
+        bot_dir = bot if os.path.isdir(bot) else os.path.join(REPO_ROOT, bot)
+        self.turn_timeout = turn_timeout
+        self.alive = True
+        #The bots print without flushing, so run them unbuffered or every response would sit in a pipe buffer
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", os.path.join("src", "main.py")], cwd=bot_dir,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=stderr if stderr is not None else subprocess.DEVNULL,
+            env=dict(os.environ, **env) if env else None,
+        )
+        self._buffer = b""
+        #The buffer starts with the unfinished tail of a response to an earlier turn
+        self._stale_tail = False
+        self.stale_responses = 0
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.process.stdout, selectors.EVENT_READ)
+
+    def send(self, message):
+        if not self.alive:
+            return
+        self._discard_late_responses()
+        try:
+            self.process.stdin.write(json.dumps(message).encode() + b"\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self.alive = False
+
+    def _read_available(self, timeout) -> bool:
+        """
+        Append what the bot wrote to the buffer, waiting up to timeout seconds (None: forever) for it.
+        :return: False if nothing came in time or the bot closed its stdout
+        """
+        if not self._selector.select(timeout):
+            return False
+        chunk = os.read(self.process.stdout.fileno(), 65536)
+        if not chunk:
+            self.alive = False
+            return False
+        self._buffer += chunk
+        return True
+
+    def _discard_late_responses(self):
+        """
+        Drop what the bot already wrote before we send the next message. A bot only answers a turn after reading it,
+        so all of it answers turns it was too slow for (receive gave None), and taking it as the answer to the next
+        turn would leave every later response one turn behind. A response still being written when it is sent is
+        only caught if it started coming out by then, bots without tagged responses cannot do better.
+        """
+        while self.alive and self._read_available(0):
+            pass
+        if b"\n" in self._buffer:
+            self.stale_responses += self._buffer.count(b"\n")
+            self._buffer = self._buffer.rsplit(b"\n", 1)[1]
+            self._stale_tail = False
+        if self._buffer:
+            self._stale_tail = True
+
+    def receive(self) -> typing.Optional[dict]:
+        """
+        Next response line from the bot, or None if it timed out, crashed or sent something unreadable.
+        """
+        deadline = None if self.turn_timeout is None else time.perf_counter() + self.turn_timeout
+        while True:
+            while self.alive and b"\n" not in self._buffer:
+                timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                if not self._read_available(timeout):
+                    return None
+            if not self.alive:
+                return None
+            line, self._buffer = self._buffer.split(b"\n", 1)
+            if not self._stale_tail:
+                break
+            self._stale_tail = False
+            self.stale_responses += 1
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def close(self):
+        self.alive = False
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._selector.close()
+        self.process.stdout.close()
+
+
+class ScriptedPlayer:
+    """
+    In-process opponent that needs no bot directory: wanders in a random direction, turns away from walls it got stuck
+    on, heads back to the centre when the closing boundary gets near and shoots at the other tank every `fire_every`
+    ticks. Mostly useful to generate streams quickly.
+    """
+    def __init__(self, seed=0, fire_every=1, name="scripted"):
+        self.name = name
+        self.rng = random.Random(seed)
+        self.fire_every = fire_every
+        self.alive = True
+        self.tank_id = None
+        self.enemy_tank_id = None
+        self.positions = {}
+        self.velocity = [0.0, 0.0]
+        self.closing_boundary = None
+        self.direction = self.rng.uniform(0, 360)
+        self.tick = 0
+        self._pending = False
+
+    def send(self, message):
+        if not isinstance(message, dict):
+            return
+        content = message["message"]
+        if "your-tank-id" in content:
+            self.tank_id = content["your-tank-id"]
+            self.enemy_tank_id = content["enemy-tank-id"]
+            return
+        for object_id, game_object in content["updated_objects"].items():
+            if object_id in (self.tank_id, self.enemy_tank_id):
+                self.positions[object_id] = game_object["position"]
+                if object_id == self.tank_id:
+                    self.velocity = game_object["velocity"]
+            elif game_object["type"] == CLOSING_BOUNDARY:
+                self.closing_boundary = game_object["position"]
+        if "deleted_objects" in content:
+            self._pending = True
+
+    def receive(self) -> typing.Optional[dict]:
+        if not self._pending:
+            return None
+        self._pending = False
+        self.tick += 1
+        response = {}
+        if self.velocity == [0.0, 0.0] or self.rng.random() < 0.02:
+            self.direction = self.rng.uniform(0, 360)
+            response["move"] = self.direction
+        if self.closing_boundary is not None and self.tank_id in self.positions:
+            x, y = self.positions[self.tank_id]
+            top_left, bot_left, bot_right, _ = self.closing_boundary
+            if min(x - bot_left[0], bot_right[0] - x, y - bot_left[1], top_left[1] - y) < 4 * TANK_RADIUS:
+                centre = [(bot_left[0] + bot_right[0]) / 2, (bot_left[1] + top_left[1]) / 2]
+                self.direction = math.degrees(math.atan2(centre[1] - y, centre[0] - x)) + self.rng.uniform(-30, 30)
+                response["move"] = self.direction
+        if self.tick % self.fire_every == 0 and self.tank_id in self.positions and self.enemy_tank_id in self.positions:
+            mine, theirs = self.positions[self.tank_id], self.positions[self.enemy_tank_id]
+            angle = math.degrees(math.atan2(theirs[1] - mine[1], theirs[0] - mine[0]))
+            response["shoot"] = angle + self.rng.uniform(-5, 5)
+        return response
+
+    def close(self):
+        self.alive = False
+
+
+def make_player(spec, seed=0, turn_timeout=None, stderr=None, env=None):
+    """
+    "scripted" gives a ScriptedPlayer, anything else is treated as a bot directory.
+    """
+    if spec == "scripted":
+        return ScriptedPlayer(seed=seed)
+    return BotProcess(spec, turn_timeout=turn_timeout, stderr=stderr, env=env)
+
+
+def run_match(players, seed=0, record=None, **simulator_options) -> dict:
+    """
+    Play one match between two players until a tank dies or max_ticks is reached.
+    :param players: two objects with send/receive/close (BotProcess or ScriptedPlayer)
+    :param record: optional text file, every message sent to the first player is appended to it as one JSON line
+    :return: summary dict with the winner index (None on a draw), ticks played, speed and per-turn latencies
+    """
+    simulator = Simulator(seed=seed, **simulator_options)
+    latencies = [[], []]
+    missed = [0, 0]
+
+    def send(index, message):
+        if index == 0 and record is not None:
+            record.write(json.dumps(message) + "\n")
+        players[index].send(message)
+
+    start = time.perf_counter()
+    for index in range(2):
+        for message in simulator.init_messages(index):
+            send(index, message)
+
+    while not simulator.is_over:
+        message = simulator.turn_message()
+        sent_at = []
+        for index in range(2):
+            send(index, message)
+            sent_at.append(time.perf_counter())
+        responses = []
+        for index in range(2):
+            response = players[index].receive()
+            if response is None:
+                missed[index] += 1
+            else:
+                latencies[index].append(time.perf_counter() - sent_at[index])
+            responses.append(response)
+        simulator.step(responses)
+
+    for index in range(2):
+        send(index, END_SIGNAL)
+        players[index].close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "players": [player.name for player in players],
+        "seed": seed,
+        "winner": simulator.winner,
+        "ticks": simulator.tick,
+        "elapsed": elapsed,
+        "ticks_per_second": simulator.tick / elapsed if elapsed else 0.0,
+        "hp": [simulator.objects[tank_id]["hp"] if tank_id in simulator.objects else 0
+               for tank_id in simulator.tank_ids],
+        "crashed": [not player.alive and missed[index] > 0 for index, player in enumerate(players)],
+        "missed_turns": missed,
+        "stale_responses": [getattr(player, "stale_responses", 0) for player in players],
+        "latencies": latencies,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a local match between two bots.")
+    parser.add_argument("players", nargs=2, help="bot directory (e.g. Gene4) or 'scripted'")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int)
+    parser.add_argument("--height", type=int)
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    parser.add_argument("--wall-density", type=float, default=1.0)
+    parser.add_argument("--turn-timeout", type=float, help="seconds a bot gets per turn before it is skipped")
+    parser.add_argument("--record", help="write every message sent to the first player to this file")
+    parser.add_argument("--bot-logs", action="store_true", help="let the bots' stderr through")
+    args = parser.parse_args()
+
+    stderr = None if not args.bot_logs else sys.stderr
+    players = [make_player(spec, seed=args.seed + index, turn_timeout=args.turn_timeout, stderr=stderr)
+               for index, spec in enumerate(args.players)]
+    record = open(args.record, "w") if args.record else None
+    try:
+        result = run_match(players, seed=args.seed, record=record, width=args.width, height=args.height,
+                           max_ticks=args.max_ticks, wall_density=args.wall_density)
+    finally:
+        if record is not None:
+            record.close()
+
+    result["median_turn_ms"] = [
+        round(sorted(latencies)[len(latencies) // 2] * 1000, 3) if latencies else None
+        for latencies in result.pop("latencies")
+    ]
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
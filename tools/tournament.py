@@ -0,0 +1,207 @@
+"""
+Round-robin self-play between our bot generations on the local simulator.
+
+Every pair of bots plays `--seeds` games per map setting, on both sides of the map, and the games run in parallel in a
+process pool (one match per worker, the two bot processes of a match take turns so a match keeps about one core busy).
+
+    python tools/tournament.py                                  # every bot, 10 seeds
+    python tools/tournament.py Gene2 Gene4 scripted --seeds 50 --wall-density 0.5 1.5
+    python tools/tournament.py --json results.json
+
+Reports per bot: win/draw/loss, win rate, Elo, average survival ticks (how long its games lasted), crashes
+and turn latency percentiles, plus the pairwise win rates.
+"""
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+import simulator
+
+BOTS = ["Gene", "Gene2", "Gene3", "Gene4", "test_bot"]
+ELO_START = 1500.0
+ELO_K = 16.0
+#Elo depends on the order of the games, average it over this many shuffled orders
+ELO_PASSES = 20
+
+
+def play_game(job, envs=(None, None)) -> dict:
+    """
+    Worker: play one match and keep what the report needs.
+    :param envs: extra environment variables of each player's process
+    """
+    players_spec, seed, options = job
+    turn_timeout = options.get("turn_timeout")
+    simulator_options = {key: value for key, value in options.items() if key != "turn_timeout"}
+    players = [simulator.make_player(spec, seed=seed + index, turn_timeout=turn_timeout, env=envs[index])
+               for index, spec in enumerate(players_spec)]
+    try:
+        result = simulator.run_match(players, seed=seed, **simulator_options)
+    except BaseException:
+        #run_match closes the players itself when it gets to the end
+        for player in players:
+            player.close()
+        raise
+    result["players"] = list(players_spec)
+    result["options"] = simulator_options
+    return result
+
+
+def schedule(bots, seeds, wall_densities, max_ticks, turn_timeout, first_seed=0) -> list:
+    """
+    Every pair, every seed and map setting, both ways round.
+    """
+    jobs = []
+    for (first, second), seed, wall_density in itertools.product(
+            itertools.combinations(bots, 2), range(first_seed, first_seed + seeds), wall_densities):
+        options = dict(wall_density=wall_density, max_ticks=max_ticks, turn_timeout=turn_timeout)
+        jobs.append(((first, second), seed, dict(options)))
+        jobs.append(((second, first), seed, dict(options)))
+    return jobs
+
+
+def run_tournament(jobs, workers=None, progress=True) -> list:
+    results = []
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(play_game, job): index for index, job in enumerate(jobs)}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            result = future.result()
+            result["job"] = futures[future]
+            results.append(result)
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f"\r{done}/{len(jobs)} games, {elapsed:.0f}s", end="", file=sys.stderr, flush=True)
+    if progress:
+        print(file=sys.stderr)
+    #Same order whatever the workers did
+    results.sort(key=lambda result: result["job"])
+    return results
+
+
+def elo_ratings(bots, results, passes=ELO_PASSES, seed=0) -> dict:
+    """
+    Sequential Elo updates, averaged over several random orders of the games so the result does not depend on which
+    games happened to finish first.
+    """
+    rng = random.Random(seed)
+    totals = {bot: 0.0 for bot in bots}
+    games = [(result["players"], result["winner"]) for result in results]
+    for _ in range(passes):
+        rng.shuffle(games)
+        ratings = {bot: ELO_START for bot in bots}
+        for (first, second), winner in games:
+            expected = 1 / (1 + 10 ** ((ratings[second] - ratings[first]) / 400))
+            score = 0.5 if winner is None else 1.0 - winner
+            ratings[first] += ELO_K * (score - expected)
+            ratings[second] -= ELO_K * (score - expected)
+        for bot in bots:
+            totals[bot] += ratings[bot]
+    return {bot: total / passes for bot, total in totals.items()}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(bots, results) -> dict:
+    stats = {bot: {"games": 0, "wins": 0, "draws": 0, "losses": 0, "crashes": 0, "missed_turns": 0, "ticks": 0,
+                   "latencies": []} for bot in bots}
+    pairs = {}
+    for result in results:
+        for index, bot in enumerate(result["players"]):
+            bot_stats = stats[bot]
+            bot_stats["games"] += 1
+            #Every game ends with a death or at max_ticks, either way both bots lasted exactly that long
+            bot_stats["ticks"] += result["ticks"]
+            bot_stats["crashes"] += result["crashed"][index]
+            bot_stats["missed_turns"] += result["missed_turns"][index]
+            bot_stats["latencies"].extend(result["latencies"][index])
+            opponent = result["players"][1 - index]
+            pair = pairs.setdefault((bot, opponent), [0, 0])
+            pair[1] += 1
+            if result["winner"] is None:
+                bot_stats["draws"] += 1
+                pair[0] += 0.5
+            elif result["winner"] == index:
+                bot_stats["wins"] += 1
+                pair[0] += 1
+            else:
+                bot_stats["losses"] += 1
+
+    elo = elo_ratings(bots, results)
+    summary = {}
+    for bot, bot_stats in stats.items():
+        games = bot_stats["games"] or 1
+        latencies = sorted(bot_stats.pop("latencies"))
+        summary[bot] = dict(
+            bot_stats,
+            win_rate=(bot_stats["wins"] + 0.5 * bot_stats["draws"]) / games,
+            elo=elo[bot],
+            survival_ticks=bot_stats.pop("ticks") / games,
+            latency_ms={name: None if percentile(latencies, fraction) is None
+                        else percentile(latencies, fraction) * 1000
+                        for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        )
+    pairwise = {f"{bot} vs {opponent}": score / games for (bot, opponent), (score, games) in sorted(pairs.items())}
+    return {"bots": summary, "pairwise": pairwise}
+
+
+def print_report(summary):
+    header = (f"{'bot':10s}{'elo':>7s}{'win%':>7s}{'W/D/L':>13s}{'survival':>10s}{'crash':>7s}"
+              f"{'p50/p95/p99 turn ms':>24s}")
+    print(header)
+    print("-" * len(header))
+    ranked = sorted(summary["bots"].items(), key=lambda item: -item[1]["elo"])
+    for bot, stats in ranked:
+        latency = "/".join("-" if value is None else f"{value:.1f}" for value in stats["latency_ms"].values())
+        record = f"{stats['wins']}/{stats['draws']}/{stats['losses']}"
+        print(f"{bot:10s}{stats['elo']:7.0f}{stats['win_rate'] * 100:7.1f}{record:>13s}"
+              f"{stats['survival_ticks']:10.0f}{stats['crashes']:7d}{latency:>24s}")
+
+    bots = [bot for bot, _ in ranked]
+    print()
+    print("win rate of row against column")
+    print(" " * 10 + "".join(f"{bot:>10s}" for bot in bots))
+    for bot in bots:
+        cells = []
+        for opponent in bots:
+            score = summary["pairwise"].get(f"{bot} vs {opponent}")
+            cells.append(f"{'-' if score is None else f'{score * 100:.0f}%':>10s}")
+        print(f"{bot:10s}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-robin tournament between bots on the local simulator.")
+    parser.add_argument("bots", nargs="*", default=BOTS, help="bot directories or 'scripted'")
+    parser.add_argument("--seeds", type=int, default=10, help="games per pair, map setting and side")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--wall-density", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--max-ticks", type=int, default=simulator.MAX_TICKS)
+    parser.add_argument("--turn-timeout", type=float, default=1.0, help="seconds a bot gets per turn")
+    parser.add_argument("--workers", type=int, help="parallel games, default: number of cores")
+    parser.add_argument("--json", help="also write the summary and every game result to this file")
+    args = parser.parse_args()
+
+    jobs = schedule(args.bots, args.seeds, args.wall_density, args.max_ticks, args.turn_timeout, args.first_seed)
+    start = time.perf_counter()
+    results = run_tournament(jobs, args.workers)
+    summary = summarize(args.bots, results)
+    print_report(summary)
+    print(f"\n{len(results)} games in {time.perf_counter() - start:.0f}s")
+
+    if args.json:
+        for result in results:
+            result.pop("latencies")
+        with open(args.json, "w") as json_file:
+            json.dump({"summary": summary, "games": results}, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
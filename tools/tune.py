@@ -0,0 +1,202 @@
+"""
+Tune Gene4's constants (Gene4/src/params.py) with headless matches on the simulator.
+
+Each generation samples candidate parameter sets and scores them by playing against fixed opponents, all games of a
+round in parallel in a process pool. Evaluation is done in rounds with early stopping (successive halving): after
+every round only the best `--keep` fraction of the candidates plays on, so bad candidates cost a round of games
+instead of the full evaluation. All candidates of a round play the same seeds.
+
+Two samplers:
+- random: uniform over the search space in params.PARAM_SPACE
+- es (default): a diagonal-covariance evolution strategy in the spirit of CMA-ES, the sampling distribution moves to
+  the weighted mean of the best candidates and its spread per parameter follows theirs
+
+    python tools/tune.py --generations 5 --population 8
+    python tools/tune.py --sampler random --opponent Gene2 --opponent scripted --output /tmp/params.json
+
+The best candidate is written as JSON to --output (default Gene4/src/params.json, which the bot loads at startup).
+"""
+import argparse
+import concurrent.futures
+import importlib.util
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+import simulator
+import tournament
+
+BOT = "Gene4"
+PARAMS_MODULE_FILE = os.path.join(simulator.REPO_ROOT, BOT, "src", "params.py")
+
+
+def load_params_module():
+    """
+    Import Gene4's params module under its own name, next to any other bot modules.
+    """
+    spec = importlib.util.spec_from_file_location("gene4_params", PARAMS_MODULE_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+PARAM_SPACE = load_params_module().PARAM_SPACE
+
+
+def normalize(params) -> list:
+    return [(params[name] - low) / (high - low) for name, (_, low, high, _) in PARAM_SPACE.items()]
+
+
+def denormalize(vector) -> dict:
+    params = {}
+    for value, (name, (_, low, high, integer)) in zip(vector, PARAM_SPACE.items()):
+        value = low + min(1.0, max(0.0, value)) * (high - low)
+        params[name] = int(round(value)) if integer else round(value, 4)
+    return params
+
+
+class RandomSampler:
+    def __init__(self, rng):
+        self.rng = rng
+
+    def ask(self, count) -> list:
+        return [denormalize([self.rng.random() for _ in PARAM_SPACE]) for _ in range(count)]
+
+    def tell(self, ranked):
+        pass
+
+
+class EvolutionStrategy:
+    """
+    (mu, lambda) evolution strategy with a diagonal Gaussian in the normalized [0, 1] space.
+    Starts around the defaults, recombines the best quarter with log-rank weights like CMA-ES and adapts the step size
+    of each parameter to the spread of the selected candidates.
+    """
+    def __init__(self, rng, start, sigma=0.25, min_sigma=0.03):
+        self.rng = rng
+        self.mean = normalize(start)
+        self.sigma = [sigma] * len(self.mean)
+        self.min_sigma = min_sigma
+
+    def ask(self, count) -> list:
+        return [denormalize([self.rng.gauss(mean, sigma) for mean, sigma in zip(self.mean, self.sigma)])
+                for _ in range(count)]
+
+    def tell(self, ranked):
+        """
+        :param ranked: candidates, best first
+        """
+        mu = max(1, len(ranked) // 4)
+        weights = [math.log(mu + 0.5) - math.log(rank + 1) for rank in range(mu)]
+        total = sum(weights)
+        weights = [weight / total for weight in weights]
+        elites = [normalize(params) for params in ranked[:mu]]
+        old_mean = self.mean
+        self.mean = [sum(weight * elite[i] for weight, elite in zip(weights, elites)) for i in range(len(old_mean))]
+        for i in range(len(self.sigma)):
+            spread = math.sqrt(sum(weight * (elite[i] - old_mean[i]) ** 2 for weight, elite in zip(weights, elites)))
+            #Smooth the update so one lucky generation cannot collapse the search
+            self.sigma[i] = max(self.min_sigma, 0.7 * self.sigma[i] + 0.3 * spread)
+
+
+def play_candidate(job) -> float:
+    """
+    Worker: one game of a candidate against an opponent.
+    :return: score of the candidate, 1 for a win, 0.5 for a draw, 0 for a loss
+    """
+    params, opponent, seed, side, options = job
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as params_file:
+        json.dump(params, params_file)
+    try:
+        players = (BOT, opponent) if side == 0 else (opponent, BOT)
+        envs = [None, None]
+        envs[side] = {"GENE4_PARAMS": params_file.name}
+        result = tournament.play_game((players, seed, dict(options)), envs=envs)
+    finally:
+        os.unlink(params_file.name)
+    if result["winner"] is None:
+        return 0.5
+    return 1.0 if result["winner"] == side else 0.0
+
+
+def evaluate(pool, candidates, opponents, rounds, seeds_per_round, keep, first_seed, options) -> list:
+    """
+    Successive halving over the candidates.
+    :return: (mean score, games played, params) for every candidate, best first. Candidates stopped early rank below
+        the ones that played every round.
+    """
+    scores = [[] for _ in candidates]
+    alive = list(range(len(candidates)))
+    stopped = []
+    for round_index in range(rounds):
+        seeds = range(first_seed + round_index * seeds_per_round, first_seed + (round_index + 1) * seeds_per_round)
+        jobs = [(index, (candidates[index], opponent, seed, side, options))
+                for index in alive for opponent in opponents for seed in seeds for side in (0, 1)]
+        futures = {pool.submit(play_candidate, job): index for index, job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            scores[futures[future]].append(future.result())
+
+        alive.sort(key=lambda index: -sum(scores[index]) / len(scores[index]))
+        if round_index < rounds - 1:
+            survivors = max(1, math.ceil(len(alive) * keep))
+            stopped = alive[survivors:] + stopped
+            alive = alive[:survivors]
+
+    return [(sum(scores[index]) / len(scores[index]), len(scores[index]), candidates[index])
+            for index in alive + stopped]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune Gene4's parameters with parallel headless matches.")
+    parser.add_argument("--sampler", choices=["es", "random"], default="es")
+    parser.add_argument("--generations", type=int, default=5)
+    parser.add_argument("--population", type=int, default=8)
+    parser.add_argument("--opponent", action="append", help="default: Gene2 and scripted")
+    parser.add_argument("--rounds", type=int, default=3, help="evaluation rounds per generation")
+    parser.add_argument("--seeds-per-round", type=int, default=2, help="seeds per opponent, both sides are played")
+    parser.add_argument("--keep", type=float, default=0.5, help="fraction of the candidates that plays the next round")
+    parser.add_argument("--max-ticks", type=int, default=1000)
+    parser.add_argument("--turn-timeout", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, help="parallel games, default: number of cores")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(simulator.REPO_ROOT, BOT, "src", "params.json"))
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    defaults = load_params_module().DEFAULT_PARAMS
+    sampler = RandomSampler(rng) if args.sampler == "random" else EvolutionStrategy(rng, defaults)
+    opponents = args.opponent or ["Gene2", "scripted"]
+    options = dict(max_ticks=args.max_ticks, turn_timeout=args.turn_timeout)
+
+    best = None
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers or os.cpu_count()) as pool:
+        for generation in range(args.generations):
+            candidates = sampler.ask(args.population)
+            if generation == 0:
+                #The current defaults are the bar to beat
+                candidates[0] = dict(defaults)
+            #A different set of seeds every generation, the same for all candidates of a generation
+            first_seed = args.seed * 10000 + generation * args.rounds * args.seeds_per_round
+            ranked = evaluate(pool, candidates, opponents, args.rounds, args.seeds_per_round, args.keep, first_seed,
+                              options)
+            sampler.tell([params for _, _, params in ranked])
+
+            score, games, params = ranked[0]
+            if best is None or score > best[0]:
+                best = (score, games, params)
+            print(f"generation {generation}: best {score:.3f} over {games} games {json.dumps(params)} "
+                  f"({time.perf_counter() - start:.0f}s)", file=sys.stderr)
+
+    score, games, params = best
+    with open(args.output, "w") as output_file:
+        json.dump(params, output_file, indent=2)
+    print(json.dumps({"score": score, "games": games, "params": params, "output": args.output}, indent=2))
+
+
+if __name__ == "__main__":
+    main()